@@ -0,0 +1,287 @@
+"""
+Benchmark suite of the data preparation, training, and inference paths of IvyMLTools.
+
+Synthetic samples of four classes with beta-distributed features (as in test/testIvyXGBTrainer.py) are generated at each requested size
+and written into ROOT files through uproot. The following stages are timed and memory-profiled through IvyXGBoostProfiler:
+- load_input: IvyXGBoostDataInput::load_input of the ROOT files
+- add_data: Repeated IvyXGBoostDataInput::add_data calls in small pieces, followed by the split
+- train: IvyXGBoostTrainer::train with and without a control sample and with and without weight scaling
+- predict: Python prediction through xgb.Booster.inplace_predict and through a DMatrix
+- cxx: IvyXGBoostInterface::eval per event (map and bound evaluation) vs. batched, and the native tree evaluator,
+  through the ROOT macro benchIvyXGBInterface.cc (only with --cxx, which needs ROOT and the compiled library)
+
+The results are written into a JSON file with one entry per '[size]/[benchmark]/[stage]', each holding the wall time (minimum over the repetitions),
+the number of calls, and the memory measurements of IvyXGBoostProfiler. If a baseline file from a previous run is given,
+the wall times are compared with the baseline, and stages that are slower by more than the tolerance are reported as regressions.
+
+Usage (with the environment of setup.sh):
+   python benchIvyXGB.py --sizes 10000 100000 --output bench_output.json [--baseline bench_baseline.json] [--cxx]
+"""
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import argparse
+import platform
+import subprocess
+import numpy as np
+import uproot
+import xgboost as xgb
+from IvyXGBoostParameters import IvyXGBoostParameters
+from IvyXGBoostDataInput import IvyXGBoostDataInput
+from IvyXGBoostTrainer import IvyXGBoostTrainer
+from IvyXGBoostProfiler import IvyXGBoostProfiler
+
+
+# Beta distribution parameters of the classes and their sizes relative to the largest class, following test/testIvyXGBTrainer.py
+class_settings = [
+   dict(cls=0, alpha=2.0, beta=2.0, fraction=1.),
+   dict(cls=1, alpha=0.5, beta=0.5, fraction=0.1),
+   dict(cls=2, alpha=2.0, beta=5.0, fraction=0.2),
+   dict(cls=3, alpha=1.0, beta=3.0, fraction=0.5)
+]
+
+
+def get_feature_names(nfeatures):
+   return [ "x{}".format(ifeat) for ifeat in range(nfeatures) ]
+
+
+def generate_samples(workdir, nentries, nfeatures, seed):
+   """
+   Generates the samples of the classes for a largest class size of nentries, and writes one ROOT file per class.
+   Returns the list of (file name, class) pairs.
+   """
+   rng = np.random.default_rng(seed)
+   features = get_feature_names(nfeatures)
+   res = []
+   for setting in class_settings:
+      n = max(1, int(nentries*setting['fraction']))
+      fname = os.path.join(workdir, "bench_n{}_class{}.root".format(nentries, setting['cls']))
+      arrays = dict()
+      for ifeat, var in enumerate(features):
+         # Shift the distribution of each feature a little so that the features are not identical.
+         arrays[var] = (rng.beta(setting['alpha'], setting['beta'], n) + 0.1*ifeat).astype(np.float32)
+      arrays['weight'] = rng.uniform(0.5, 1.5, n).astype(np.float32)
+      with uproot.recreate(fname) as foutput:
+         foutput["T"] = arrays
+      res.append((fname, setting['cls']))
+   return res
+
+
+def collect_stages(results, prefix, profiler, extra=None):
+   """
+   Adds the stages recorded by a profiler to results under the given prefix.
+   Wall times are minimized over repeated runs, and memory peaks are maximized.
+   """
+   for stage, vals in profiler.report()['stages'].items():
+      name = "{}/{}".format(prefix, stage)
+      entry = dict(vals)
+      if extra is not None:
+         entry.update(extra)
+      if name in results:
+         prev = results[name]
+         entry['wall_time'] = min(entry['wall_time'], prev['wall_time'])
+         for key in [ 'peak_rss', 'peak_allocated' ]:
+            if prev[key] is not None and entry[key] is not None:
+               entry[key] = max(entry[key], prev[key])
+      results[name] = entry
+
+
+def make_profiler(args):
+   return IvyXGBoostProfiler(trace_allocations=not args.no_trace_allocations, reset_peak_rss=not args.no_reset_peak_rss)
+
+
+def bench_load_input(args, results, tag, sample_files, features):
+   for _ in range(args.repeat):
+      with make_profiler(args) as profiler:
+         xgb_input = IvyXGBoostDataInput(list(features))
+         xgb_input.profiler = profiler
+         for fname, cls in sample_files:
+            xgb_input.load_input(fname, "T", 0.5, control_fraction=1./3., weight_name="weight", class_type=cls, step_size=args.step_size, nthreads=args.nthreads)
+      collect_stages(results, "{}/load_input".format(tag), profiler)
+
+
+def bench_add_data(args, results, tag, samples, features):
+   for _ in range(args.repeat):
+      with make_profiler(args) as profiler:
+         xgb_input = IvyXGBoostDataInput(list(features))
+         xgb_input.profiler = profiler
+         for feats, wgts, cls in samples:
+            for piece_feats, piece_wgts in zip(np.array_split(feats, args.npieces), np.array_split(wgts, args.npieces)):
+               xgb_input.add_data(piece_feats, piece_wgts, cls, 0.5, control_fraction=1./3., shuffle=True)
+         xgb_input.split()
+      collect_stages(results, "{}/add_data".format(tag), profiler)
+
+
+def build_input(samples, features, use_control):
+   xgb_input = IvyXGBoostDataInput(list(features))
+   for feats, wgts, cls in samples:
+      xgb_input.add_data(feats, wgts, cls, 0.5, control_fraction=(1./3. if use_control else None), shuffle=True)
+   xgb_input.split()
+   return xgb_input
+
+
+def bench_train(args, results, tag, samples, features):
+   xgb_params = IvyXGBoostParameters()
+   xgb_params.setParameters(num_round=args.num_round, nthread=args.nthreads)
+   booster = None
+   test_features = None
+   for use_control in [ False, True ]:
+      xgb_input = build_input(samples, features, use_control)
+      for scale_weights in [ True, False ]:
+         for _ in range(args.repeat):
+            with make_profiler(args) as profiler:
+               xgb_trainer = IvyXGBoostTrainer()
+               xgb_trainer.profiler = profiler
+               xgb_trainer.train(xgb_input, xgb_params, scale_weights=scale_weights, save_predictions=True, reuse_dmatrix=False)
+            collect_stages(results, "{}/train[control={:d},scale_weights={:d}]".format(tag, use_control, scale_weights), profiler)
+            booster = xgb_trainer.booster
+      test_features = np.ascontiguousarray(xgb_input.data_test[0])
+   return booster, test_features
+
+
+def bench_predict(args, results, tag, booster, test_features, features):
+   extra = dict(nevents=test_features.shape[0])
+   for _ in range(args.repeat):
+      with make_profiler(args) as profiler:
+         with profiler.stage("inplace"):
+            booster.inplace_predict(test_features, missing=-999.)
+         with profiler.stage("dmatrix"):
+            booster.predict(xgb.DMatrix(test_features, missing=-999., feature_names=features))
+      collect_stages(results, "{}/predict".format(tag), profiler, extra)
+
+
+def bench_cxx(args, results, tag, booster, test_features, features):
+   """
+   Runs the C++ benchmark macro with the booster and the test features, and adds its results.
+   """
+   model_file = os.path.abspath(os.path.join(args.workdir, "bench_model_{}.json".format(tag)))
+   data_file = os.path.abspath(os.path.join(args.workdir, "bench_features_{}.dat".format(tag)))
+   output_file = os.path.abspath(os.path.join(args.workdir, "bench_cxx_{}.json".format(tag)))
+   booster.save_model(model_file)
+   test_features.astype(np.float32).tofile(data_file)
+
+   bench_dir = os.path.dirname(os.path.abspath(__file__))
+   macro_args = '"{}", "{}", {}, {}, "{}", {}'.format(model_file, data_file, test_features.shape[0], len(features), output_file, args.repeat)
+   cmd = [ "root", "-b", "-l", "-q", os.path.join(bench_dir, "..", "test", "loadLib.C"), "{}+({})".format(os.path.join(bench_dir, "benchIvyXGBInterface.cc"), macro_args) ]
+   status = subprocess.run(cmd, cwd=args.workdir).returncode
+   if status!=0 or not os.path.exists(output_file):
+      print("benchIvyXGB: The C++ benchmark failed with status {}.".format(status))
+      return
+   with open(output_file) as fin:
+      for stage, vals in json.load(fin).items():
+         results["{}/cxx/{}".format(tag, stage)] = vals
+
+
+def compare_results(results, baseline, tolerance):
+   """
+   Compares the wall times of the stages in results with those in baseline.
+   Returns the list of (name, baseline time, current time, ratio, status) rows, where status is 'regression', 'improvement', 'ok', or 'new'.
+   """
+   res = []
+   for name, vals in results.items():
+      base_vals = baseline.get(name, None)
+      if base_vals is None or not base_vals.get('wall_time', None):
+         res.append((name, None, vals['wall_time'], None, "new"))
+         continue
+      ratio = vals['wall_time']/base_vals['wall_time']
+      status = "ok"
+      if ratio>1.+tolerance:
+         status = "regression"
+      elif ratio<1./(1.+tolerance):
+         status = "improvement"
+      res.append((name, base_vals['wall_time'], vals['wall_time'], ratio, status))
+   return res
+
+
+def get_metadata(args):
+   return dict(
+      time = time.strftime("%Y-%m-%dT%H:%M:%S"),
+      host = platform.node(),
+      python = platform.python_version(),
+      numpy = np.__version__,
+      uproot = uproot.__version__,
+      xgboost = xgb.__version__,
+      cpu_count = os.cpu_count(),
+      settings = dict(vars(args))
+   )
+
+
+def main():
+   parser = argparse.ArgumentParser(description="Benchmark suite of IvyMLTools")
+   parser.add_argument("--sizes", type=int, nargs="+", default=[ 10000, 100000 ], help="Sizes of the largest class")
+   parser.add_argument("--nfeatures", type=int, default=4, help="Number of features")
+   parser.add_argument("--num_round", type=int, default=50, help="Number of boosting rounds")
+   parser.add_argument("--nthreads", type=int, default=1, help="Number of threads of reading and XGBoost")
+   parser.add_argument("--step_size", type=int, default=None, help="Step size of load_input")
+   parser.add_argument("--npieces", type=int, default=100, help="Number of add_data calls per class")
+   parser.add_argument("--repeat", type=int, default=3, help="Number of repetitions of each benchmark")
+   parser.add_argument("--seed", type=int, default=12345, help="Random seed of the samples")
+   parser.add_argument("--workdir", type=str, default="bench_workdir", help="Directory of the samples and the intermediate files")
+   parser.add_argument("--keep_workdir", action="store_true", help="Keep the samples and the intermediate files")
+   parser.add_argument("--output", type=str, default="bench_output.json", help="Output JSON file")
+   parser.add_argument("--baseline", type=str, default=None, help="JSON file of a previous run to compare with")
+   parser.add_argument("--tolerance", type=float, default=0.2, help="Relative slowdown above which a stage is reported as a regression")
+   parser.add_argument("--fail_on_regression", action="store_true", help="Exit with a nonzero status if there are regressions")
+   parser.add_argument("--no_trace_allocations", action="store_true", help="Do not measure the allocated memory through tracemalloc")
+   parser.add_argument("--no_reset_peak_rss", action="store_true", help="Do not reset the peak RSS at the beginning of each stage")
+   parser.add_argument("--cxx", action="store_true", help="Run the C++ benchmark through ROOT")
+   args = parser.parse_args()
+
+   if args.repeat<1:
+      raise RuntimeError("benchIvyXGB: The number of repetitions should be positive.")
+   workdir_created = not os.path.isdir(args.workdir)
+   os.makedirs(args.workdir, exist_ok=True)
+   features = get_feature_names(args.nfeatures)
+
+   results = dict()
+   for nentries in args.sizes:
+      tag = "n{}".format(nentries)
+      print("benchIvyXGB: Running the benchmarks with {} entries in the largest class...".format(nentries))
+      sample_files = generate_samples(args.workdir, nentries, args.nfeatures, args.seed)
+      samples = []
+      for fname, cls in sample_files:
+         with uproot.open(fname) as finput:
+            arrs = finput["T"].arrays(features+[ "weight" ], library="np")
+         samples.append((np.stack([ arrs[var] for var in features ], axis=1), arrs["weight"], cls))
+
+      bench_load_input(args, results, tag, sample_files, features)
+      bench_add_data(args, results, tag, samples, features)
+      booster, test_features = bench_train(args, results, tag, samples, features)
+      bench_predict(args, results, tag, booster, test_features, features)
+      if args.cxx:
+         bench_cxx(args, results, tag, booster, test_features, features)
+
+   with open(args.output, "w") as fout:
+      json.dump(dict(metadata=get_metadata(args), results=results), fout, indent=2)
+   print("benchIvyXGB: The results are written into {}.".format(args.output))
+
+   nRegressions = 0
+   if args.baseline is not None:
+      with open(args.baseline) as fin:
+         baseline = json.load(fin)['results']
+      print("{:<70} {:>12} {:>12} {:>8}  {}".format("Stage", "Baseline [s]", "Current [s]", "Ratio", "Status"))
+      for name, base_time, cur_time, ratio, status in compare_results(results, baseline, args.tolerance):
+         print(
+            "{:<70} {:>12} {:>12.4f} {:>8}  {}".format(
+               name, ("{:.4f}".format(base_time) if base_time is not None else "-"), cur_time, ("{:.3f}".format(ratio) if ratio is not None else "-"), status
+            )
+         )
+         if status=="regression":
+            nRegressions += 1
+      print("benchIvyXGB: {} regression(s) with tolerance {}.".format(nRegressions, args.tolerance))
+
+   if not args.keep_workdir:
+      # Only remove what this script created.
+      for fname in glob.glob(os.path.join(args.workdir, "bench_*")):
+         os.remove(fname)
+      if workdir_created:
+         shutil.rmtree(args.workdir, ignore_errors=True)
+   if args.fail_on_regression and nRegressions>0:
+      sys.exit(1)
+
+
+if __name__ == "__main__":
+   main()
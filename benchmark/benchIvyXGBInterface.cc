@@ -0,0 +1,101 @@
+#include <chrono>
+#include <fstream>
+#include <iomanip>
+#include <functional>
+#include <limits>
+#include "IvyFramework/IvyMLTools/interface/IvyXGBoostInterface.h"
+#include "IvyFramework/IvyMLTools/interface/IvyXGBoostTreeEvaluator.h"
+#include "IvyFramework/IvyDataTools/interface/IvyStreamHelpers.hh"
+
+
+using namespace std;
+using namespace IvyStreamHelpers;
+
+
+// Benchmark of the C++ evaluation paths, called by benchIvyXGB.py with the --cxx option.
+// The features of nevents events are read from data_file as a raw row-major float32 array of nevents x nvars values,
+// and the variables are named x0, x1, etc. as in benchIvyXGB.py.
+// The minimum wall time over nrepeat repetitions of each evaluation path is written into output_file in JSON format.
+void benchIvyXGBInterface(TString model_file, TString data_file, unsigned long long nevents, unsigned int nvars, TString output_file, unsigned int nrepeat=3){
+  std::vector<TString> varnames;
+  for (unsigned int iv=0; iv<nvars; iv++) varnames.push_back(Form("x%u", iv));
+
+  std::vector<IvyMLWrapper::IvyMLDataType_t> data(nevents*nvars, 0);
+  {
+    std::ifstream fin(data_file.Data(), std::ios::binary);
+    fin.read(reinterpret_cast<char*>(data.data()), data.size()*sizeof(IvyMLWrapper::IvyMLDataType_t));
+    if (!fin){
+      IVYerr << "benchIvyXGBInterface: The features could not be read from " << data_file << "." << endl;
+      return;
+    }
+  }
+
+  IvyXGBoostInterface xgb;
+  if (!xgb.build(model_file, varnames, -999.)) return;
+  IvyXGBoostTreeEvaluator xgb_native;
+  if (!xgb_native.build(model_file, varnames, -999.)) return;
+  const unsigned int nout = xgb.getNOutputs();
+  std::vector<IvyMLWrapper::IvyMLDataType_t> preds(nevents*nout, 0);
+
+  // Name, function, and minimum time of each evaluation path
+  std::vector<std::pair<TString, std::function<void()>>> paths;
+  paths.emplace_back(
+    "eval_map",
+    [&](){
+      std::unordered_map<TString, IvyMLWrapper::IvyMLDataType_t> vars;
+      std::vector<IvyMLWrapper::IvyMLDataType_t> res;
+      for (unsigned long long iev=0; iev<nevents; iev++){
+        for (unsigned int iv=0; iv<nvars; iv++) vars[varnames.at(iv)] = data[iev*nvars + iv];
+        xgb.eval(vars, res);
+      }
+    }
+  );
+  paths.emplace_back(
+    "eval_bound",
+    [&](){
+      for (unsigned long long iev=0; iev<nevents; iev++){
+        std::copy(data.begin() + iev*nvars, data.begin() + (iev+1)*nvars, xgb.getInputBuffer());
+        xgb.evalBound(preds.data() + iev*nout);
+      }
+    }
+  );
+  paths.emplace_back(
+    "eval_batch",
+    [&](){
+      std::vector<IvyMLWrapper::IvyMLDataType_t> res;
+      xgb.eval(data.data(), nevents, res);
+    }
+  );
+  paths.emplace_back(
+    "native_eval_bound",
+    [&](){
+      for (unsigned long long iev=0; iev<nevents; iev++){
+        std::copy(data.begin() + iev*nvars, data.begin() + (iev+1)*nvars, xgb_native.getInputBuffer());
+        xgb_native.evalBound(preds.data() + iev*nout);
+      }
+    }
+  );
+  paths.emplace_back(
+    "native_eval_batch",
+    [&](){
+      std::vector<IvyMLWrapper::IvyMLDataType_t> res;
+      xgb_native.eval(data.data(), nevents, res);
+    }
+  );
+
+  std::ofstream fout(output_file.Data());
+  fout << std::setprecision(9) << "{" << endl;
+  for (size_t ipath=0; ipath<paths.size(); ipath++){
+    double time_min = std::numeric_limits<double>::max();
+    for (unsigned int irep=0; irep<nrepeat; irep++){
+      auto time_start = std::chrono::steady_clock::now();
+      paths.at(ipath).second();
+      time_min = std::min(time_min, std::chrono::duration<double>(std::chrono::steady_clock::now() - time_start).count());
+    }
+    IVYout << "benchIvyXGBInterface: " << paths.at(ipath).first << " took " << time_min << " s for " << nevents << " events." << endl;
+    fout << "  \"" << paths.at(ipath).first << "\": {\"calls\": " << nrepeat << ", \"wall_time\": " << time_min << ", \"nevents\": " << nevents << ", \"time_per_event\": " << (nevents>0 ? time_min/nevents : 0.) << "}";
+    if (ipath+1<paths.size()) fout << ",";
+    fout << endl;
+  }
+  fout << "}" << endl;
+}
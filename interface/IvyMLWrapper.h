@@ -15,6 +15,10 @@ public:
 
   virtual bool build(TString fname, std::vector<TString> const& varnames, IvyMLDataType_t missing_entry_val) = 0;
 
+  // Returns the list of variable names where each range of elements of a jagged branch, 'name[i..j]' (i and j inclusive), is expanded into 'name[i]', ..., 'name[j]'.
+  // These are the feature names of IvyXGBoostDataInput, so its list of features can be passed as is to build.
+  static std::vector<TString> expandVariableNames(std::vector<TString> const& varnames);
+
 };
 
 
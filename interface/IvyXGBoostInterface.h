@@ -1,29 +1,149 @@
 #ifndef IVYXGBOOSTINTERFACE_H
 #define IVYXGBOOSTINTERFACE_H
 
+#include <string>
+#include <memory>
+#include <mutex>
 #include <xgboost/c_api.h>
+#if defined(__has_include)
+#if __has_include(<xgboost/version_config.h>)
+#include <xgboost/version_config.h>
+#endif
+#endif
 #include "IvyMLWrapper.h"
+#include "IvyXGBoostModelRegistry.h"
+
+
+// XGBoost >= 1.0 has the 'training' argument in XGBoosterPredict.
+#if defined(XGBOOST_VER_MAJOR)
+#define IVYXGBOOST_PREDICT_HAS_TRAINING_ARG
+#endif
+// XGBoost >= 1.4 supports inplace prediction from dense arrays without creating a DMatrix.
+#if defined(XGBOOST_VER_MAJOR) && (XGBOOST_VER_MAJOR>1 || (XGBOOST_VER_MAJOR==1 && XGBOOST_VER_MINOR>=4))
+#define IVYXGBOOST_HAS_INPLACE_PREDICT
+#endif
+
+
+class IvyXGBoostEvalContext;
 
 
+// IvyXGBoostInterface is not thread-safe by itself: Its eval functions share the booster and the input buffer.
+// For concurrent evaluation (e.g., in ROOT implicit multithreading or TBB event loops), each thread should own an IvyXGBoostEvalContext
+// created through createEvalContext, and only use that context for evaluation.
+//
+// The boosters are obtained from IvyXGBoostModelRegistry, so all interfaces built from the same model file share a single booster.
+// If lazy loading is enabled through setLazyLoading before build, the model is loaded only at the first evaluation or at the first call to
+// getBooster, getNOutputs, or createEvalContext.
 class IvyXGBoostInterface : public IvyMLWrapper{
+  friend class IvyXGBoostEvalContext;
+
 protected:
-  BoosterHandle* booster;
+  // Model file, the shared model loaded from it, and the pointer to its booster
+  TString model_file;
+  mutable std::shared_ptr<IvyXGBoostModelRegistry::SharedModel> model;
+  mutable BoosterHandle* booster;
   IvyMLDataType_t defval;
   std::vector<TString> variable_names;
 
+  // Input buffer of the bound evaluation with one slot per variable, ordered as in variable_names
+  std::vector<IvyMLDataType_t> input_buffer;
+  // Buffer of the scores, reused between evaluations
+  std::vector<IvyMLDataType_t> score_buffer;
+  // Number of scores per event
+  mutable unsigned int nOutputs;
+  // JSON strings for the prediction configuration and the array interface of input_buffer, prepared once in build
+  std::string prediction_config;
+  std::string input_buffer_interface;
+  // Flags for the loading of the model
+  bool lazy_loading;
+  mutable std::once_flag load_flag;
+  mutable bool load_success;
+
+  // Loads the model from the registry if it is not loaded yet, and returns whether the model is available.
+  // This function is thread-safe.
+  bool loadModel() const;
+
+  // Runs the prediction with booster_handle for nevents events stored in data as a row-major array of nevents x (number of variables) values.
+  // The output values are copied into res before returning, so res does not depend on the buffers owned by XGBoost.
+  // Inplace predictions (XGBoosterPredictFromDense) take no lock: Their results are stored in a per-thread buffer of the booster.
+  // Only the DMatrix fallback for older XGBoost versions locks the shared booster, and the copy is then made before the lock is released.
+  // If data_interface is not null, it is used as the (pre-formatted) JSON array interface of data.
+  bool predict(BoosterHandle* const& booster_handle, IvyMLDataType_t const* data, unsigned long long nevents, std::vector<IvyMLDataType_t>& res, char const* data_interface=nullptr) const;
+
+  // Returns the JSON array interface of a row-major float array of nevents x nFeatures values
+  static std::string getArrayInterface(IvyMLDataType_t const* data, unsigned long long nevents, unsigned long long nFeatures);
+
 public:
   IvyXGBoostInterface();
-  virtual ~IvyXGBoostInterface();
+  virtual ~IvyXGBoostInterface(){}
+
+  // Enables or disables the deferral of the loading of the model to its first use. This function should be called before build.
+  void setLazyLoading(bool flag){ lazy_loading = flag; }
+  bool isModelLoaded() const{ return (booster!=nullptr); }
 
   bool build(TString fname, std::vector<TString> const& varnames, IvyMLDataType_t missing_entry_val);
 
   std::vector<TString> const& getVariableNames() const{ return variable_names; }
 
-  BoosterHandle* const& getBooster() const{ return booster; }
+  BoosterHandle* const& getBooster() const{ this->loadModel(); return booster; }
 
   template<typename T> bool eval(std::unordered_map<TString, IvyMLDataType_t> const& vars, std::vector<T>& res);
   template<typename T> bool eval(std::unordered_map<TString, IvyMLDataType_t> const& vars, T& res);
 
+  // Batch evaluation:
+  // data is a contiguous row-major buffer of nevents x getVariableNames().size() values, ordered as in getVariableNames().
+  // The scores are returned in res as a row-major buffer of nevents x (number of scores per event) values.
+  template<typename T> bool eval(IvyMLDataType_t const* data, unsigned long long nevents, std::vector<T>& res);
+
+  // Bound evaluation, which does no allocation and no string lookup per event:
+  // - Resolve the slot of each variable once through getVariableIndex or bindVariable.
+  // - For each event, fill the slots of the input buffer (getInputBuffer()[index] or *pointer) and call evalBound.
+  // evalBound writes getNOutputs() scores into the caller-owned buffer res.
+  // Slots that are not filled keep their previous values, so call resetInputs to set all of them to the missing value indicator if needed.
+  int getVariableIndex(TString const& varname) const;
+  IvyMLDataType_t* bindVariable(TString const& varname);
+  IvyMLDataType_t* getInputBuffer(){ return input_buffer.data(); }
+  void resetInputs();
+  unsigned int getNOutputs() const{ this->loadModel(); return nOutputs; }
+  template<typename T> bool evalBound(T* res);
+
+  // Creates an evaluation context for use in a single thread.
+  // This function can be called concurrently, but the interface needs to be built beforehand and to outlive the context.
+  std::unique_ptr<IvyXGBoostEvalContext> createEvalContext() const;
+
+};
+
+
+// Evaluation context of an IvyXGBoostInterface for concurrent use:
+// Each context holds its own copy of the booster (configured to use one thread) and its own input buffer,
+// so different threads can evaluate through their own contexts at the same time without locks.
+// The functions have the same meaning as the bound and batch evaluation functions of IvyXGBoostInterface.
+class IvyXGBoostEvalContext{
+public:
+  typedef IvyMLWrapper::IvyMLDataType_t IvyMLDataType_t;
+
+protected:
+  IvyXGBoostInterface const* parent;
+  BoosterHandle* booster;
+  std::vector<IvyMLDataType_t> input_buffer;
+  std::string input_buffer_interface;
+  std::vector<IvyMLDataType_t> score_buffer;
+
+public:
+  IvyXGBoostEvalContext(IvyXGBoostInterface const& parent_);
+  IvyXGBoostEvalContext(IvyXGBoostEvalContext const&) = delete;
+  IvyXGBoostEvalContext& operator=(IvyXGBoostEvalContext const&) = delete;
+  ~IvyXGBoostEvalContext();
+
+  int getVariableIndex(TString const& varname) const{ return parent->getVariableIndex(varname); }
+  IvyMLDataType_t* bindVariable(TString const& varname);
+  IvyMLDataType_t* getInputBuffer(){ return input_buffer.data(); }
+  void resetInputs();
+  unsigned int getNOutputs() const{ return parent->getNOutputs(); }
+  template<typename T> bool evalBound(T* res);
+
+  template<typename T> bool eval(IvyMLDataType_t const* data, unsigned long long nevents, std::vector<T>& res);
+
 };
 
 
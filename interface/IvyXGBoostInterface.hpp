@@ -10,12 +10,9 @@ using namespace std;
 using namespace IvyStreamHelpers;
 
 
-#define SAFE_XGBOOST(CALL) \
-{ int err_call = (CALL); if (err_call!=0){ IVYerr << "Call '" << #CALL << "' returned error code " << err_call << ". XGBoost last error: " << XGBGetLastError() << endl; } }
-
-
 template<typename T> bool IvyXGBoostInterface::eval(std::unordered_map<TString, IvyMLDataType_t> const& vars, std::vector<T>& res){
   res.clear();
+  if (!this->loadModel()) return false;
 
   constexpr unsigned long long nSample = 1;
   const unsigned long long nFeatures = variable_names.size();
@@ -28,20 +25,14 @@ template<typename T> bool IvyXGBoostInterface::eval(std::unordered_map<TString,
     data_arr_ptr++;
   };
 
-  bst_ulong nout = 0;
-  const IvyMLDataType_t* score;
-  DMatrixHandle dvalues;
-  SAFE_XGBOOST(XGDMatrixCreateFromMat(data_arr, nSample, nFeatures, defval, &dvalues));
-  SAFE_XGBOOST(XGBoosterPredict(*booster, dvalues, 0, 0, &nout, &score));
-  SAFE_XGBOOST(XGDMatrixFree(dvalues));
-
-  res.clear();
-  res.reserve(nout);
-  for (bst_ulong rr=0; rr<nout; rr++) res.push_back(static_cast<T>(score[rr]));
+  bool success = this->predict(booster, data_arr, nSample, score_buffer);
+  if (success) res.assign(score_buffer.cbegin(), score_buffer.cend());
 
   delete[] data_arr;
-  return true;
+  return success;
 }
+template bool IvyXGBoostInterface::eval<float>(std::unordered_map<TString, IvyMLDataType_t> const& vars, std::vector<float>& res);
+template bool IvyXGBoostInterface::eval<double>(std::unordered_map<TString, IvyMLDataType_t> const& vars, std::vector<double>& res);
 
 template<typename T> bool IvyXGBoostInterface::eval(std::unordered_map<TString, IvyMLDataType_t> const& vars, T& res){
   std::vector<T> vres;
@@ -58,4 +49,59 @@ template<typename T> bool IvyXGBoostInterface::eval(std::unordered_map<TString,
 template bool IvyXGBoostInterface::eval<float>(std::unordered_map<TString, IvyMLDataType_t> const& vars, float& res);
 template bool IvyXGBoostInterface::eval<double>(std::unordered_map<TString, IvyMLDataType_t> const& vars, double& res);
 
+template<typename T> bool IvyXGBoostInterface::eval(IvyMLDataType_t const* data, unsigned long long nevents, std::vector<T>& res){
+  res.clear();
+  if (!this->loadModel()) return false;
+  if (nevents==0) return true;
+
+  if (!this->predict(booster, data, nevents, score_buffer)) return false;
+
+  res.assign(score_buffer.cbegin(), score_buffer.cend());
+  return true;
+}
+template bool IvyXGBoostInterface::eval<float>(IvyMLDataType_t const* data, unsigned long long nevents, std::vector<float>& res);
+template bool IvyXGBoostInterface::eval<double>(IvyMLDataType_t const* data, unsigned long long nevents, std::vector<double>& res);
+
+template<typename T> bool IvyXGBoostInterface::evalBound(T* res){
+  if (!this->loadModel()) return false;
+
+  if (!this->predict(booster, input_buffer.data(), 1, score_buffer, input_buffer_interface.c_str())) return false;
+  const bst_ulong nout = score_buffer.size();
+  if (nout!=nOutputs){
+    IVYerr << "IvyXGBoostInterface::evalBound: The number of scores " << nout << " is different from the expected " << nOutputs << "." << endl;
+    return false;
+  }
+
+  for (bst_ulong rr=0; rr<nout; rr++) res[rr] = static_cast<T>(score_buffer[rr]);
+  return true;
+}
+template bool IvyXGBoostInterface::evalBound<float>(float* res);
+template bool IvyXGBoostInterface::evalBound<double>(double* res);
+
+template<typename T> bool IvyXGBoostEvalContext::evalBound(T* res){
+  if (!parent->predict(booster, input_buffer.data(), 1, score_buffer, input_buffer_interface.c_str())) return false;
+  const bst_ulong nout = score_buffer.size();
+  if (nout!=parent->getNOutputs()){
+    IVYerr << "IvyXGBoostEvalContext::evalBound: The number of scores " << nout << " is different from the expected " << parent->getNOutputs() << "." << endl;
+    return false;
+  }
+
+  for (bst_ulong rr=0; rr<nout; rr++) res[rr] = static_cast<T>(score_buffer[rr]);
+  return true;
+}
+template bool IvyXGBoostEvalContext::evalBound<float>(float* res);
+template bool IvyXGBoostEvalContext::evalBound<double>(double* res);
+
+template<typename T> bool IvyXGBoostEvalContext::eval(IvyMLDataType_t const* data, unsigned long long nevents, std::vector<T>& res){
+  res.clear();
+  if (nevents==0) return true;
+
+  if (!parent->predict(booster, data, nevents, score_buffer)) return false;
+
+  res.assign(score_buffer.cbegin(), score_buffer.cend());
+  return true;
+}
+template bool IvyXGBoostEvalContext::eval<float>(IvyMLDataType_t const* data, unsigned long long nevents, std::vector<float>& res);
+template bool IvyXGBoostEvalContext::eval<double>(IvyMLDataType_t const* data, unsigned long long nevents, std::vector<double>& res);
+
 #endif
@@ -0,0 +1,59 @@
+#ifndef IVYXGBOOSTKFOLDINTERFACE_H
+#define IVYXGBOOSTKFOLDINTERFACE_H
+
+#include <memory>
+#include "IvyXGBoostInterface.h"
+
+
+// Evaluator of the models trained in k-fold mode (IvyXGBoostTrainer.train_kfold):
+// The model of fold i is trained without the events with event_number % k == i, so each event is evaluated with the model of its own fold,
+// i.e., the model with index (event number) % (number of folds).
+// The models of the folds are held by one IvyXGBoostInterface each, so they are shared through IvyXGBoostModelRegistry as well.
+class IvyXGBoostKFoldInterface : public IvyMLWrapper{
+protected:
+  std::vector<std::unique_ptr<IvyXGBoostInterface>> fold_interfaces;
+  IvyMLDataType_t defval;
+  std::vector<TString> variable_names;
+  bool lazy_loading;
+
+  // Input buffer of the bound evaluation, copied into the input buffer of the selected fold in evalBound
+  std::vector<IvyMLDataType_t> input_buffer;
+
+public:
+  IvyXGBoostKFoldInterface();
+  virtual ~IvyXGBoostKFoldInterface(){}
+
+  // Enables or disables the deferral of the loading of the models to their first use. This function should be called before build.
+  void setLazyLoading(bool flag){ lazy_loading = flag; }
+
+  // Builds the interfaces of the folds from the files obtained by replacing the placeholder '{fold}' in fname by 0, 1, 2, etc.
+  // (as in IvyXGBoostTrainer.save_kfold_models). The number of folds is the number of consecutive files found,
+  // which is why IvyXGBoostTrainer.save_kfold_models removes the files of higher fold indices left over from an earlier training with more folds.
+  bool build(TString fname, std::vector<TString> const& varnames, IvyMLDataType_t missing_entry_val);
+  // Builds the interfaces of the folds from the list of model files, ordered by fold index
+  bool build(std::vector<TString> const& fnames, std::vector<TString> const& varnames, IvyMLDataType_t missing_entry_val);
+
+  std::vector<TString> const& getVariableNames() const{ return variable_names; }
+  unsigned int getNFolds() const{ return fold_interfaces.size(); }
+  unsigned int getFold(unsigned long long const& event_number) const{ return static_cast<unsigned int>(event_number % fold_interfaces.size()); }
+  IvyXGBoostInterface* getFoldInterface(unsigned int ifold){ return fold_interfaces.at(ifold).get(); }
+  unsigned int getNOutputs() const{ return (fold_interfaces.empty() ? 0 : fold_interfaces.front()->getNOutputs()); }
+
+  template<typename T> bool eval(unsigned long long const& event_number, std::unordered_map<TString, IvyMLDataType_t> const& vars, std::vector<T>& res);
+  template<typename T> bool eval(unsigned long long const& event_number, std::unordered_map<TString, IvyMLDataType_t> const& vars, T& res);
+
+  // Batch evaluation, with the same conventions as IvyXGBoostInterface::eval and one event number per event in event_numbers.
+  // The events are grouped by fold so that each model is called once per batch.
+  template<typename T> bool eval(IvyMLDataType_t const* data, unsigned long long const* event_numbers, unsigned long long nevents, std::vector<T>& res);
+
+  // Bound evaluation, with the same conventions as IvyXGBoostInterface::evalBound
+  int getVariableIndex(TString const& varname) const;
+  IvyMLDataType_t* bindVariable(TString const& varname);
+  IvyMLDataType_t* getInputBuffer(){ return input_buffer.data(); }
+  void resetInputs();
+  template<typename T> bool evalBound(unsigned long long const& event_number, T* res);
+
+};
+
+
+#endif
@@ -0,0 +1,87 @@
+#ifndef IVYXGBOOSTKFOLDINTERFACE_HPP
+#define IVYXGBOOSTKFOLDINTERFACE_HPP
+
+#include <algorithm>
+#include "IvyFramework/IvyDataTools/interface/IvyStreamHelpers.hh"
+#include "IvyXGBoostKFoldInterface.h"
+
+
+using namespace std;
+using namespace IvyStreamHelpers;
+
+
+template<typename T> bool IvyXGBoostKFoldInterface::eval(unsigned long long const& event_number, std::unordered_map<TString, IvyMLDataType_t> const& vars, std::vector<T>& res){
+  res.clear();
+  if (fold_interfaces.empty()){
+    IVYerr << "IvyXGBoostKFoldInterface::eval: The interfaces of the folds are not built." << endl;
+    return false;
+  }
+  return fold_interfaces.at(this->getFold(event_number))->eval(vars, res);
+}
+template bool IvyXGBoostKFoldInterface::eval<float>(unsigned long long const& event_number, std::unordered_map<TString, IvyMLDataType_t> const& vars, std::vector<float>& res);
+template bool IvyXGBoostKFoldInterface::eval<double>(unsigned long long const& event_number, std::unordered_map<TString, IvyMLDataType_t> const& vars, std::vector<double>& res);
+
+template<typename T> bool IvyXGBoostKFoldInterface::eval(unsigned long long const& event_number, std::unordered_map<TString, IvyMLDataType_t> const& vars, T& res){
+  if (fold_interfaces.empty()){
+    IVYerr << "IvyXGBoostKFoldInterface::eval: The interfaces of the folds are not built." << endl;
+    return false;
+  }
+  return fold_interfaces.at(this->getFold(event_number))->eval(vars, res);
+}
+template bool IvyXGBoostKFoldInterface::eval<float>(unsigned long long const& event_number, std::unordered_map<TString, IvyMLDataType_t> const& vars, float& res);
+template bool IvyXGBoostKFoldInterface::eval<double>(unsigned long long const& event_number, std::unordered_map<TString, IvyMLDataType_t> const& vars, double& res);
+
+template<typename T> bool IvyXGBoostKFoldInterface::eval(IvyMLDataType_t const* data, unsigned long long const* event_numbers, unsigned long long nevents, std::vector<T>& res){
+  res.clear();
+  if (fold_interfaces.empty()){
+    IVYerr << "IvyXGBoostKFoldInterface::eval: The interfaces of the folds are not built." << endl;
+    return false;
+  }
+  if (nevents==0) return true;
+
+  const unsigned long long nFeatures = variable_names.size();
+  const unsigned int nFolds = fold_interfaces.size();
+  const unsigned int nout = this->getNOutputs();
+  res.assign(nevents*nout, 0);
+
+  // Indices of the events in each fold
+  std::vector<std::vector<unsigned long long>> fold_events(nFolds);
+  for (unsigned long long iev=0; iev<nevents; iev++) fold_events[this->getFold(event_numbers[iev])].push_back(iev);
+
+  std::vector<IvyMLDataType_t> fold_data;
+  std::vector<T> fold_res;
+  for (unsigned int ifold=0; ifold<nFolds; ifold++){
+    std::vector<unsigned long long> const& ievs = fold_events[ifold];
+    if (ievs.empty()) continue;
+
+    // Gather the inputs of the events of the fold into a contiguous buffer.
+    fold_data.resize(ievs.size()*nFeatures);
+    for (size_t jev=0; jev<ievs.size(); jev++) std::copy(data + ievs[jev]*nFeatures, data + (ievs[jev]+1)*nFeatures, fold_data.data() + jev*nFeatures);
+
+    if (!fold_interfaces[ifold]->eval(fold_data.data(), ievs.size(), fold_res)) return false;
+    if (fold_res.size()!=ievs.size()*nout){
+      IVYerr << "IvyXGBoostKFoldInterface::eval: The model of fold " << ifold << " returned " << fold_res.size() << " values for " << ievs.size() << " events, but " << nout << " values per event are expected." << endl;
+      return false;
+    }
+
+    // Scatter the scores back to the positions of the events.
+    for (size_t jev=0; jev<ievs.size(); jev++) std::copy(fold_res.begin() + jev*nout, fold_res.begin() + (jev+1)*nout, res.begin() + ievs[jev]*nout);
+  }
+  return true;
+}
+template bool IvyXGBoostKFoldInterface::eval<float>(IvyMLDataType_t const* data, unsigned long long const* event_numbers, unsigned long long nevents, std::vector<float>& res);
+template bool IvyXGBoostKFoldInterface::eval<double>(IvyMLDataType_t const* data, unsigned long long const* event_numbers, unsigned long long nevents, std::vector<double>& res);
+
+template<typename T> bool IvyXGBoostKFoldInterface::evalBound(unsigned long long const& event_number, T* res){
+  if (fold_interfaces.empty()){
+    IVYerr << "IvyXGBoostKFoldInterface::evalBound: The interfaces of the folds are not built." << endl;
+    return false;
+  }
+  IvyXGBoostInterface* fold_interface = fold_interfaces.at(this->getFold(event_number)).get();
+  std::copy(input_buffer.begin(), input_buffer.end(), fold_interface->getInputBuffer());
+  return fold_interface->evalBound(res);
+}
+template bool IvyXGBoostKFoldInterface::evalBound<float>(unsigned long long const& event_number, float* res);
+template bool IvyXGBoostKFoldInterface::evalBound<double>(unsigned long long const& event_number, double* res);
+
+#endif
@@ -0,0 +1,87 @@
+#ifndef IVYXGBOOSTMODELREGISTRY_H
+#define IVYXGBOOSTMODELREGISTRY_H
+
+#include <string>
+#include <memory>
+#include <mutex>
+#include <unordered_map>
+#include <xgboost/c_api.h>
+#if defined(__has_include)
+#if __has_include(<xgboost/version_config.h>)
+#include <xgboost/version_config.h>
+#endif
+#endif
+#include "IvyFramework/IvyDataTools/interface/StdExtensions.h"
+#include "IvyFramework/IvyDataTools/interface/IvyStreamHelpers.hh"
+
+
+#define SAFE_XGBOOST(CALL) \
+{ int err_call = (CALL); if (err_call!=0){ IvyStreamHelpers::IVYerr << "Call '" << #CALL << "' returned error code " << err_call << ". XGBoost last error: " << XGBGetLastError() << std::endl; } }
+
+
+// XGBoost >= 1.0 can serialize the full state of a booster, including its configuration, into a memory buffer.
+#if defined(XGBOOST_VER_MAJOR)
+#define IVYXGBOOST_HAS_SERIALIZE_TO_BUFFER
+#endif
+
+
+// Process-wide registry of the XGBoost models loaded from files.
+// Each model file is loaded only once as long as some user holds a handle to it, and all users share the same booster.
+// The models are identified by the canonical path of the file together with its modification time and size,
+// so a model file that is overwritten in the meantime is loaded again.
+// The shared boosters should be treated as read-only.
+// A serialized copy of each booster is kept from the time it is loaded, so independent boosters can be created from it
+// without accessing the shared booster while other users run predictions on it.
+class IvyXGBoostModelRegistry{
+public:
+  // A model shared between its users. The booster is freed when the last handle is released.
+  class SharedModel{
+    friend class IvyXGBoostModelRegistry;
+
+  protected:
+    std::string key;
+    std::once_flag load_flag;
+    bool load_success;
+    // Serialized copy of the booster taken right after the model is loaded
+    std::string model_buffer;
+
+  public:
+    BoosterHandle booster;
+    // Mutex for operations on the shared booster that are not thread-safe (e.g., predictions through DMatrix objects)
+    std::mutex mutex;
+
+    SharedModel(std::string const& key_);
+    SharedModel(SharedModel const&) = delete;
+    SharedModel& operator=(SharedModel const&) = delete;
+    ~SharedModel();
+
+    std::string const& getKey() const{ return key; }
+    std::string const& getModelBuffer() const{ return model_buffer; }
+  };
+
+protected:
+  std::mutex registry_mutex;
+  std::unordered_map<std::string, std::weak_ptr<SharedModel>> models;
+
+  IvyXGBoostModelRegistry(){}
+
+public:
+  IvyXGBoostModelRegistry(IvyXGBoostModelRegistry const&) = delete;
+  IvyXGBoostModelRegistry& operator=(IvyXGBoostModelRegistry const&) = delete;
+
+  static IvyXGBoostModelRegistry& instance();
+
+  // Returns the identifier of a model file (canonical path, modification time, and size), or an empty string if the file cannot be accessed.
+  static std::string getModelKey(TString const& fname);
+
+  // Returns a handle to the model in the file fname (with environment variables already expanded), loading it if no other user holds it.
+  // Concurrent calls for the same file load the model only once. A null handle is returned if the model cannot be loaded.
+  std::shared_ptr<SharedModel> getModel(TString const& fname);
+
+  // Number of models currently held by some user
+  size_t getNModels();
+
+};
+
+
+#endif
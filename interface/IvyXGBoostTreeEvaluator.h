@@ -0,0 +1,95 @@
+#ifndef IVYXGBOOSTTREEEVALUATOR_H
+#define IVYXGBOOSTTREEEVALUATOR_H
+
+#include <string>
+#include "IvyMLWrapper.h"
+
+
+// A compact evaluator of XGBoost tree ensembles that parses the saved models and walks their trees itself, without calling the XGBoost C API.
+// It is compiled into the same library as IvyXGBoostInterface, so the library still links to libxgboost.
+// The model is read from the JSON or UBJSON files saved by XGBoost (e.g., IvyXGBoostTrainer.save_model with a '.json' or '.ubj' extension,
+// or any other non-'.dump' extension with XGBoost >= 2),
+// and the trees are stored as flattened node arrays (struct-of-arrays) that are walked directly.
+// Only 'gbtree' models with numerical splits and scalar leaves are supported.
+//
+// After build, the evaluator is read-only except for the buffers of the bound evaluation,
+// so the map and batch eval functions can be called concurrently from different threads.
+class IvyXGBoostTreeEvaluator : public IvyMLWrapper{
+public:
+  // Transformation of the margins into the output scores
+  enum ObjectiveTransform{
+    kIdentity,
+    kSigmoid,
+    kSoftmax,
+    kArgmax,
+    kExp,
+    kHinge,
+    kUnknownTransform
+  };
+
+protected:
+  IvyMLDataType_t defval;
+  std::vector<TString> variable_names;
+
+  // Node arrays of all trees. The children indices are absolute indices in these arrays, and they are -1 for leaves.
+  // node_values holds the split threshold for internal nodes and the leaf value for leaves.
+  std::vector<int> node_left;
+  std::vector<int> node_right;
+  std::vector<unsigned int> node_feature;
+  std::vector<IvyMLDataType_t> node_values;
+  std::vector<unsigned char> node_default_left;
+
+  // Index of the root node and output group of each tree
+  std::vector<unsigned int> tree_roots;
+  std::vector<unsigned int> tree_groups;
+
+  // Number of output groups (number of classes for multi-class models), initial margin of each group, and transformation of the margins
+  unsigned int nGroups;
+  std::vector<IvyMLDataType_t> base_margins;
+  std::string objective;
+  ObjectiveTransform transform;
+
+  // Input and margin buffers of the bound evaluation
+  std::vector<IvyMLDataType_t> input_buffer;
+  std::vector<IvyMLDataType_t> margin_buffer;
+
+  // Adds the margins of all trees for one event to the nGroups values in margins.
+  void accumulateMargins(IvyMLDataType_t const* data, IvyMLDataType_t* margins) const;
+  // Transforms the margins of one event into the output scores according to the objective.
+  // scores can be the same buffer as margins.
+  void transformMargins(IvyMLDataType_t const* margins, IvyMLDataType_t* scores) const;
+
+public:
+  IvyXGBoostTreeEvaluator();
+  virtual ~IvyXGBoostTreeEvaluator(){}
+
+  bool build(TString fname, std::vector<TString> const& varnames, IvyMLDataType_t missing_entry_val);
+
+  std::vector<TString> const& getVariableNames() const{ return variable_names; }
+  unsigned int getNTrees() const{ return tree_roots.size(); }
+  std::string const& getObjective() const{ return objective; }
+  unsigned int getNOutputs() const{ return (transform==kArgmax ? 1 : nGroups); }
+
+  // Returns the transformation of the margins for an XGBoost objective name, or kUnknownTransform if the objective is not supported.
+  static ObjectiveTransform getObjectiveTransform(std::string const& objective_name);
+
+  template<typename T> bool eval(std::unordered_map<TString, IvyMLDataType_t> const& vars, std::vector<T>& res) const;
+  template<typename T> bool eval(std::unordered_map<TString, IvyMLDataType_t> const& vars, T& res) const;
+
+  // Batch evaluation, with the same conventions as IvyXGBoostInterface::eval:
+  // data is a contiguous row-major buffer of nevents x getVariableNames().size() values, and
+  // res is filled as a row-major buffer of nevents x getNOutputs() values.
+  // The trees are walked tree by tree over all events, so each tree stays in cache while it is used.
+  template<typename T> bool eval(IvyMLDataType_t const* data, unsigned long long nevents, std::vector<T>& res) const;
+
+  // Bound evaluation, with the same conventions as IvyXGBoostInterface::evalBound
+  int getVariableIndex(TString const& varname) const;
+  IvyMLDataType_t* bindVariable(TString const& varname);
+  IvyMLDataType_t* getInputBuffer(){ return input_buffer.data(); }
+  void resetInputs();
+  template<typename T> bool evalBound(T* res);
+
+};
+
+
+#endif
@@ -0,0 +1,116 @@
+#ifndef IVYXGBOOSTTREEEVALUATOR_HPP
+#define IVYXGBOOSTTREEEVALUATOR_HPP
+
+#include <cassert>
+#include <cmath>
+#include "IvyFramework/IvyDataTools/interface/IvyStreamHelpers.hh"
+#include "IvyXGBoostTreeEvaluator.h"
+
+
+using namespace std;
+using namespace IvyStreamHelpers;
+
+
+template<typename T> bool IvyXGBoostTreeEvaluator::eval(std::unordered_map<TString, IvyMLDataType_t> const& vars, std::vector<T>& res) const{
+  res.clear();
+  if (tree_roots.empty()){
+    IVYerr << "IvyXGBoostTreeEvaluator::eval: The trees are not built." << endl;
+    return false;
+  }
+
+  std::vector<IvyMLDataType_t> data_arr; data_arr.reserve(variable_names.size());
+  for (auto& vv:variable_names){
+    auto it_vars = vars.find(vv);
+    if (it_vars==vars.end()) data_arr.push_back(defval);
+    else data_arr.push_back(it_vars->second);
+  }
+
+  std::vector<IvyMLDataType_t> scores(nGroups, 0);
+  this->accumulateMargins(data_arr.data(), scores.data());
+  this->transformMargins(scores.data(), scores.data());
+
+  const unsigned int nout = this->getNOutputs();
+  res.reserve(nout);
+  for (unsigned int rr=0; rr<nout; rr++) res.push_back(static_cast<T>(scores[rr]));
+  return true;
+}
+template bool IvyXGBoostTreeEvaluator::eval<float>(std::unordered_map<TString, IvyMLDataType_t> const& vars, std::vector<float>& res) const;
+template bool IvyXGBoostTreeEvaluator::eval<double>(std::unordered_map<TString, IvyMLDataType_t> const& vars, std::vector<double>& res) const;
+
+template<typename T> bool IvyXGBoostTreeEvaluator::eval(std::unordered_map<TString, IvyMLDataType_t> const& vars, T& res) const{
+  std::vector<T> vres;
+  bool success = this->eval(vars, vres);
+  if (vres.empty() || vres.size()!=1){
+    IVYerr << "IvyXGBoostTreeEvaluator::eval: The vector of results has size = " << vres.size() << " != 1." << endl;
+    assert(0);
+    success = false;
+  }
+
+  res = vres.front();
+  return success;
+}
+template bool IvyXGBoostTreeEvaluator::eval<float>(std::unordered_map<TString, IvyMLDataType_t> const& vars, float& res) const;
+template bool IvyXGBoostTreeEvaluator::eval<double>(std::unordered_map<TString, IvyMLDataType_t> const& vars, double& res) const;
+
+template<typename T> bool IvyXGBoostTreeEvaluator::eval(IvyMLDataType_t const* data, unsigned long long nevents, std::vector<T>& res) const{
+  res.clear();
+  if (tree_roots.empty()){
+    IVYerr << "IvyXGBoostTreeEvaluator::eval: The trees are not built." << endl;
+    return false;
+  }
+  if (nevents==0) return true;
+
+  const unsigned long long nFeatures = variable_names.size();
+  const bool defval_is_nan = std::isnan(defval);
+
+  std::vector<IvyMLDataType_t> margins(nevents*nGroups, 0);
+  for (unsigned long long iev=0; iev<nevents; iev++){
+    for (unsigned int ig=0; ig<nGroups; ig++) margins[iev*nGroups + ig] = base_margins[ig];
+  }
+  // Loop over the trees first so that the nodes of each tree stay in cache.
+  // The margins of each event are still accumulated in the same order of trees as in accumulateMargins.
+  for (size_t itree=0; itree<tree_roots.size(); itree++){
+    const int iroot = tree_roots[itree];
+    const unsigned int group = tree_groups[itree];
+    IvyMLDataType_t const* data_ev = data;
+    for (unsigned long long iev=0; iev<nevents; iev++){
+      int inode = iroot;
+      while (node_left[inode]>=0){
+        IvyMLDataType_t const& val = data_ev[node_feature[inode]];
+        if (std::isnan(val) || (!defval_is_nan && val==defval)) inode = (node_default_left[inode] ? node_left[inode] : node_right[inode]);
+        else inode = (val<node_values[inode] ? node_left[inode] : node_right[inode]);
+      }
+      margins[iev*nGroups + group] += node_values[inode];
+      data_ev += nFeatures;
+    }
+  }
+
+  const unsigned int nout = this->getNOutputs();
+  res.reserve(nevents*nout);
+  for (unsigned long long iev=0; iev<nevents; iev++){
+    IvyMLDataType_t* margins_ev = margins.data() + iev*nGroups;
+    this->transformMargins(margins_ev, margins_ev);
+    for (unsigned int rr=0; rr<nout; rr++) res.push_back(static_cast<T>(margins_ev[rr]));
+  }
+  return true;
+}
+template bool IvyXGBoostTreeEvaluator::eval<float>(IvyMLDataType_t const* data, unsigned long long nevents, std::vector<float>& res) const;
+template bool IvyXGBoostTreeEvaluator::eval<double>(IvyMLDataType_t const* data, unsigned long long nevents, std::vector<double>& res) const;
+
+template<typename T> bool IvyXGBoostTreeEvaluator::evalBound(T* res){
+  if (tree_roots.empty()){
+    IVYerr << "IvyXGBoostTreeEvaluator::evalBound: The trees are not built." << endl;
+    return false;
+  }
+
+  this->accumulateMargins(input_buffer.data(), margin_buffer.data());
+  this->transformMargins(margin_buffer.data(), margin_buffer.data());
+
+  const unsigned int nout = this->getNOutputs();
+  for (unsigned int rr=0; rr<nout; rr++) res[rr] = static_cast<T>(margin_buffer[rr]);
+  return true;
+}
+template bool IvyXGBoostTreeEvaluator::evalBound<float>(float* res);
+template bool IvyXGBoostTreeEvaluator::evalBound<double>(double* res);
+
+#endif
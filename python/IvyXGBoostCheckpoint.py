@@ -0,0 +1,70 @@
+import os
+import xgboost as xgb
+
+
+class IvyXGBoostCheckpoint(xgb.callback.TrainingCallback):
+   """
+   A training callback that saves the booster into a checkpoint file every few boosting rounds,
+   so that an interrupted training (e.g., a preempted batch job) can be resumed through IvyXGBoostTrainer::train.
+   The total number of rounds of the training is stored in the checkpoint as a booster attribute,
+   so the number of remaining rounds is known when the training is resumed.
+   """
+   target_rounds_attr = "ivyxgb_checkpoint_target_rounds"
+
+   def __init__(self, fname, interval, target_rounds):
+      """
+      IvyXGBoostCheckpoint constructor:
+      - fname: Name of the checkpoint file. The extension sets the format of the model as in xgb.Booster.save_model.
+      - interval: Number of rounds between two checkpoints
+      - target_rounds: Total number of boosted rounds at the end of the training, including those of the initial model
+      """
+      if interval is None or interval<=0:
+         raise RuntimeError("IvyXGBoostCheckpoint: The checkpoint interval should be positive.")
+      self.fname = fname
+      self.interval = interval
+      self.target_rounds = target_rounds
+      super().__init__()
+
+
+   def after_iteration(self, model, epoch, evals_log):
+      """
+      Saves the booster if the number of boosted rounds is a multiple of the checkpoint interval.
+      """
+      if (epoch+1) % self.interval == 0:
+         self.save(model, self.target_rounds)
+      return False
+
+
+   def after_training(self, model):
+      """
+      Saves the final booster, marked as complete so that resuming from this checkpoint does not boost more rounds (e.g., after early stopping).
+      The checkpoint attribute is removed from the returned booster.
+      """
+      self.save(model, model.num_boosted_rounds())
+      model.set_attr(**{ self.target_rounds_attr: None })
+      return model
+
+
+   def save(self, model, target_rounds):
+      """
+      Writes the booster into the checkpoint file.
+      The booster is written into a temporary file first and renamed afterward, so an interruption never leaves a partial checkpoint.
+      """
+      model.set_attr(**{ self.target_rounds_attr: str(target_rounds) })
+      fname_root, fname_ext = os.path.splitext(self.fname)
+      fname_tmp = "{}.tmp{}".format(fname_root, fname_ext)
+      model.save_model(fname_tmp)
+      os.replace(fname_tmp, self.fname)
+
+
+   @staticmethod
+   def load(fname):
+      """
+      Loads a checkpoint file and returns the booster and the total number of rounds of the training.
+      """
+      booster = xgb.Booster(model_file=fname)
+      target_rounds = booster.attr(IvyXGBoostCheckpoint.target_rounds_attr)
+      if target_rounds is None:
+         raise RuntimeError("IvyXGBoostCheckpoint::load: The file {} is not a checkpoint of IvyXGBoostTrainer.".format(fname))
+      booster.set_attr(**{ IvyXGBoostCheckpoint.target_rounds_attr: None })
+      return booster, int(target_rounds)
@@ -0,0 +1,126 @@
+import os
+import tempfile
+import numpy as np
+
+
+class IvyXGBoostDataBuffer:
+   """
+   A growable columnar storage for data arrays that share the same number of rows (e.g., features, weights, and class values).
+   The capacity of the storage is doubled whenever it is exhausted, so appending data in many small pieces costs linear time overall.
+   """
+   def __init__(self, initial_capacity=1024, storage_dir=None):
+      """
+      IvyXGBoostDataBuffer constructor:
+      - initial_capacity: Number of rows allocated at the first call to IvyXGBoostDataBuffer::append. Default: 1024.
+      - storage_dir: If set, the columns are memory-mapped files in this directory instead of arrays in memory. Default: None.
+
+      File-backed columns let the operating system page the data in and out as needed, so the stored data can be larger than the available memory.
+      The files are unlinked right after they are mapped, so they are removed automatically once the columns are released.
+      """
+      self.initial_capacity = max(1, int(initial_capacity))
+      self.storage_dir = storage_dir
+      self.columns = None
+      self.size = 0
+
+
+   def __len__(self):
+      return self.size
+
+
+   def _allocate(self, shape, dtype):
+      """
+      Returns a new uninitialized array, which is memory-mapped to an anonymous file if self.storage_dir is set.
+      """
+      if self.storage_dir is None:
+         return np.empty(shape, dtype=dtype)
+      os.makedirs(self.storage_dir, exist_ok=True)
+      fd, fname = tempfile.mkstemp(prefix="IvyXGBoostDataBuffer_", suffix=".dat", dir=self.storage_dir)
+      os.close(fd)
+      try:
+         res = np.memmap(fname, mode='w+', dtype=dtype, shape=shape)
+      finally:
+         os.unlink(fname)
+      return res
+
+
+   def capacity(self):
+      """
+      Returns the number of rows that can be stored before the next reallocation.
+      """
+      return (self.columns[0].shape[0] if self.columns is not None else 0)
+
+
+   def reserve(self, nrows):
+      """
+      Ensures that at least nrows rows can be stored without a reallocation.
+      The columns need to be defined through a previous call to IvyXGBoostDataBuffer::append.
+      """
+      if self.columns is None:
+         raise RuntimeError("IvyXGBoostDataBuffer::reserve: The column layout is not defined yet.")
+      if nrows <= self.capacity():
+         return
+      new_columns = []
+      for col in self.columns:
+         new_col = self._allocate((nrows,)+col.shape[1:], col.dtype)
+         new_col[0:self.size] = col[0:self.size]
+         new_columns.append(new_col)
+      self.columns = new_columns
+
+
+   def append(self, *arrays):
+      """
+      Appends rows to the storage.
+      - arrays: One array per column. All arrays need to have the same number of rows.
+
+      The number of columns, their data types, and the shapes of their rows are fixed by the first call.
+      Arrays passed in later calls are cast to the stored data types.
+      """
+      nrows = arrays[0].shape[0]
+      for arr in arrays:
+         if arr.shape[0] != nrows:
+            raise RuntimeError("IvyXGBoostDataBuffer::append: All arrays should have the same number of rows.")
+      if self.columns is None:
+         capacity = max(self.initial_capacity, nrows)
+         self.columns = [ self._allocate((capacity,)+arr.shape[1:], arr.dtype) for arr in arrays ]
+      elif len(arrays) != len(self.columns):
+         raise RuntimeError("IvyXGBoostDataBuffer::append: The number of arrays ({}) is different from the number of columns ({}).".format(len(arrays), len(self.columns)))
+      else:
+         for arr, col in zip(arrays, self.columns):
+            if arr.shape[1:] != col.shape[1:]:
+               raise RuntimeError("IvyXGBoostDataBuffer::append: The row shape {} is inconsistent with the stored shape {}.".format(arr.shape[1:], col.shape[1:]))
+
+      nrows_needed = self.size + nrows
+      if nrows_needed > self.capacity():
+         self.reserve(max(nrows_needed, 2*self.capacity()))
+      for arr, col in zip(arrays, self.columns):
+         col[self.size:nrows_needed] = arr
+      self.size = nrows_needed
+
+
+   def take(self, indices):
+      """
+      Rearranges the stored rows such that the new row i is the old row indices[i].
+      Rows that are not selected by the indices are dropped.
+
+      The columns are gathered one at a time, so the additional memory needed is that of the largest column.
+      """
+      nrows = indices.shape[0]
+      for icol in range(len(self.columns)):
+         col = self.columns[icol]
+         new_col = self._allocate(col.shape, col.dtype)
+         np.take(col[0:self.size], indices, axis=0, out=new_col[0:nrows], mode='clip') # mode='raise' would buffer the output
+         self.columns[icol] = new_col
+         del col
+      self.size = nrows
+
+
+   def views(self, begin=0, end=None):
+      """
+      Returns a list of views (no copies) of the stored columns for the row range [begin, end).
+      If end is None, the range extends to the last stored row.
+      """
+      if self.columns is None:
+         return None
+      if end is None:
+         end = self.size
+      return [ col[begin:end] for col in self.columns ]
@@ -0,0 +1,133 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+import numpy as np
+
+
+class IvyXGBoostDataCache:
+   """
+   An on-disk cache of the decoded arrays read from ROOT files (e.g., the float32 features, weights, and class values built by IvyXGBoostDataInput::load_input).
+   Each entry is stored as a directory of .npy files, and cached arrays are memory-mapped when they are loaded back.
+   The total size of the cache is capped, and the least recently used entries are evicted first.
+   """
+   array_names = [ "features", "weights", "classes" ]
+
+   def __init__(self, cache_dir, max_size=10*1024**3):
+      """
+      IvyXGBoostDataCache constructor:
+      - cache_dir: Directory where the cached arrays are stored. It is created if it does not exist.
+      - max_size: Maximum total size of the cache in bytes. Default: 10 GiB.
+      """
+      self.cache_dir = os.path.abspath(os.path.expanduser(cache_dir))
+      self.max_size = int(max_size)
+      if self.max_size<=0:
+         raise RuntimeError("IvyXGBoostDataCache: The maximum cache size should be positive.")
+      os.makedirs(self.cache_dir, exist_ok=True)
+      self.lock = threading.Lock()
+
+
+   def make_key(self, file_name, **settings):
+      """
+      Returns the cache key for the arrays read from a file.
+      - file_name: Input file name. Its absolute path, modification time, and size are part of the key.
+      - settings: Any other setting that affects the content of the arrays (tree name, features, weight branch, class settings, entry range, etc.).
+        The values need to be serializable to JSON.
+      """
+      fstat = os.stat(file_name)
+      key_info = dict(settings)
+      key_info['file_name'] = os.path.abspath(file_name)
+      key_info['file_mtime'] = fstat.st_mtime_ns
+      key_info['file_size'] = fstat.st_size
+      return hashlib.sha1(json.dumps(key_info, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+   def load(self, key, array_names=None):
+      """
+      Returns the tuple of memory-mapped arrays stored with the given key, or None if the key is not in the cache.
+      - array_names: Names of the arrays in the entry. Default: None, i.e., IvyXGBoostDataCache.array_names.
+      """
+      if array_names is None:
+         array_names = self.array_names
+      entry_dir = os.path.join(self.cache_dir, key)
+      try:
+         res = tuple([ np.load(os.path.join(entry_dir, "{}.npy".format(aname)), mmap_mode='r') for aname in array_names ])
+         # Mark the entry as recently used
+         os.utime(entry_dir)
+      except FileNotFoundError:
+         return None
+      return res
+
+
+   def store(self, key, arrays, array_names=None):
+      """
+      Stores the tuple of arrays with the given key, and evicts the least recently used entries if the cache size exceeds the maximum.
+      - array_names: Names of the arrays. Default: None, i.e., IvyXGBoostDataCache.array_names.
+      The entry is written to a temporary directory first and renamed afterward, so other processes never see incomplete entries.
+      """
+      if array_names is None:
+         array_names = self.array_names
+      if len(arrays)!=len(array_names):
+         raise RuntimeError("IvyXGBoostDataCache::store: {} arrays are expected, but {} are given.".format(len(array_names), len(arrays)))
+      entry_dir = os.path.join(self.cache_dir, key)
+      tmp_dir = tempfile.mkdtemp(prefix=".tmp_", dir=self.cache_dir)
+      try:
+         for aname, arr in zip(array_names, arrays):
+            np.save(os.path.join(tmp_dir, "{}.npy".format(aname)), arr)
+         os.rename(tmp_dir, entry_dir)
+      except OSError:
+         # Another thread or process may have stored the same entry in the meantime.
+         shutil.rmtree(tmp_dir, ignore_errors=True)
+      self.evict()
+
+
+   def entries(self):
+      """
+      Returns the list of (key, size in bytes, last access time) of the cached entries, ordered from the least to the most recently used.
+      """
+      res = []
+      for key in os.listdir(self.cache_dir):
+         if key.startswith("."):
+            continue
+         entry_dir = os.path.join(self.cache_dir, key)
+         try:
+            entry_size = sum([ os.path.getsize(os.path.join(entry_dir, fname)) for fname in os.listdir(entry_dir) ])
+            entry_time = os.path.getmtime(entry_dir)
+         except OSError:
+            continue
+         res.append((key, entry_size, entry_time))
+      res.sort(key=lambda x: x[2])
+      return res
+
+
+   def size(self):
+      """
+      Returns the total size of the cached entries in bytes.
+      """
+      return sum([ x[1] for x in self.entries() ])
+
+
+   def evict(self, max_size=None):
+      """
+      Removes the least recently used entries until the total size is not larger than max_size (default: the maximum size of the cache).
+      Arrays that are already memory-mapped remain valid after the removal of their files.
+      """
+      if max_size is None:
+         max_size = self.max_size
+      with self.lock:
+         entries = self.entries()
+         total_size = sum([ x[1] for x in entries ])
+         for key, entry_size, _ in entries:
+            if total_size<=max_size:
+               break
+            shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+            total_size -= entry_size
+
+
+   def clear(self):
+      """
+      Removes all cached entries.
+      """
+      self.evict(0)
@@ -1,21 +1,69 @@
+import re
+import ast
+import glob
 import uproot
 import numpy as np
-from sklearn.model_selection import train_test_split
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from IvyXGBoostDataBuffer import IvyXGBoostDataBuffer
+from IvyXGBoostProfiler import IvyXGBoostProfiler
 
 
 class IvyXGBoostDataInput:
-   def __init__(self, feature_names, class_branch_name = None, missing_value_default = -999.):
+   partition_names = [ "train", "test", "control" ]
+   # Functions and constants that can be used in the selection and derived feature expressions of IvyXGBoostDataInput::load_input
+   expression_namespace = dict(
+      np = np,
+      pi = np.pi,
+      abs = np.abs,
+      sqrt = np.sqrt,
+      exp = np.exp,
+      log = np.log,
+      log10 = np.log10,
+      sin = np.sin,
+      cos = np.cos,
+      tan = np.tan,
+      arcsin = np.arcsin,
+      arccos = np.arccos,
+      arctan = np.arctan,
+      arctan2 = np.arctan2,
+      sinh = np.sinh,
+      cosh = np.cosh,
+      tanh = np.tanh,
+      hypot = np.hypot,
+      minimum = np.minimum,
+      maximum = np.maximum,
+      where = np.where,
+      floor = np.floor,
+      ceil = np.ceil,
+      sign = np.sign,
+      isfinite = np.isfinite,
+      delta_phi = (lambda phi1, phi2: np.mod(phi1 - phi2 + np.pi, 2.*np.pi) - np.pi),
+      delta_r = (lambda eta1, phi1, eta2, phi2: np.hypot(eta1 - eta2, np.mod(phi1 - phi2 + np.pi, 2.*np.pi) - np.pi))
+   )
+
+   def __init__(self, feature_names, class_branch_name = None, missing_value_default = -999., storage_dir = None, jagged_sort_keys = None):
       """
       IvyXGBoostDataInput constructor:
       - file_name: Input ROOT file name
       - tree_name: Name of TTree in the input file
       - feature_names: A list of input 'features' that will be read from the input TTree.
+        Elements of jagged (or fixed-size array) branches are specified as 'branch[i]', and a range of elements as 'branch[i..j]' (i and j inclusive),
+        e.g., 'jet_pt[0..3]' expands to the four features 'jet_pt[0]', ..., 'jet_pt[3]'. Objects beyond the multiplicity of an entry are set to missing_value_default.
       - class_branch_name: Name of the branch that indicates the 'class' of the data entry. Default: None.
       - missing_value_default: Missing value indicator. Default: -999 (float).
+      - storage_dir: If set, the data are stored in memory-mapped files in this directory so that they do not need to fit in memory. Default: None.
+        This is meant to be used together with the chunked training mode of IvyXGBoostTrainer::train.
+      - jagged_sort_keys: Dictionary of {jagged branch: sort key branch}, where the objects of the jagged branch are ordered by decreasing values of the sort key branch
+        before the elements are taken, e.g., {'jet_eta': 'jet_pt', 'jet_pt': 'jet_pt'}. Default: None, i.e., the objects keep their order in the tree.
+
+      The feature names are those of the expanded list, so they can be passed as is to IvyXGBoostInterface::build,
+      which expands the 'branch[i..j]' names in the same way.
       """
       self.features = feature_names
       if type(self.features) is str:
          self.features = self.features.split(", ")
+      self.features = self._expand_feature_names(self.features)
       if len(self.features)==0:
          raise RuntimeError("There should be at least one feature name.")
       self.class_branch = class_branch_name
@@ -24,12 +72,204 @@ class IvyXGBoostDataInput:
       if self.class_branch in self.features:
          self.features.remove(self.class_branch)
       self.missing_value_default = np.float32(missing_value_default)
-      self.data_train = None
-      self.data_test = None
-      self.data_control = None
+      self.jagged_sort_keys = dict(jagged_sort_keys) if jagged_sort_keys is not None else dict()
+      jagged_branches = self._get_jagged_branches(self.features)
+      for branch in self.jagged_sort_keys.keys():
+         if branch not in jagged_branches:
+            raise RuntimeError("The sort key of {} is given, but no element of {} is a feature.".format(branch, branch))
+      # Master storage of the [features, weights, class values, entry ids, event numbers] arrays of all added samples.
+      # The entry ids record the order in which entries were added, independent of their current position in the storage.
+      self.buffer = IvyXGBoostDataBuffer(storage_dir=storage_dir)
+      # Split settings of each call to add_data
+      self.samples = []
+      # Random seed used for shuffling in IvyXGBoostDataInput::split
+      self.split_seed = 12345
+      # Ranges [begin, end) of the training, test, and control partitions in the master storage.
+      # None if the partitions need to be rearranged.
+      self.partition_ranges = None
+      # Quantities computed from the partitions (class types, normalized weights), which are reset whenever the partitions change
+      self.partition_cache = dict()
+      # Ranges [begin, end) of the folds in the master storage after IvyXGBoostDataInput::split_folds, or None if the storage is not arranged in folds
+      self.fold_ranges = None
+      # Counter that is incremented whenever the stored entries or their arrangement change,
+      # so that objects built from the partitions (e.g., the DMatrix objects cached by IvyXGBoostTrainer) can tell whether they are outdated.
+      self.data_version = 0
+      # IvyXGBoostProfiler object that records the stages of loading and splitting the data, or None if no profiling is needed
+      self.profiler = None
+
+
+   @property
+   def xgb_feature_names(self):
+      """
+      Feature names passed to XGBoost, where the brackets of the elements of jagged branches are replaced (e.g., 'jet_pt[0]' -> 'jet_pt_0')
+      because XGBoost does not allow them in feature names.
+      """
+      return [ v.replace("[", "_").replace("]", "") for v in self.features ]
+
+
+   @staticmethod
+   def _expand_feature_names(feature_names):
+      """
+      Returns the list of feature names where each 'branch[i..j]' is expanded into 'branch[i]', ..., 'branch[j]'.
+      """
+      res = []
+      for v in feature_names:
+         match = re.fullmatch(r"(.+)\[(\d+)\.\.(\d+)\]", v)
+         if match is None:
+            res.append(v)
+            continue
+         first, last = int(match.group(2)), int(match.group(3))
+         if last<first:
+            raise RuntimeError("The range of elements in the feature name {} is empty.".format(v))
+         res.extend([ "{}[{}]".format(match.group(1), idx) for idx in range(first, last+1) ])
+      return res
+
+
+   @staticmethod
+   def _get_feature_source(feature_name):
+      """
+      Returns the tuple of (branch name, element index) of a feature. The element index is None for features of flat branches.
+      """
+      match = re.fullmatch(r"(.+)\[(\d+)\]", feature_name)
+      if match is None:
+         return feature_name, None
+      return match.group(1), int(match.group(2))
+
+
+   @staticmethod
+   def _get_jagged_branches(feature_names, jagged_sort_keys=None):
+      """
+      Returns the dictionary of {jagged branch: number of elements needed} for a list of features.
+      The sort key branches in jagged_sort_keys are included as well.
+      """
+      res = dict()
+      for v in feature_names:
+         branch, index = IvyXGBoostDataInput._get_feature_source(v)
+         if index is not None:
+            res[branch] = max(res.get(branch, 0), index+1)
+      if jagged_sort_keys is not None:
+         for branch, sort_key in jagged_sort_keys.items():
+            if branch in res and sort_key not in res:
+               res[sort_key] = 0
+      return res
+
+
+   @staticmethod
+   def get_feature_branches(feature_names, jagged_sort_keys=None):
+      """
+      Returns the list of branches needed to build the features in feature_names, including the sort key branches of the jagged branches.
+      """
+      res = [ IvyXGBoostDataInput._get_feature_source(v)[0] for v in feature_names ]
+      res.extend(IvyXGBoostDataInput._get_jagged_branches(feature_names, jagged_sort_keys).keys())
+      return list(dict.fromkeys(res))
+
+
+   @staticmethod
+   def _import_awkward():
+      """
+      Returns the awkward module, which is only needed for jagged branches.
+      """
+      try:
+         import awkward
+      except ImportError:
+         raise RuntimeError("IvyXGBoostDataInput: Features of jagged branches need the awkward module.")
+      return awkward
+
+
+   @staticmethod
+   def read_tree_arrays(tree, branches, jagged_branches, entry_start, entry_stop):
+      """
+      Reads the entries [entry_start, entry_stop) of the branches of a tree, and returns the dictionary of arrays keyed by branch name.
+      The jagged branches (e.g., from IvyXGBoostDataInput::_get_jagged_branches) are read as awkward arrays, and the other branches as numpy arrays.
+      """
+      flat_branches = [ bname for bname in branches if bname not in jagged_branches ]
+      res = dict()
+      if len(flat_branches)>0:
+         res.update(tree.arrays(flat_branches, entry_start=entry_start, entry_stop=entry_stop, library="np"))
+      if len(flat_branches)<len(branches):
+         IvyXGBoostDataInput._import_awkward()
+         arrs_jagged = tree.arrays([ bname for bname in branches if bname in jagged_branches ], entry_start=entry_start, entry_stop=entry_stop, library="ak")
+         for bname in arrs_jagged.fields:
+            res[bname] = arrs_jagged[bname]
+      return res
+
+
+   @staticmethod
+   def fill_feature_matrix(arrs, feature_names, missing_value_default, jagged_sort_keys=None, mask=None):
+      """
+      Returns the float32 feature matrix [rows=entries][columns=features] built from a dictionary of branch arrays.
+      - arrs: Dictionary of arrays keyed by branch name, e.g., from IvyXGBoostDataInput::read_tree_arrays
+      - feature_names: List of expanded feature names
+      - missing_value_default: Value of the elements beyond the multiplicity of an entry in jagged branches
+      - jagged_sort_keys: Dictionary of {jagged branch: sort key branch} (see the IvyXGBoostDataInput constructor). Optional.
+      - mask: Boolean array of the entries to keep. Optional.
+
+      The objects of each jagged branch are sorted, padded or truncated, and converted to a 2D float32 array once,
+      through vectorized awkward operations, and each element is then copied into its column like any flat branch.
+      """
+      jagged_widths = IvyXGBoostDataInput._get_jagged_branches(feature_names)
+      padded_arrs = dict()
+      ak = (IvyXGBoostDataInput._import_awkward() if len(jagged_widths)>0 else None)
+      for branch, width in jagged_widths.items():
+         arr = arrs[branch]
+         sort_key = (jagged_sort_keys.get(branch, None) if jagged_sort_keys is not None else None)
+         if sort_key is not None:
+            arr = arr[ak.argsort(arrs[sort_key], axis=1, ascending=False, stable=True)]
+         arr = ak.values_astype(arr, np.float32)
+         arr = ak.fill_none(ak.pad_none(arr, width, axis=1, clip=True), missing_value_default)
+         padded_arrs[branch] = ak.to_numpy(arr)
+
+      nEntries = len(next(iter(arrs.values())))
+      if mask is not None:
+         nEntries = int(np.count_nonzero(mask))
+      res = np.empty((nEntries, len(feature_names)), dtype=np.float32)
+      for ifeat, v in enumerate(feature_names):
+         branch, index = IvyXGBoostDataInput._get_feature_source(v)
+         col = (arrs[branch] if index is None else padded_arrs[branch][:, index])
+         res[:, ifeat] = (col if mask is None else col[mask])
+      return res
+
+
+   def _partition(self, ipart):
+      """
+      Returns the views of the [features, weights, class values] arrays for the partition with index ipart (0: training, 1: test, 2: control).
+      """
+      if self.buffer.size == 0:
+         return None
+      if self.partition_ranges is None:
+         self.split()
+      begin, end = self.partition_ranges[ipart]
+      if ipart==2 and begin==end:
+         return None
+      return self.buffer.views(begin, end)[0:3]
+
+
+   @property
+   def data_train(self):
+      """
+      List of [features, weights, class values] arrays of the training sample, or None if no data is present.
+      The arrays are views of the internal storage and are invalidated by subsequent calls to IvyXGBoostDataInput::add_data or IvyXGBoostDataInput::split.
+      """
+      return self._partition(0)
 
 
-   def add_data(self, features_data, weights, class_values, train_fraction, control_fraction=None, shuffle=None):
+   @property
+   def data_test(self):
+      """
+      List of [features, weights, class values] arrays of the test (evaluation) sample, or None if no data is present.
+      """
+      return self._partition(1)
+
+
+   @property
+   def data_control(self):
+      """
+      List of [features, weights, class values] arrays of the control sample, or None if no control data is present.
+      """
+      return self._partition(2)
+
+
+   def add_data(self, features_data, weights, class_values, train_fraction, control_fraction=None, shuffle=None, stratify=False, event_numbers=None):
       """
       Add data from an existing set of lists.
       - features_data: 2D numpy array of floats for the feature values arranged as [rows=entries][columns=features]
@@ -38,20 +278,24 @@ class IvyXGBoostDataInput:
       - train_fraction (fT): Fraction of data used for training
       - control_fraction (fC): Fraction of data not used in any training or evaluation (default = None, i.e., inactive)
       - shuffle: If True, the data entries for the training, evaluation, and control (if enabled) samples will be split randomly.
+      - stratify: If True, the fractions are applied to the entries of each class separately. Default: False.
+      - event_numbers: 1D numpy array of non-negative integers that identify the entries, e.g., for k-fold training (see IvyXGBoostDataInput::split_folds).
+        Default: None, i.e., the index of each entry in the order all entries were added.
 
       The fractions of the training, evaluation, and control samples are calculated as (1-fC)*fT, (1-fC)*(1-fT), and fC, respectively.
 
-      If there is more than one class in the added data set, the user must set 'shuffle' to True or False; it cannot be kept as None.
+      If there is more than one class in the added data set and stratify is False, the user must set 'shuffle' to True or False; it cannot be kept as None.
       Otherwise, the behavior for shuffle=None is the same as that for shuffle=False.
+
+      The data are copied once into the master storage, and only the split settings are recorded.
+      The actual split is done by IvyXGBoostDataInput::split the next time data_train, data_test, or data_control is accessed.
       """
       if isinstance(class_values, int) or isinstance(class_values, np.integer):
          class_values = np.full(features_data.shape[0], class_values, dtype=np.int32)
       if isinstance(weights, float) or isinstance(weights, np.floating):
          weights = np.full(features_data.shape[0], weights, dtype=np.float32)
 
-      class_types = np.unique(class_values)
-      nClasses = class_types.size
-      if nClasses > 1 and shuffle is None:
+      if shuffle is None and not stratify and class_values.size>0 and np.any(class_values != class_values[0]):
          raise RuntimeError("IvyXGBoostDataInput::add_data: The option 'shuffle' is None, but there is more than one class in the added data. To ensure this behavior is intended, this function requires shuffle to be set in this special case.")
       if shuffle is None:
          shuffle = False
@@ -59,109 +303,475 @@ class IvyXGBoostDataInput:
       if features_data.shape[0]!=weights.shape[0] or features_data.shape[0]!=class_values.shape[0]:
          raise RuntimeError("IvyXGBoostDataInput::add_data: The number of rows in features, weights, and class values data should be the same.")
 
-      feat_data=[None,None,None]
-      wgt_data=[None,None,None]
-      class_data=[None,None,None]
-      if control_fraction is not None:
-         feat_data[2], feat_data[1], wgt_data[2], wgt_data[1], class_data[2], class_data[1] = train_test_split(
-            features_data, weights, class_values,
-            train_size = control_fraction,
-            random_state = 12345,
-            shuffle = shuffle
+      begin = self.buffer.size
+      end = begin + features_data.shape[0]
+      entry_ids = np.arange(begin, end, dtype=np.int64)
+      if event_numbers is None:
+         event_numbers = entry_ids
+      elif event_numbers.shape[0]!=features_data.shape[0]:
+         raise RuntimeError("IvyXGBoostDataInput::add_data: The number of event numbers should be the same as the number of rows in features.")
+      elif event_numbers.size>0 and np.min(event_numbers)<0:
+         raise RuntimeError("IvyXGBoostDataInput::add_data: Event numbers should not be negative.")
+      with IvyXGBoostProfiler.get_stage(self.profiler, "add_data"):
+         self.buffer.append(features_data, weights, class_values, entry_ids, event_numbers)
+      self.samples.append(
+         dict(
+            begin = begin,
+            end = end,
+            train_fraction = train_fraction,
+            control_fraction = control_fraction,
+            shuffle = shuffle,
+            stratify = stratify
          )
-         features_data = feat_data[1]
-         weights = wgt_data[1]
-         class_values = class_data[1]
-      feat_data[0], feat_data[1], wgt_data[0], wgt_data[1], class_data[0], class_data[1] = train_test_split(
-         features_data, weights, class_values,
-         train_size = train_fraction,
-         random_state = 12345,
-         shuffle = shuffle
       )
+      self.partition_ranges = None
+      self.partition_cache = dict()
+      self.fold_ranges = None
+      self.data_version += 1
 
-      data_train = [feat_data[0], wgt_data[0], class_data[0]]
-      data_test = [feat_data[1], wgt_data[1], class_data[1]]
-      data_control = None
-      if control_fraction is not None:
-         data_control = [feat_data[2], wgt_data[2], class_data[2]]
-      if self.data_train is None:
-         self.data_train = data_train
-         self.data_test = data_test
-      else:
-         for idx in range(0, 3):
-            if self.data_train[idx].ndim == 1:
-               self.data_train[idx] = np.concatenate([self.data_train[idx], data_train[idx]])
-               self.data_test[idx] = np.concatenate([self.data_test[idx], data_test[idx]])
-            else:
-               self.data_train[idx] = np.row_stack([self.data_train[idx], data_train[idx]])
-               self.data_test[idx] = np.row_stack([self.data_test[idx], data_test[idx]])
-      if data_control is not None:
-         if self.data_control is None:
-            self.data_control = data_control
-         else:
-            for idx in range(0, 3):
-               if self.data_control[idx].ndim == 1:
-                  self.data_control[idx] = np.concatenate([self.data_control[idx], data_control[idx]])
-               else:
-                  self.data_control[idx] = np.row_stack([self.data_control[idx], data_control[idx]])
 
+   def split(self, seed=None):
+      """
+      Arranges the stored entries into contiguous training, test, and control partitions.
+      - seed: Random seed used for the samples added with shuffle=True. If None, the seed of the previous split is kept (default: 12345).
+
+      This function is called automatically when data_train, data_test, or data_control is accessed after new data are added,
+      but it can also be called explicitly in order to re-split the data with a different seed without reloading them.
+      The split of each sample depends only on the seed and the order in which the samples were added.
 
-   def load_input(self, file_name, tree_name, train_fraction, control_fraction=None, shuffle=None, weight_name=None, class_type=None):
+      The entries are rearranged within the master storage through a single gather operation per array,
+      so the partitions are exposed as views instead of copies.
       """
-      Loads a ROOT file with a TTree in it.
-      - file_name: Input ROOT file name
+      if seed is not None:
+         self.split_seed = seed
+      if self.buffer.size == 0:
+         return
+
+      with IvyXGBoostProfiler.get_stage(self.profiler, "split"):
+         class_by_id = None
+         if any([ sample['stratify'] for sample in self.samples ]):
+            stored_data = self.buffer.views()
+            class_by_id = np.empty(self.buffer.size, dtype=stored_data[2].dtype)
+            class_by_id[stored_data[3]] = stored_data[2]
+            del stored_data
+
+         part_ids = [ [], [], [] ]
+         for isample, sample in enumerate(self.samples):
+            ids = np.arange(sample['begin'], sample['end'], dtype=np.int64)
+            if sample['shuffle']:
+               ids = np.random.default_rng([ self.split_seed, isample ]).permutation(ids)
+            id_groups = [ ids ]
+            if sample['stratify']:
+               # Group the entries by class while keeping their order within each class
+               sample_classes = class_by_id[ids]
+               order = np.argsort(sample_classes, kind='stable')
+               ids = ids[order]
+               class_boundaries = np.flatnonzero(np.diff(sample_classes[order]))+1
+               id_groups = np.split(ids, class_boundaries)
+            for ids_group in id_groups:
+               nControl = 0
+               if sample['control_fraction'] is not None:
+                  nControl = int(np.floor(sample['control_fraction']*ids_group.size))
+               nTrain = int(np.floor(sample['train_fraction']*(ids_group.size-nControl)))
+               part_ids[2].append(ids_group[0:nControl])
+               part_ids[0].append(ids_group[nControl:nControl+nTrain])
+               part_ids[1].append(ids_group[nControl+nTrain:])
+         part_sizes = [ sum([ ids.size for ids in part_ids[ipart] ]) for ipart in range(0, 3) ]
+         target_ids = np.concatenate(part_ids[0] + part_ids[1] + part_ids[2])
+         del part_ids
+
+         current_ids = self.buffer.views()[3]
+         if not np.array_equal(current_ids, target_ids):
+            positions = np.empty(current_ids.size, dtype=np.int64)
+            positions[current_ids] = np.arange(current_ids.size, dtype=np.int64)
+            del current_ids
+            self.buffer.take(positions[target_ids])
+
+      self.partition_ranges = [
+         (0, part_sizes[0]),
+         (part_sizes[0], part_sizes[0]+part_sizes[1]),
+         (part_sizes[0]+part_sizes[1], part_sizes[0]+part_sizes[1]+part_sizes[2])
+      ]
+      self.partition_cache = dict()
+      self.fold_ranges = None
+      self.data_version += 1
+
+
+   def split_folds(self, nfolds):
+      """
+      Arranges the stored entries into nfolds contiguous folds for k-fold training, where the fold of an entry is its event number modulo nfolds.
+      The train, test, and control partitions are ignored, so all entries are assigned to a fold.
+      The entries keep their relative order within each fold, so the arrangement does not depend on the split settings or the seed.
+      Returns the list of (begin, end) ranges of the folds in the storage.
+
+      The folds are exposed through IvyXGBoostDataInput::get_fold_data without copying the data.
+      Accessing data_train, data_test, or data_control afterward re-splits the storage into partitions and invalidates the folds.
+      """
+      if nfolds<2:
+         raise RuntimeError("IvyXGBoostDataInput::split_folds: The number of folds should be at least 2.")
+      if self.buffer.size == 0:
+         raise RuntimeError("IvyXGBoostDataInput::split_folds: There are no data to split.")
+      if self.fold_ranges is not None and len(self.fold_ranges)==nfolds:
+         return list(self.fold_ranges)
+
+      with IvyXGBoostProfiler.get_stage(self.profiler, "split_folds"):
+         stored_data = self.buffer.views()
+         folds = stored_data[4] % nfolds
+         order = np.argsort(folds, kind='stable')
+         fold_sizes = np.bincount(folds, minlength=nfolds)
+         del folds
+         if not np.array_equal(order, np.arange(order.size)):
+            del stored_data
+            self.buffer.take(order)
+         del order
+
+      fold_ends = np.cumsum(fold_sizes)
+      self.fold_ranges = [ (int(fold_ends[ifold]-fold_sizes[ifold]), int(fold_ends[ifold])) for ifold in range(nfolds) ]
+      self.partition_ranges = None
+      self.partition_cache = dict()
+      self.data_version += 1
+      return list(self.fold_ranges)
+
+
+   def get_fold_data(self, folds):
+      """
+      Returns the list of [features, weights, class values] views for each fold in the list of fold indices folds.
+      IvyXGBoostDataInput::split_folds needs to be called beforehand.
+      """
+      if self.fold_ranges is None:
+         raise RuntimeError("IvyXGBoostDataInput::get_fold_data: The data are not arranged in folds. Please call IvyXGBoostDataInput::split_folds first.")
+      return [ self.buffer.views(*self.fold_ranges[ifold])[0:3] for ifold in folds ]
+
+
+   def get_fold_entry_ids(self, ifold):
+      """
+      Returns the view of the indices of the entries of a fold in the order all entries were added.
+      IvyXGBoostDataInput::split_folds needs to be called beforehand.
+      """
+      if self.fold_ranges is None:
+         raise RuntimeError("IvyXGBoostDataInput::get_fold_entry_ids: The data are not arranged in folds. Please call IvyXGBoostDataInput::split_folds first.")
+      return self.buffer.views(*self.fold_ranges[ifold])[3]
+
+
+   def get_fold_weights(self, folds, scale_weights=True):
+      """
+      Returns the list of absolute weights of each fold in the list of fold indices folds for use in training.
+      - scale_weights: If True, the weights of each class are scaled such that their sum over all folds in the list is equal to the average number of entries per class.
+        The classes are those of all stored entries. Default: True.
+      IvyXGBoostDataInput::split_folds needs to be called beforehand.
+      """
+      fold_data = self.get_fold_data(folds)
+      res = [ np.abs(data[1]) for data in fold_data ]
+      if scale_weights:
+         classes = np.unique(self.buffer.views()[2])
+         class_idxs = [ self._get_class_indices(data[2], classes) for data in fold_data ]
+         sums = sum([ np.bincount(cidxs, weights=wgts, minlength=classes.size+1) for cidxs, wgts in zip(class_idxs, res) ])
+         factors = self._get_scale_factors(sums, sum([ wgts.size for wgts in res ]), classes.size, res[0].dtype)
+         for cidxs, wgts in zip(class_idxs, res):
+            wgts *= factors[cidxs]
+      return res
+
+
+   def load_input(self, file_name, tree_name, train_fraction, control_fraction=None, shuffle=None, weight_name=None, class_type=None, step_size=None, nthreads=1, cache=None, stratify=False, event_number_name=None, selection=None, derived_features=None):
+      """
+      Loads ROOT files with a TTree in them.
+      - file_name: Input ROOT file name. It can also be a glob pattern, or a list of file names and/or glob patterns.
       - tree_name: Name of TTree in the input file
       - train_fraction (fT): Fraction of data used for training
       - control_fraction (fC): Fraction of data not used in any training or evaluation (default = None, i.e., inactive)
       - shuffle: If True, the data entries for the training, evaluation, and control (if enabled) samples will be split randomly.
       - weight_name: Name of the branch that contains weights. Optional.
       - class_type: If an integer value is given, the value of self.class_branch will be set to this one.
+      - step_size: If set, the tree is read in chunks through uproot's chunked iteration instead of all at once.
+        The value can be a number of entries (int) or a memory budget per chunk (str, e.g., "100 MB"). Default: None.
+      - nthreads: Number of threads used to read and decompress the input. Default: 1.
+      - cache: An IvyXGBoostDataCache object. If given, the decoded arrays of each read unit are taken from or stored in this cache. Default: None.
+      - stratify: If True, the fractions are applied to the entries of each class separately. Default: False.
+      - event_number_name: Name of the branch that contains the event numbers (see IvyXGBoostDataInput::add_data). Optional.
+      - selection: Expression of the branches that evaluates to True for the entries to keep, e.g., "(pt1>30) & (abs(eta1)<2.5)". Optional.
+      - derived_features: Dictionary of {name: expression} for quantities computed from the branches, e.g., {"dR12": "delta_r(eta1, phi1, eta2, phi2)"}.
+        The names can be used as features, as the weight, or in the selection and in the expressions that follow them in the dictionary. Optional.
+
+      For the descripton of how fT, fC, and stratify are used, please see the help for IvyXGBoostDataInput::add_data.
 
-      For the descripton of how fT and fC are used, please see the help for IvyXGBoostDataInput::add_data.
+      When step_size is set, each chunk is converted to float32, split, and appended before the next chunk is read,
+      so the peak memory usage stays close to the size of one chunk in addition to the accumulated data.
+      Note that the splitting (and shuffling, if requested) is then done within each chunk.
+
+      The input is read in units of files (or chunks if step_size is set). With nthreads>1, up to nthreads units are read concurrently,
+      but the units are always appended in the order of the file list (glob matches are sorted by name), so the outcome does not depend on nthreads.
+      The weight and class branches are validated once per tree schema (i.e., set of branch names) instead of once per file.
+
+      The cache key of a read unit covers the file path, modification time, and size, the tree name, the features and their jagged sort keys, the missing value, the weight branch,
+      the class settings, the event number branch, the selection, the derived features, and the entry range.
+      Cache hits are memory-mapped, so they skip the decompression of the ROOT file entirely.
+
+      The selection and derived feature expressions are Python expressions of numpy arrays, evaluated on each read unit before its entries are appended,
+      so only the selected entries and the final feature columns are stored. The logical operators are &, |, and ~ with parenthesized comparisons.
+      The functions and constants in IvyXGBoostDataInput.expression_namespace (e.g., sqrt, abs, arctan2, where, pi, delta_phi, delta_r) can be used by name,
+      and any other numpy function through the 'np.' prefix. Only the branches that appear in the features, the weight, the class, and the expressions are read.
       """
-      output_vars = [ v for v in self.features ]
-      output_vars.append("weight")
-      output_vars.append("data_class")
+      file_names = self._expand_file_names(file_name)
 
       assign_class = (class_type is not None)
-      is_weighted = (weight_name is not None)
+      if not assign_class:
+         if self.class_branch is None:
+            raise RuntimeError("IvyXGBoostDataInput::load_input: Because IvyXGBoostDataInput was constructed with no inherent class branch name, the class type needs to be specified.")
+      elif type(class_type) is not int:
+         raise RuntimeError("IvyXGBoostDataInput::load_input: Class type should be specified as an integer.")
+
+      if derived_features is not None:
+         derived_features = dict(derived_features)
+         for name in derived_features.keys():
+            if name==self.class_branch or name==event_number_name:
+               raise RuntimeError("IvyXGBoostDataInput::load_input: The derived feature {} cannot be used as the class or event number branch.".format(name))
+
+      with IvyXGBoostProfiler.get_stage(self.profiler, "load_input"):
+         read_units = self._get_read_units(file_names, tree_name, step_size, weight_name, class_type, event_number_name, selection, derived_features)
+         def add_entries(features_data, weights, class_values, event_numbers):
+            self.add_data(features_data, weights, class_values, train_fraction, control_fraction, shuffle, stratify, event_numbers)
+         if nthreads<=1:
+            for read_unit in read_units:
+               add_entries(*self._read_entries(*read_unit, weight_name, class_type, cache, event_number_name, selection, derived_features))
+         else:
+            with ThreadPoolExecutor(max_workers=nthreads) as executor:
+               pending = deque()
+               for read_unit in read_units:
+                  pending.append(executor.submit(self._read_entries, *read_unit, weight_name, class_type, cache, event_number_name, selection, derived_features))
+                  if len(pending)>=nthreads:
+                     add_entries(*pending.popleft().result())
+               while pending:
+                  add_entries(*pending.popleft().result())
+
+
+   @staticmethod
+   def _expand_file_names(file_name):
+      """
+      Returns the list of file names from a file name, a glob pattern, or a list of those.
+      """
+      file_patterns = [ file_name ] if type(file_name) is str else list(file_name)
+      file_names = []
+      for fpat in file_patterns:
+         if any(c in fpat for c in "*?["):
+            fmatches = sorted(glob.glob(fpat))
+            if len(fmatches)==0:
+               raise RuntimeError("IvyXGBoostDataInput::load_input: No file matches the pattern {}.".format(fpat))
+            file_names.extend(fmatches)
+         else:
+            file_names.append(fpat)
+      if len(file_names)==0:
+         raise RuntimeError("IvyXGBoostDataInput::load_input: The list of input files is empty.")
+      return file_names
+
+
+   @staticmethod
+   def _get_expression_names(expression):
+      """
+      Returns the list of variable names used in an expression, excluding the names in IvyXGBoostDataInput.expression_namespace.
+      """
+      try:
+         tree = ast.parse(expression, mode="eval")
+      except SyntaxError as err:
+         raise RuntimeError("IvyXGBoostDataInput::load_input: The expression '{}' could not be parsed ({}).".format(expression, err.msg))
+      res = []
+      for node in ast.walk(tree):
+         if isinstance(node, ast.Name) and node.id not in IvyXGBoostDataInput.expression_namespace and node.id not in res:
+            res.append(node.id)
+      return res
+
+
+   @staticmethod
+   def _evaluate_expression(expression, arrs, nEntries):
+      """
+      Evaluates an expression of the arrays in the dictionary arrs, and returns an array of nEntries values.
+      """
+      try:
+         res = eval(expression, { "__builtins__": {}, **IvyXGBoostDataInput.expression_namespace }, arrs)
+      except Exception as err:
+         raise RuntimeError("IvyXGBoostDataInput::load_input: The expression '{}' could not be evaluated ({}).".format(expression, err))
+      res = np.asarray(res)
+      if res.shape!=(nEntries,):
+         res = np.broadcast_to(res, (nEntries,))
+      return res
 
-      finput = uproot.open(file_name)
-      tin = finput[tree_name]
-      keylist = tin.keys()
 
-      input_vars = [ v for v in self.features ]
-      if is_weighted:
-         if weight_name in keylist:
-            input_vars.append(weight_name)
+   @staticmethod
+   def _add_derived_features(arrs, derived_features, nEntries):
+      """
+      Returns the dictionary of arrays arrs extended by the derived features, which are evaluated in the order of the dictionary derived_features.
+      The arrays in arrs are not copied.
+      """
+      if derived_features is None:
+         return arrs
+      res = dict(arrs)
+      for name, expression in derived_features.items():
+         res[name] = IvyXGBoostDataInput._evaluate_expression(expression, res, nEntries)
+      return res
+
+
+   def _get_input_branches(self, keylist, weight_name=None, class_type=None, event_number_name=None, selection=None, derived_features=None):
+      """
+      Returns the list of branches to read from a tree with the branch names in keylist after checking that the weight and class branches exist,
+      and that the selection and derived feature expressions only use existing branches or previously defined derived features.
+      """
+      if derived_features is None:
+         derived_features = dict()
+      input_vars = []
+      def add_branch(bname):
+         if bname not in input_vars:
+            input_vars.append(bname)
+      def add_expression_branches(expression, known_names):
+         for vname in self._get_expression_names(expression):
+            if vname in known_names:
+               continue
+            if vname not in keylist:
+               raise RuntimeError("IvyXGBoostDataInput::load_input: The name {} in the expression '{}' is neither a branch of the input tree nor a derived feature defined before.".format(vname, expression))
+            add_branch(vname)
+
+      for ifeat, (name, expression) in enumerate(derived_features.items()):
+         add_expression_branches(expression, list(derived_features.keys())[0:ifeat])
+      for v in self.features:
+         if v not in derived_features:
+            branch, index = self._get_feature_source(v)
+            if branch not in keylist:
+               raise RuntimeError("IvyXGBoostDataInput::load_input: The feature branch {} does not exist in the input tree.".format(branch))
+            add_branch(branch)
+            if index is not None and branch in self.jagged_sort_keys:
+               sort_key = self.jagged_sort_keys[branch]
+               if sort_key not in keylist:
+                  raise RuntimeError("IvyXGBoostDataInput::load_input: The sort key branch {} of {} does not exist in the input tree.".format(sort_key, branch))
+               add_branch(sort_key)
+      if selection is not None:
+         add_expression_branches(selection, derived_features)
+      if weight_name is not None:
+         if weight_name in keylist or weight_name in derived_features:
+            if weight_name not in derived_features:
+               add_branch(weight_name)
          else:
             raise RuntimeError("IvyXGBoostDataInput::load_input: The weight branch {} does not exist in the input tree.".format(weight_name))
-      if not assign_class:
-         if self.class_branch is None:
-            raise RuntimeError("IvyXGBoostDataInput::load_input: Because IvyXGBoostDataInput was constructed with no inherent class branch name, the class type needs to be specified.")
+      if class_type is None:
          if self.class_branch in keylist:
-            input_vars.append(self.class_branch)
+            add_branch(self.class_branch)
          else:
             raise RuntimeError("IvyXGBoostDataInput::load_input: Class name {} is not in the list of branches.".format(self.class_branch))
-      elif type(class_type) is not int:
-         raise RuntimeError("IvyXGBoostDataInput::load_input: Class type should be specified as an integer.")
-      arrs = tin.arrays(input_vars)
-      nEntries = arrs[input_vars[0]].shape[0]
+      if event_number_name is not None:
+         if event_number_name in keylist:
+            add_branch(event_number_name)
+         else:
+            raise RuntimeError("IvyXGBoostDataInput::load_input: The event number branch {} does not exist in the input tree.".format(event_number_name))
+      return input_vars
+
+
+   def _get_read_units(self, file_names, tree_name, step_size=None, weight_name=None, class_type=None, event_number_name=None, selection=None, derived_features=None):
+      """
+      Generates the units in which the input files are read as tuples of (file name, tree name, branches, first entry, end entry).
+      Only the metadata of the files are read here.
+      """
+      validated_schemas = dict()
+      for fname in file_names:
+         entry_ranges = []
+         with uproot.open(fname) as finput:
+            tin = finput[tree_name]
+            schema = frozenset(tin.keys())
+            input_vars = validated_schemas.get(schema, None)
+            if input_vars is None:
+               input_vars = self._get_input_branches(schema, weight_name, class_type, event_number_name, selection, derived_features)
+               validated_schemas[schema] = input_vars
+            nEntries = tin.num_entries
+            nEntries_step = nEntries
+            if step_size is not None:
+               nEntries_step = step_size if isinstance(step_size, int) else tin.num_entries_for(step_size, input_vars)
+               nEntries_step = max(1, nEntries_step)
+            for entry_start in range(0, nEntries, nEntries_step):
+               entry_ranges.append((entry_start, min(entry_start+nEntries_step, nEntries)))
+         for entry_start, entry_stop in entry_ranges:
+            yield (fname, tree_name, input_vars, entry_start, entry_stop)
+
+
+   def _read_entries(self, file_name, tree_name, input_vars, entry_start, entry_stop, weight_name=None, class_type=None, cache=None, event_number_name=None, selection=None, derived_features=None):
+      """
+      Reads the entries [entry_start, entry_stop) of a tree and returns the converted feature, weight, class, and event number arrays.
+      The event number array is None if event_number_name is None.
+      If an IvyXGBoostDataCache object is passed, the arrays are taken from the cache when possible, and stored in it otherwise.
+      This function only reads class members, so it can be called from multiple threads.
+      """
+      cache_key = None
+      if cache is not None:
+         array_names = cache.array_names + ([ "event_numbers" ] if event_number_name is not None else [])
+         cache_key = cache.make_key(
+            file_name,
+            tree_name = tree_name,
+            features = self.features,
+            jagged_sort_keys = self.jagged_sort_keys,
+            # The missing value fills the elements beyond the multiplicity of the entries in jagged branches.
+            missing_value_default = float(self.missing_value_default),
+            weight_name = weight_name,
+            class_branch = (self.class_branch if class_type is None else None),
+            class_type = class_type,
+            event_number_name = event_number_name,
+            selection = selection,
+            # The derived features are stored as a list because their order matters.
+            derived_features = (list(derived_features.items()) if derived_features is not None else None),
+            entry_start = entry_start,
+            entry_stop = entry_stop
+         )
+         res = cache.load(cache_key, array_names)
+         if res is not None:
+            return res if event_number_name is not None else res+(None,)
+
+      # Units may be read concurrently, so only their time is recorded.
+      with IvyXGBoostProfiler.get_stage(self.profiler, "load_input/read", measure_memory=False):
+         with uproot.open(file_name) as finput:
+            arrs = self.read_tree_arrays(finput[tree_name], input_vars, self._get_jagged_branches(self.features, self.jagged_sort_keys), entry_start, entry_stop)
+         res = self._convert_arrays(arrs, weight_name, class_type, event_number_name, selection, derived_features)
+      if cache is not None:
+         cache.store(cache_key, res[0:len(array_names)], array_names)
+      return res
+
+
+   def _convert_arrays(self, arrs, weight_name=None, class_type=None, event_number_name=None, selection=None, derived_features=None):
+      """
+      Converts a dictionary of branch arrays read from a TTree into the feature, weight, class, and event number arrays.
+      - arrs: Dictionary of numpy arrays keyed by branch name
+      - weight_name: Name of the branch that contains weights. Optional.
+      - class_type: If an integer value is given, all entries are assigned to this class instead of the value of self.class_branch.
+      - event_number_name: Name of the branch that contains event numbers. Optional. The returned event number array is None if it is not given.
+      - selection: Expression that evaluates to True for the entries to keep. Optional.
+      - derived_features: Dictionary of {name: expression} for the quantities to compute from the branch arrays, in the order of evaluation. Optional.
+
+      The feature matrix is filled column by column into a preallocated float32 array in order to avoid temporary copies
+      (see IvyXGBoostDataInput::fill_feature_matrix).
+      """
+      nEntries = len(next(iter(arrs.values())))
+      arrs = self._add_derived_features(arrs, derived_features, nEntries)
+
+      # Only the columns that are kept are filtered, so the arrays needed only by the expressions are never copied.
+      mask = None
+      if selection is not None:
+         mask = self._evaluate_expression(selection, arrs, nEntries).astype(bool)
+         nEntries = int(np.count_nonzero(mask))
+      def column(name):
+         return (arrs[name] if mask is None else arrs[name][mask])
 
       weights = None
-      if is_weighted:
-         weights = arrs[weight_name].astype(np.float32)
+      if weight_name is not None:
+         weights = column(weight_name).astype(np.float32)
       else:
          weights = np.ones(nEntries, dtype=np.float32)
 
       class_values = None
-      if not assign_class:
-         class_values = arrs[self.class_branch].astype(np.int32)
+      if class_type is None:
+         class_values = column(self.class_branch).astype(np.int32)
       else:
          class_values = np.full(nEntries, class_type, dtype=np.int32)
 
-      feat_data = np.column_stack([ arrs[v] for v in self.features ])
-      self.add_data(feat_data, weights, class_values, train_fraction, control_fraction, shuffle)
+      event_numbers = None
+      if event_number_name is not None:
+         event_numbers = column(event_number_name).astype(np.int64)
+
+      feat_data = self.fill_feature_matrix(arrs, self.features, self.missing_value_default, self.jagged_sort_keys, mask)
+
+      return feat_data, weights, class_values, event_numbers
 
 
    def class_types(self):
@@ -170,9 +780,65 @@ class IvyXGBoostDataInput:
       """
       res = None
       if self.data_train is not None:
-         clm = np.unique(self.data_train[2])
-         cll = [ clm[i] for i in range(clm.shape[0]) ]
-         res = cll
+         if 'class_types' not in self.partition_cache:
+            clm = np.unique(self.data_train[2])
+            self.partition_cache['class_types'] = [ clm[i] for i in range(clm.shape[0]) ]
+         res = self.partition_cache['class_types']
       if res is None:
          raise RuntimeError("IvyXGBoostDataInput::class_types: This function should only be called after assigning a training data set.")
+      return list(res)
+
+
+   def get_weights(self, partition, scale_weights=True):
+      """
+      Returns the absolute values of the weights of a partition for use in training.
+      - partition: One of 'train', 'test', or 'control'
+      - scale_weights: If True, the weights of each class are scaled such that their sum is equal to the average number of entries per class in the partition.
+        The classes are those of the training partition. Default: True.
+
+      The per-class sums are computed in a single pass over the partition (np.bincount over class indices),
+      and the result is cached until the partitions change. The returned array should not be modified.
+      Returns None if the partition is empty.
+      """
+      ipart = self.partition_names.index(partition)
+      cache_key = ('weights', ipart, scale_weights)
+      if cache_key in self.partition_cache:
+         return self.partition_cache[cache_key]
+
+      data = self._partition(ipart)
+      if data is None:
+         return None
+      res = np.abs(data[1])
+      if scale_weights:
+         classes = np.array(self.class_types(), dtype=data[2].dtype)
+         class_idxs = self._get_class_indices(data[2], classes)
+         sums = np.bincount(class_idxs, weights=res, minlength=classes.size+1)
+         res *= self._get_scale_factors(sums, res.size, classes.size, res.dtype)[class_idxs]
+      res.flags.writeable = False
+      self.partition_cache[cache_key] = res
+      return res
+
+
+   @staticmethod
+   def _get_class_indices(class_values, classes):
+      """
+      Returns the index of each class value in the sorted array of classes.
+      Class values that are not in classes are assigned to an overflow index equal to the number of classes.
+      """
+      nClasses = classes.size
+      res = np.searchsorted(classes, class_values)
+      res[classes[np.minimum(res, nClasses-1)]!=class_values] = nClasses
+      return res
+
+
+   @staticmethod
+   def _get_scale_factors(sums, nEntries, nClasses, dtype):
+      """
+      Returns the factors that scale the per-class sums of weights (with the overflow class last) to the average number of entries per class.
+      The overflow class and classes without weights are not scaled.
+      """
+      navg = np.float32(nEntries)/np.float32(nClasses)
+      res = np.ones(nClasses+1, dtype=dtype)
+      has_sum = (sums[0:nClasses]>0.)
+      res[0:nClasses][has_sum] = navg / sums[0:nClasses][has_sum]
       return res
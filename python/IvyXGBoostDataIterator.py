@@ -0,0 +1,70 @@
+import numpy as np
+import xgboost as xgb
+
+
+class IvyXGBoostDataIterator(xgb.DataIter):
+   """
+   An XGBoost data iterator that passes a partition of IvyXGBoostDataInput (e.g., data_train) to XGBoost in chunks of rows.
+   It is used to build quantile or external-memory DMatrix objects without copying the full partition at once.
+   Several partitions (e.g., the folds from IvyXGBoostDataInput::get_fold_data) can be passed together as a list, in which case they are iterated one after the other.
+   """
+   def __init__(self, data, weights=None, chunk_size=100000, feature_names=None, cache_prefix=None):
+      """
+      IvyXGBoostDataIterator constructor:
+      - data: List of [features, weights, class values] arrays, e.g., IvyXGBoostDataInput.data_train, or a list of such lists
+      - weights: 1D array of weights to use instead of data[1] (e.g., rescaled weights), or a list of such arrays if data is a list of partitions. Default: None.
+      - chunk_size: Number of rows passed to XGBoost in each iteration. Default: 100000.
+      - feature_names: List of feature names. Default: None.
+      - cache_prefix: If set, XGBoost stores the pages of an external-memory DMatrix in files with this prefix. Default: None.
+      """
+      if chunk_size<=0:
+         raise RuntimeError("IvyXGBoostDataIterator: The chunk size should be positive.")
+      if isinstance(data[0], np.ndarray):
+         data = [ data ]
+         if weights is not None:
+            weights = [ weights ]
+      if weights is None:
+         weights = [ None ]*len(data)
+      if len(weights)!=len(data):
+         raise RuntimeError("IvyXGBoostDataIterator: The number of weight arrays should be the same as the number of partitions.")
+      self.features = [ part[0] for part in data ]
+      self.labels = [ part[2] for part in data ]
+      self.weights = [ (wgts if wgts is not None else part[1]) for part, wgts in zip(data, weights) ]
+      for features, labels, wgts in zip(self.features, self.labels, self.weights):
+         if features.shape[0]!=labels.shape[0] or features.shape[0]!=wgts.shape[0]:
+            raise RuntimeError("IvyXGBoostDataIterator: The number of rows in features, weights, and class values data should be the same.")
+      self.chunk_size = chunk_size
+      self.feature_names = feature_names
+      self.ipart = 0
+      self.pos = 0
+      super().__init__(cache_prefix=cache_prefix)
+
+
+   def next(self, input_data):
+      """
+      Passes the next chunk of rows to XGBoost through the input_data callback.
+      Returns False when there are no more chunks.
+      """
+      while self.ipart<len(self.features) and self.pos>=self.features[self.ipart].shape[0]:
+         self.ipart += 1
+         self.pos = 0
+      if self.ipart>=len(self.features):
+         return False
+      ipart = self.ipart
+      end = min(self.pos + self.chunk_size, self.features[ipart].shape[0])
+      input_data(
+         data = np.asarray(self.features[ipart][self.pos:end]),
+         label = np.asarray(self.labels[ipart][self.pos:end]),
+         weight = np.asarray(self.weights[ipart][self.pos:end]),
+         feature_names = self.feature_names
+      )
+      self.pos = end
+      return True
+
+
+   def reset(self):
+      """
+      Resets the iterator to the first chunk.
+      """
+      self.ipart = 0
+      self.pos = 0
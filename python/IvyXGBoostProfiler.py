@@ -0,0 +1,258 @@
+import json
+import time
+import threading
+import tracemalloc
+import contextlib
+import xgboost as xgb
+
+
+class IvyXGBoostProfiler:
+   """
+   Records the wall time, the peak resident memory (RSS), and the memory allocated in each stage of a data preparation and training job.
+   A profiler is attached by setting the 'profiler' attribute of IvyXGBoostDataInput and/or IvyXGBoostTrainer objects,
+   which then record their stages (e.g., 'load_input', 'add_data', 'split', 'train/dmatrix', 'train/boost', 'train/predictions').
+   The time of each boosting round is recorded through an XGBoost training callback.
+   The results are returned by IvyXGBoostProfiler::report as a dictionary, which can also be written into a JSON file.
+
+   The peak RSS of a stage is obtained from the VmHWM entry of /proc/self/status. If reset_peak_rss is enabled, the peak is reset at the beginning of each stage
+   through /proc/self/clear_refs. Otherwise, or if the reset is not possible (e.g., on systems other than Linux), the peak RSS values are those of the process so far.
+   The allocated memory is measured through tracemalloc, which covers the allocations of Python objects and numpy arrays,
+   but not those done internally by XGBoost or by the decompression libraries.
+
+   A profiler that starts tracemalloc stops it in IvyXGBoostProfiler::close, which is also called at the exit of a 'with' block,
+   e.g., 'with IvyXGBoostProfiler() as profiler: ...'.
+   """
+   def __init__(self, trace_allocations=True, reset_peak_rss=False):
+      """
+      IvyXGBoostProfiler constructor:
+      - trace_allocations: If True, tracemalloc is started (if it is not already running) to measure the memory allocated in each stage.
+        Tracing slows down the allocations of Python objects. Default: True.
+      - reset_peak_rss: If True, the peak RSS of the process is reset at the beginning of each stage through /proc/self/clear_refs.
+        The reset also clears the referenced and soft-dirty flags of all pages of the process, which other tools may rely on,
+        so it should only be enabled in processes dedicated to profiling. Default: False.
+      """
+      self.trace_allocations = trace_allocations
+      # Whether tracemalloc was started by this profiler, in which case it is stopped in IvyXGBoostProfiler::close
+      self.started_tracing = False
+      if self.trace_allocations and not tracemalloc.is_tracing():
+         tracemalloc.start()
+         self.started_tracing = True
+      self.peak_rss_reset = (self._reset_peak_rss() if reset_peak_rss else False)
+      # Aggregated quantities of each stage in the order of their first occurrence
+      self.stages = dict()
+      # Times of the boosting rounds of each training stage
+      self.rounds = dict()
+      # Running peak values of the stages that are currently open, innermost last
+      self.open_stages = []
+      self.lock = threading.Lock()
+
+
+   def close(self):
+      """
+      Stops tracemalloc if it was started by this profiler. The recorded quantities remain available.
+      """
+      if self.started_tracing:
+         tracemalloc.stop()
+         self.started_tracing = False
+
+
+   def __enter__(self):
+      return self
+
+
+   def __exit__(self, exc_type, exc_value, traceback):
+      self.close()
+      return False
+
+
+   @staticmethod
+   def _read_status(key):
+      """
+      Returns the value of an entry of /proc/self/status in bytes, or None if it is not available.
+      """
+      try:
+         with open("/proc/self/status") as fstatus:
+            for line in fstatus:
+               if line.startswith(key+":"):
+                  return int(line.split()[1])*1024
+      except (OSError, ValueError, IndexError):
+         pass
+      return None
+
+
+   @staticmethod
+   def _reset_peak_rss():
+      """
+      Resets the peak RSS of the process to its current RSS. Returns False if the reset is not possible.
+      """
+      try:
+         with open("/proc/self/clear_refs", "w") as fclear:
+            fclear.write("5")
+         return True
+      except OSError:
+         return False
+
+
+   def _update_peaks(self):
+      """
+      Propagates the current peak RSS and the peak of traced allocations to all open stages, and resets the peaks of the process.
+      """
+      peak_rss = self._read_status("VmHWM")
+      peak_traced = (tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None)
+      for open_stage in self.open_stages:
+         if peak_rss is not None:
+            open_stage['peak_rss'] = max(open_stage['peak_rss'] or 0, peak_rss)
+         if peak_traced is not None:
+            open_stage['peak_traced'] = max(open_stage['peak_traced'] or 0, peak_traced)
+      if self.peak_rss_reset:
+         self._reset_peak_rss()
+      if tracemalloc.is_tracing():
+         tracemalloc.reset_peak()
+
+
+   @contextlib.contextmanager
+   def stage(self, name, measure_memory=True):
+      """
+      Context manager that records a stage with the given name. Stages can be nested, and repeated stages are accumulated.
+      - measure_memory: If False, only the wall time is recorded. Such stages can be recorded from several threads at the same time,
+        while stages with memory measurements should only be opened from the main thread. Default: True.
+      """
+      if not measure_memory:
+         time_start = time.perf_counter()
+         try:
+            yield
+         finally:
+            self._record(name, time.perf_counter()-time_start)
+         return
+
+      self._update_peaks()
+      open_stage = dict(
+         rss_start = self._read_status("VmRSS"),
+         traced_start = (tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None),
+         peak_rss = None,
+         peak_traced = None
+      )
+      self.open_stages.append(open_stage)
+      time_start = time.perf_counter()
+      try:
+         yield
+      finally:
+         wall_time = time.perf_counter()-time_start
+         self._update_peaks()
+         self.open_stages.pop()
+         memory = dict(
+            peak_rss = open_stage['peak_rss'],
+            rss_change = None,
+            peak_allocated = None,
+            net_allocated = None
+         )
+         rss_end = self._read_status("VmRSS")
+         if rss_end is not None and open_stage['rss_start'] is not None:
+            memory['rss_change'] = rss_end - open_stage['rss_start']
+         if open_stage['traced_start'] is not None and tracemalloc.is_tracing():
+            memory['peak_allocated'] = open_stage['peak_traced'] - open_stage['traced_start']
+            memory['net_allocated'] = tracemalloc.get_traced_memory()[0] - open_stage['traced_start']
+         self._record(name, wall_time, memory)
+
+
+   def _record(self, name, wall_time, memory=None):
+      """
+      Adds the measurements of a stage to the accumulated quantities of the stages with the same name.
+      Peak values are maximized, and the others are summed.
+      """
+      with self.lock:
+         res = self.stages.get(name, None)
+         if res is None:
+            res = dict(calls=0, wall_time=0., peak_rss=None, rss_change=None, peak_allocated=None, net_allocated=None)
+            self.stages[name] = res
+         res['calls'] += 1
+         res['wall_time'] += wall_time
+         if memory is not None:
+            for key, val in memory.items():
+               if val is None:
+                  continue
+               if res[key] is None:
+                  res[key] = val
+               elif key.startswith("peak"):
+                  res[key] = max(res[key], val)
+               else:
+                  res[key] += val
+
+
+   def get_round_callback(self, name):
+      """
+      Returns an XGBoost training callback that records the time of each boosting round under the given name.
+      """
+      with self.lock:
+         round_times = []
+         self.rounds.setdefault(name, []).append(round_times)
+      return _IvyXGBoostRoundTimer(round_times)
+
+
+   def report(self):
+      """
+      Returns the dictionary of the recorded quantities:
+      - 'stages': Dictionary of the stages, each with the number of calls, the total wall time in seconds,
+        and the peak RSS, RSS change, peak allocated memory, and net allocated memory in bytes (None if not measured).
+      - 'rounds': Dictionary of the boosting round times of each training stage, with one entry per training
+        holding the number of rounds, the total, mean, and maximum time, and the list of round times in seconds.
+      - 'peak_rss_reset': Whether the peak RSS was reset at the beginning of each stage.
+      - 'trace_allocations': Whether the allocated memory was measured.
+      """
+      with self.lock:
+         rounds = dict()
+         for name, trainings in self.rounds.items():
+            rounds[name] = []
+            for round_times in trainings:
+               nRounds = len(round_times)
+               rounds[name].append(
+                  dict(
+                     nrounds = nRounds,
+                     total_time = sum(round_times),
+                     mean_time = (sum(round_times)/nRounds if nRounds>0 else None),
+                     max_time = (max(round_times) if nRounds>0 else None),
+                     round_times = list(round_times)
+                  )
+               )
+         return dict(
+            stages = { name: dict(vals) for name, vals in self.stages.items() },
+            rounds = rounds,
+            peak_rss_reset = self.peak_rss_reset,
+            trace_allocations = self.trace_allocations
+         )
+
+
+   def save_report(self, fname):
+      """
+      Writes the report into a JSON file.
+      """
+      with open(fname, "w") as fout:
+         json.dump(self.report(), fout, indent=2)
+
+
+   @staticmethod
+   def get_stage(profiler, name, measure_memory=True):
+      """
+      Returns the stage context of a profiler, or an empty context if the profiler is None.
+      """
+      if profiler is None:
+         return contextlib.nullcontext()
+      return profiler.stage(name, measure_memory)
+
+
+class _IvyXGBoostRoundTimer(xgb.callback.TrainingCallback):
+   """
+   Records the wall time of each boosting round into a list.
+   """
+   def __init__(self, round_times):
+      self.round_times = round_times
+      self.time_start = None
+      super().__init__()
+
+   def before_iteration(self, model, epoch, evals_log):
+      self.time_start = time.perf_counter()
+      return False
+
+   def after_iteration(self, model, epoch, evals_log):
+      self.round_times.append(time.perf_counter()-self.time_start)
+      return False
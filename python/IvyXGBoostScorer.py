@@ -0,0 +1,310 @@
+import os
+import uproot
+import numpy as np
+import xgboost as xgb
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from IvyXGBoostDataInput import IvyXGBoostDataInput
+
+
+# Booster and settings of a worker process of IvyXGBoostScorer, set once by _init_worker
+_worker_state = dict()
+
+
+def _init_worker(model_raw, feature_names, missing_value_default, jagged_sort_keys, selection, derived_features):
+   """
+   Initializes a worker process of IvyXGBoostScorer with its own copy of the booster, which uses a single thread.
+   """
+   booster = xgb.Booster(model_file=bytearray(model_raw))
+   booster.set_param({ 'nthread': 1 })
+   _worker_state['booster'] = booster
+   _worker_state['input'] = IvyXGBoostDataInput(feature_names, missing_value_default=missing_value_default, jagged_sort_keys=jagged_sort_keys)
+   _worker_state['selection'] = selection
+   _worker_state['derived_features'] = derived_features
+
+
+def _score_unit_in_worker(file_name, tree_name, input_vars, entry_start, entry_stop):
+   """
+   Scores a range of entries in a worker process.
+   """
+   return IvyXGBoostScorer.score_entries(_worker_state['booster'], _worker_state['input'], file_name, tree_name, input_vars, entry_start, entry_stop, _worker_state['selection'], _worker_state['derived_features'])
+
+
+class IvyXGBoostScorer:
+   """
+   Scores the entries of ROOT files with a trained booster and writes the scores into new files,
+   either as ROOT trees with the same entries as the input trees (to be used as friend trees) or as columnar (parquet or npz) files.
+   The input trees are read in chunks, and the chunks are scored in parallel by a pool of worker processes,
+   each holding its own single-threaded copy of the booster.
+   """
+   output_formats = [ "root", "parquet", "npz" ]
+
+   def __init__(self, booster, feature_names, missing_value_default=-999., score_names=None, jagged_sort_keys=None, selection=None, derived_features=None):
+      """
+      IvyXGBoostScorer constructor:
+      - booster: The trained booster as an xgb.Booster object, an IvyXGBoostTrainer object after training, or the name of a model file.
+      - feature_names: List of features in the order used in the training (i.e., the branch names to read),
+        or the IvyXGBoostDataInput object used in the training, in which case its missing value indicator and jagged sort keys are used as well.
+        Elements of jagged branches are specified as in the IvyXGBoostDataInput constructor (e.g., 'jet_pt[0..3]').
+      - missing_value_default: Missing value indicator. Default: -999 (float).
+      - score_names: List of names of the output branches or columns, one per score. Default: None, i.e., 'score' for a single score,
+        or 'score_0', 'score_1', etc. for multiple scores.
+      - jagged_sort_keys: Dictionary of {jagged branch: sort key branch} as in the IvyXGBoostDataInput constructor. Default: None.
+      - selection, derived_features: Selection and derived feature expressions as in IvyXGBoostDataInput::load_input. Optional.
+        They should be the same as those used to load the training data. The entries that fail the selection are not scored,
+        and their scores are set to NaN, so the outputs keep the entries of the input trees.
+      """
+      if isinstance(booster, str):
+         booster = xgb.Booster(model_file=booster)
+      elif not isinstance(booster, xgb.Booster):
+         booster = getattr(booster, 'booster', None)
+      if booster is None:
+         raise RuntimeError("IvyXGBoostScorer: The booster is not available. Please train the booster first, or pass a model file.")
+      self.booster = booster
+
+      if isinstance(feature_names, IvyXGBoostDataInput):
+         missing_value_default = feature_names.missing_value_default
+         jagged_sort_keys = feature_names.jagged_sort_keys
+         feature_names = feature_names.features
+      self.features = IvyXGBoostDataInput._expand_feature_names(list(feature_names))
+      self.jagged_sort_keys = dict(jagged_sort_keys) if jagged_sort_keys is not None else dict()
+      if len(self.features)==0:
+         raise RuntimeError("IvyXGBoostScorer: There should be at least one feature name.")
+      self.missing_value_default = np.float32(missing_value_default)
+      self.selection = selection
+      self.derived_features = dict(derived_features) if derived_features is not None else None
+      # Data input without entries, through which the trees are read in the same way as in IvyXGBoostDataInput::load_input
+      self.xgb_input = IvyXGBoostDataInput(self.features, missing_value_default=self.missing_value_default, jagged_sort_keys=self.jagged_sort_keys)
+
+      # Find the number of scores per entry by scoring an entry with all features missing.
+      nScores = self.predict(np.full((1, len(self.features)), self.missing_value_default, dtype=np.float32)).shape[1]
+      if score_names is None:
+         score_names = [ "score" ] if nScores==1 else [ "score_{}".format(isc) for isc in range(nScores) ]
+      if len(score_names)!=nScores:
+         raise RuntimeError("IvyXGBoostScorer: The number of score names {} is different from the number of scores {}.".format(len(score_names), nScores))
+      self.score_names = list(score_names)
+
+
+   def predict(self, features):
+      """
+      Returns the scores for a 2D array of features as a 2D float32 array with one column per score.
+      """
+      return self.predict_with(self.booster, features, self.missing_value_default)
+
+
+   @staticmethod
+   def predict_with(booster, features, missing_value_default):
+      """
+      Returns the scores of a booster for a 2D array of features as a 2D float32 array with one column per score.
+      """
+      res = booster.inplace_predict(features, missing=float(missing_value_default))
+      res = np.asarray(res, dtype=np.float32)
+      if res.ndim==1:
+         res = res.reshape(-1, 1)
+      return res
+
+
+   @staticmethod
+   def score_entries(booster, xgb_input, file_name, tree_name, input_vars, entry_start, entry_stop, selection=None, derived_features=None):
+      """
+      Reads the branches input_vars of the entries [entry_start, entry_stop) of a tree and returns their scores.
+      The features are computed through xgb_input as in IvyXGBoostDataInput::load_input, and the entries that fail the selection receive NaN scores.
+      """
+      with uproot.open(file_name) as finput:
+         arrs = xgb_input.read_tree_arrays(finput[tree_name], input_vars, xgb_input._get_jagged_branches(xgb_input.features, xgb_input.jagged_sort_keys), entry_start, entry_stop)
+      nEntries = entry_stop-entry_start
+      arrs = xgb_input._add_derived_features(arrs, derived_features, nEntries)
+      mask = None
+      if selection is not None:
+         mask = xgb_input._evaluate_expression(selection, arrs, nEntries).astype(bool)
+      features = xgb_input.fill_feature_matrix(arrs, xgb_input.features, xgb_input.missing_value_default, xgb_input.jagged_sort_keys, mask)
+      del arrs
+      scores = IvyXGBoostScorer.predict_with(booster, features, xgb_input.missing_value_default)
+      if mask is None:
+         return scores
+      res = np.full((nEntries, scores.shape[1]), np.nan, dtype=np.float32)
+      res[mask] = scores
+      return res
+
+
+   def get_output_name(self, file_name, output_dir, suffix, output_format):
+      """
+      Returns the name of the output file for an input file.
+      """
+      base_name = os.path.splitext(os.path.basename(file_name))[0]
+      if output_dir is None:
+         output_dir = os.path.dirname(os.path.abspath(file_name))
+      return os.path.join(output_dir, "{}{}.{}".format(base_name, suffix, output_format))
+
+
+   def score_files(self, file_name, tree_name, output_dir=None, suffix="_scores", output_format="root", output_tree_name=None, step_size=100000, nthreads=1, start_method="spawn"):
+      """
+      Scores the entries of the trees in ROOT files and writes one output file per input file.
+      - file_name: Input ROOT file name. It can also be a glob pattern, or a list of file names and/or glob patterns.
+      - tree_name: Name of TTree in the input files
+      - output_dir: Directory of the output files. Default: None, i.e., the directory of each input file.
+      - suffix: Suffix added to the base name of each input file to make the output file name. Default: '_scores'.
+      - output_format: 'root', 'parquet', or 'npz'. Default: 'root'.
+      - output_tree_name: Name of the output tree if the output format is 'root'. Default: None, i.e., the same as tree_name.
+      - step_size: Number of entries scored in each chunk. Default: 100000.
+      - nthreads: Number of worker processes. Default: 1, i.e., the chunks are scored in this process using all threads of XGBoost.
+      - start_method: Start method of the worker processes (see multiprocessing.get_context). Default: 'spawn'.
+        Forked processes may inherit the OpenMP state of XGBoost in an unusable form, so 'spawn' is used by default.
+        With 'spawn', the main script needs to be protected by an 'if __name__ == "__main__":' block.
+
+      The output file for an input file '[dir]/[name].root' is '[output_dir]/[name][suffix].[output_format]'.
+      Each output file contains one branch or column per score with the same entries in the same order as the input tree (including those that fail the selection),
+      so output ROOT trees can be attached to the input trees as friends (e.g., TTree::AddFriend(tree_name, output_file)).
+      Parquet files are written through pyarrow, which needs to be installed for this format.
+      The npz output holds the scores of each file in memory until the file is complete. The other formats are written chunk by chunk.
+
+      The chunks are scored in the order of the file list (glob matches are sorted by name), and at most 2*nthreads chunks are pending at any time,
+      so the memory usage is bounded by the size of these chunks regardless of the size of the input.
+
+      Returns the list of output file names.
+      """
+      if output_format not in self.output_formats:
+         raise RuntimeError("IvyXGBoostScorer::score_files: Output format {} is not one of {}.".format(output_format, self.output_formats))
+      if step_size is None or step_size<=0:
+         raise RuntimeError("IvyXGBoostScorer::score_files: The step size should be positive.")
+      if output_tree_name is None:
+         output_tree_name = tree_name
+      if output_dir is not None:
+         os.makedirs(output_dir, exist_ok=True)
+
+      file_names = IvyXGBoostDataInput._expand_file_names(file_name)
+      output_names = [ self.get_output_name(fname, output_dir, suffix, output_format) for fname in file_names ]
+      if len(set(output_names))!=len(output_names):
+         raise RuntimeError("IvyXGBoostScorer::score_files: Different input files would be written to the same output file. Please use separate output directories.")
+
+      # Units of (file index, branches, first entry, end entry) in the order of the files, with a closing unit (file index, None, None, None) for each file
+      def get_score_units():
+         validated_schemas = dict()
+         for ifile, fname in enumerate(file_names):
+            with uproot.open(fname) as finput:
+               tin = finput[tree_name]
+               schema = frozenset(tin.keys())
+               input_vars = validated_schemas.get(schema, None)
+               if input_vars is None:
+                  try:
+                     # A class type is passed so that no class branch is needed.
+                     input_vars = self.xgb_input._get_input_branches(schema, class_type=0, selection=self.selection, derived_features=self.derived_features)
+                  except RuntimeError as err:
+                     raise RuntimeError("IvyXGBoostScorer::score_files: The tree {} of the file {} cannot be scored ({}).".format(tree_name, fname, err))
+                  validated_schemas[schema] = input_vars
+               nEntries = tin.num_entries
+            for entry_start in range(0, nEntries, step_size):
+               yield (ifile, input_vars, entry_start, min(entry_start+step_size, nEntries))
+            yield (ifile, None, None, None)
+
+      writer = None
+      def process_unit(ifile, scores):
+         nonlocal writer
+         if writer is None:
+            writer = self._open_writer(output_names[ifile], output_format, output_tree_name)
+         if scores is not None:
+            writer.write(scores)
+         else:
+            writer.close()
+            writer = None
+
+      try:
+         if nthreads<=1:
+            for ifile, input_vars, entry_start, entry_stop in get_score_units():
+               scores = None
+               if entry_start is not None:
+                  scores = self.score_entries(self.booster, self.xgb_input, file_names[ifile], tree_name, input_vars, entry_start, entry_stop, self.selection, self.derived_features)
+               process_unit(ifile, scores)
+         else:
+            model_raw = self.booster.save_raw(raw_format="ubj")
+            with ProcessPoolExecutor(
+               max_workers=nthreads, mp_context=multiprocessing.get_context(start_method),
+               initializer=_init_worker, initargs=(model_raw, self.features, self.missing_value_default, self.jagged_sort_keys, self.selection, self.derived_features)
+               ) as executor:
+               pending = deque()
+               for ifile, input_vars, entry_start, entry_stop in get_score_units():
+                  if entry_start is not None:
+                     pending.append((ifile, executor.submit(_score_unit_in_worker, file_names[ifile], tree_name, input_vars, entry_start, entry_stop)))
+                  else:
+                     pending.append((ifile, None))
+                  while len(pending)>2*nthreads or (len(pending)>0 and pending[0][1] is None):
+                     ifile_done, future = pending.popleft()
+                     process_unit(ifile_done, (future.result() if future is not None else None))
+               while pending:
+                  ifile_done, future = pending.popleft()
+                  process_unit(ifile_done, (future.result() if future is not None else None))
+      finally:
+         if writer is not None:
+            writer.close()
+
+      return output_names
+
+
+   def _open_writer(self, output_name, output_format, output_tree_name):
+      """
+      Returns a writer of the scores into the file output_name in the given format.
+      """
+      if output_format=="root":
+         return _IvyXGBoostScoreWriterROOT(output_name, output_tree_name, self.score_names)
+      elif output_format=="parquet":
+         return _IvyXGBoostScoreWriterParquet(output_name, self.score_names)
+      else:
+         return _IvyXGBoostScoreWriterNpz(output_name, self.score_names)
+
+
+class _IvyXGBoostScoreWriterROOT:
+   """
+   Writes the scores into a ROOT tree chunk by chunk.
+   """
+   def __init__(self, output_name, tree_name, score_names):
+      self.score_names = score_names
+      self.foutput = uproot.recreate(output_name)
+      self.tree = self.foutput.mktree(tree_name, { sn: np.float32 for sn in score_names })
+
+   def write(self, scores):
+      self.tree.extend({ sn: scores[:, isc] for isc, sn in enumerate(self.score_names) })
+
+   def close(self):
+      self.foutput.close()
+
+
+class _IvyXGBoostScoreWriterParquet:
+   """
+   Writes the scores into a parquet file chunk by chunk, one row group per chunk.
+   """
+   def __init__(self, output_name, score_names):
+      try:
+         import pyarrow
+         import pyarrow.parquet
+      except ImportError:
+         raise RuntimeError("IvyXGBoostScorer: The parquet output format needs the pyarrow module.")
+      self.pyarrow = pyarrow
+      self.score_names = score_names
+      schema = pyarrow.schema([ (sn, pyarrow.float32()) for sn in score_names ])
+      self.writer = pyarrow.parquet.ParquetWriter(output_name, schema)
+
+   def write(self, scores):
+      self.writer.write_table(self.pyarrow.table({ sn: scores[:, isc] for isc, sn in enumerate(self.score_names) }))
+
+   def close(self):
+      self.writer.close()
+
+
+class _IvyXGBoostScoreWriterNpz:
+   """
+   Collects the scores of a file and writes them into an npz file with one array per score when the file is complete.
+   """
+   def __init__(self, output_name, score_names):
+      self.output_name = output_name
+      self.score_names = score_names
+      self.chunks = []
+
+   def write(self, scores):
+      self.chunks.append(scores)
+
+   def close(self):
+      scores = np.concatenate(self.chunks) if len(self.chunks)>0 else np.empty((0, len(self.score_names)), dtype=np.float32)
+      with open(self.output_name, "wb") as foutput:
+         np.savez(foutput, **{ sn: scores[:, isc] for isc, sn in enumerate(self.score_names) })
+      self.chunks = []
@@ -0,0 +1,459 @@
+import os
+import json
+import math
+import hashlib
+import time
+import itertools
+import numpy as np
+import xgboost as xgb
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from IvyXGBoostParameters import IvyXGBoostParameters
+from IvyXGBoostTrainer import IvyXGBoostTrainer
+
+
+# Data of a trial process of IvyXGBoostSearch, set once by _init_trial_process
+_trial_state = dict()
+
+
+def _init_trial_process(shm_arrays, feature_names, missing_value_default):
+   """
+   Initializes a process running the trials of IvyXGBoostSearch.
+   - shm_arrays: Dictionary of array name to (shared memory name, shape, dtype) for the features, labels, and weights of the training and test partitions
+   The arrays are attached from shared memory without copying, and the DMatrix objects are built from them at the first trial that needs them.
+   """
+   _trial_state.clear()
+   _trial_state['shm'] = []
+   arrays = dict()
+   for arr_name, (shm_name, shape, dtype) in shm_arrays.items():
+      shm = shared_memory.SharedMemory(name=shm_name)
+      _trial_state['shm'].append(shm)
+      arrays[arr_name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+   _trial_state['arrays'] = arrays
+   _trial_state['features'] = feature_names
+   _trial_state['missing_value_default'] = missing_value_default
+   _trial_state['dmatrices'] = dict()
+
+
+def _get_trial_dmatrices(params):
+   """
+   Returns the training and test DMatrix objects of a trial process for the parameters params.
+   Quantized DMatrix objects are used with the 'hist' tree method. They only depend on 'max_bin', so they are built once per value of 'max_bin'.
+   """
+   use_quantiles = (params.get('tree_method', "hist") == "hist")
+   dm_key = (use_quantiles, params.get('max_bin', None))
+   res = _trial_state['dmatrices'].get(dm_key, None)
+   if res is None:
+      arrays = _trial_state['arrays']
+      dm_args = dict(feature_names=_trial_state['features'], missing=float(_trial_state['missing_value_default']))
+      if use_quantiles:
+         if dm_key[1] is not None:
+            dm_args['max_bin'] = dm_key[1]
+         dtrain = xgb.QuantileDMatrix(arrays['train_features'], label=arrays['train_labels'], weight=arrays['train_weights'], **dm_args)
+         dtest = xgb.QuantileDMatrix(arrays['test_features'], label=arrays['test_labels'], weight=arrays['test_weights'], ref=dtrain, **dm_args)
+      else:
+         dtrain = xgb.DMatrix(arrays['train_features'], label=arrays['train_labels'], weight=arrays['train_weights'], **dm_args)
+         dtest = xgb.DMatrix(arrays['test_features'], label=arrays['test_labels'], weight=arrays['test_weights'], **dm_args)
+      res = (dtrain, dtest)
+      _trial_state['dmatrices'][dm_key] = res
+   return res
+
+
+def _run_trial(params, num_round, early_stopping_rounds, metric, maximize, xgb_model=None, previous_result=None, save_model=False):
+   """
+   Trains a booster with the parameters params in a trial process, and returns a dictionary with the best score of the metric in the test partition,
+   the best iteration, the number of rounds that were run, and the duration of the trial.
+   - xgb_model: Raw model of a previous trial with the same parameters, which is continued up to num_round rounds. Default: None.
+   - previous_result: Result of the previous trial, whose best score is kept if it is not improved. Default: None.
+   - save_model: If True, the raw model is returned in the result as well under the key 'model'. Default: False.
+   """
+   time_start = time.time()
+   dtrain, dtest = _get_trial_dmatrices(params)
+   evals_result = dict()
+   first_round = 0
+   if xgb_model is not None:
+      xgb_model = xgb.Booster(model_file=xgb_model)
+      first_round = xgb_model.num_boosted_rounds()
+   booster = xgb.train(
+      params, dtrain, num_boost_round=max(0, num_round-first_round), evals=[(dtrain, 'train'), (dtest, 'eval')],
+      early_stopping_rounds=early_stopping_rounds, maximize=maximize, evals_result=evals_result, verbose_eval=False,
+      xgb_model=xgb_model
+   )
+   scores = evals_result.get('eval', dict()).get(metric, [])
+   res = dict(rounds = first_round+len(scores))
+   if len(scores)>0:
+      best_iteration = int(np.argmax(scores) if maximize else np.argmin(scores))
+      res['score'] = float(scores[best_iteration])
+      res['best_iteration'] = first_round+best_iteration
+   if previous_result is not None and ('score' not in res or (previous_result['score']>=res['score'] if maximize else previous_result['score']<=res['score'])):
+      res['score'] = previous_result['score']
+      res['best_iteration'] = previous_result['best_iteration']
+   res['duration'] = time.time()-time_start
+   if save_model:
+      res['model'] = booster.save_raw()
+   return res
+
+
+class IvyXGBoostSearch:
+   """
+   A hyperparameter search driver for the booster parameters in IvyXGBoostParameters.
+   The trials are trained on the training partition of an IvyXGBoostDataInput object and scored on its test partition,
+   and they can be run in parallel over a pool of processes.
+   The partitions are copied once into shared memory, which all trial processes attach to without copying,
+   and each process builds the (quantized) DMatrix objects only once for all of its trials.
+   The result of each trial is appended to a trial log (one JSON record per line), from which an interrupted search can be resumed.
+   Each record carries a fingerprint of the settings common to all trials (see IvyXGBoostSearch::get_fingerprint),
+   and only the records with the fingerprint of the current search are resumed.
+   """
+   # Metrics for which larger values are better
+   maximized_metrics = [ "auc", "aucpr", "map", "ndcg", "pre" ]
+
+   def __init__(self, xgb_input, xgb_params, search_space, scale_weights=True, log_file=None, early_stopping_rounds=None):
+      """
+      IvyXGBoostSearch constructor:
+      - xgb_input: IvyXGBoostDataInput object
+      - xgb_params: IvyXGBoostParameters object with the base parameters of all trials
+      - search_space: Dictionary of parameter name to the values to search. The values can be given as
+        - a list of values, which are scanned in grid searches and chosen uniformly in random searches,
+        - a tuple (low, high) for a uniform distribution in random searches (integer if both low and high are integers), or
+        - a tuple (low, high, 'log') for a log-uniform distribution in random searches.
+        Grid searches only accept lists.
+      - scale_weights: Same as in IvyXGBoostTrainer::train. Default: True.
+      - log_file: Name of the trial log file. Default: None, i.e., the trials are not recorded.
+      - early_stopping_rounds: Number of rounds without improvement in the test partition after which a trial stops. Default: None.
+
+      The number of rounds of each trial is 'num_round' in the parameters, which can also be part of the search space.
+      The score of a trial is the best value of the last evaluation metric in the test partition.
+      """
+      self.xgb_input = xgb_input
+      self.base_params = xgb_params
+      self.search_space = dict(search_space)
+      for key, values in self.search_space.items():
+         if isinstance(values, tuple):
+            if len(values) not in [ 2, 3 ] or (len(values)==3 and values[2]!="log"):
+               raise RuntimeError("IvyXGBoostSearch: The range of parameter {} should be (low, high) or (low, high, 'log').".format(key))
+         elif not isinstance(values, list) or len(values)==0:
+            raise RuntimeError("IvyXGBoostSearch: The values of parameter {} should be a nonempty list or a tuple.".format(key))
+      # Trials without boosting rounds would have no score.
+      num_round_values = self.search_space.get('num_round', [ self.base_params.getParameters()['num_round'] ])
+      if min(num_round_values[0:2] if isinstance(num_round_values, tuple) else num_round_values)<1:
+         raise RuntimeError("IvyXGBoostSearch: The number of rounds 'num_round' should be at least 1.")
+      self.scale_weights = scale_weights
+      self.log_file = log_file
+      self.early_stopping_rounds = early_stopping_rounds
+      # Records of all trials run or resumed by this object
+      self.trials = []
+
+      # Resolve the settings common to all trials.
+      params = self.base_params.getParameters()
+      IvyXGBoostTrainer.configure_objective(params, len(self.xgb_input.class_types()))
+      if params['tree_method'] == "auto":
+         params['tree_method'] = "hist"
+      metric = params['eval_metric']
+      self.metric = metric[-1] if isinstance(metric, list) else metric
+      self.maximize = any(self.metric.startswith(m) for m in self.maximized_metrics)
+      self.common_params = params
+      self.fingerprint = self.get_fingerprint()
+
+      # Completed trials in the log with the same fingerprint, keyed by their parameters
+      self.logged_trials = dict()
+      # Identifier of the next trial, which continues the numbering of the trials in the log
+      self.next_trial = 0
+      nSkipped = 0
+      if self.log_file is not None and os.path.exists(self.log_file):
+         with open(self.log_file) as flog:
+            for line in flog:
+               line = line.strip()
+               if line == "":
+                  continue
+               try:
+                  record = json.loads(line)
+               except ValueError:
+                  # Skip a line that was only partially written when the search was interrupted.
+                  continue
+               self.next_trial = max(self.next_trial, record.get('trial', -1)+1)
+               if record.get('fingerprint', None)!=self.fingerprint:
+                  nSkipped += 1
+                  continue
+               self.logged_trials[self._get_trial_key(record['params'])] = record
+         print("IvyXGBoostSearch: {} trials are found in the trial log {}.".format(len(self.logged_trials), self.log_file))
+         if nSkipped>0:
+            print("IvyXGBoostSearch: {} trials in the trial log are skipped because they were run with different settings or data.".format(nSkipped))
+
+
+   def get_fingerprint(self):
+      """
+      Returns a hash of the settings common to all trials: the resolved base parameters, the metric, scale_weights, early_stopping_rounds,
+      the feature names, and the sizes of the training and test partitions.
+      Trials with different fingerprints are not comparable, so they are not resumed from the trial log.
+      """
+      settings = dict(
+         params = self.common_params,
+         metric = self.metric,
+         scale_weights = self.scale_weights,
+         early_stopping_rounds = self.early_stopping_rounds,
+         features = self.xgb_input.xgb_feature_names,
+         partition_sizes = [ (data[0].shape[0] if data is not None else 0) for data in [ self.xgb_input.data_train, self.xgb_input.data_test ] ]
+      )
+      return hashlib.sha1(json.dumps(settings, sort_keys=True, default=str).encode()).hexdigest()
+
+
+   @staticmethod
+   def _get_trial_key(trial_params):
+      """
+      Returns the key of a trial from the dictionary of its searched parameters.
+      """
+      return json.dumps(trial_params, sort_keys=True)
+
+
+   def _get_trial_parameters(self, trial_params):
+      """
+      Returns the dictionary of booster parameters for a trial with the searched parameters trial_params.
+      The types of parameters already defined in the base parameters are preserved (e.g., an integer value of 'alpha' is converted to float).
+      """
+      params = self.common_params.copy()
+      for key, val in trial_params.items():
+         if key in params.keys():
+            val = type(params[key])(val)
+         params[key] = val
+      return params
+
+
+   def _get_shared_arrays(self):
+      """
+      Copies the features, labels, and weights of the training and test partitions into shared memory.
+      Returns the list of shared memory blocks and the dictionary of array descriptors for _init_trial_process.
+      """
+      arrays = dict()
+      for partition, data in [ ("train", self.xgb_input.data_train), ("test", self.xgb_input.data_test) ]:
+         arrays[partition+"_features"] = data[0]
+         arrays[partition+"_labels"] = data[2]
+         arrays[partition+"_weights"] = self.xgb_input.get_weights(partition, self.scale_weights)
+      shm_blocks = []
+      shm_arrays = dict()
+      try:
+         for arr_name, arr in arrays.items():
+            arr = np.ascontiguousarray(arr)
+            shm = shared_memory.SharedMemory(create=True, size=max(1, arr.nbytes))
+            shm_blocks.append(shm)
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+            shm_arrays[arr_name] = (shm.name, arr.shape, arr.dtype.str)
+      except:
+         for shm in shm_blocks:
+            shm.close()
+            shm.unlink()
+         raise
+      return shm_blocks, shm_arrays
+
+
+   def _run_trials(self, trial_params_list, num_rounds, nprocesses, start_method, method, stage=None, continued_trials=None, save_models=False):
+      """
+      Runs the trials with the searched parameters in trial_params_list and the numbers of rounds in num_rounds, skipping those found in the trial log.
+      Repeated trials (e.g., a point drawn twice in a random search) are only run once.
+      - continued_trials: List of (raw model, record) of previous trials to continue, or None for each trial. Default: None.
+      - save_models: If True, the raw models of the trials that are run are returned as well. Default: False.
+      Returns the list of trial records in the same order as trial_params_list, and the list of raw models (None if not available).
+      """
+      records = [ None ]*len(trial_params_list)
+      models = [ None ]*len(trial_params_list)
+      if continued_trials is None:
+         continued_trials = [ None ]*len(trial_params_list)
+      # Pending trials, keyed by their parameters, with the indices of all trials in trial_params_list that share them
+      pending = dict()
+      for itrial, (trial_params, num_round, continued_trial) in enumerate(zip(trial_params_list, num_rounds, continued_trials)):
+         logged_params = dict(trial_params, num_round=num_round)
+         trial_key = self._get_trial_key(logged_params)
+         record = self.logged_trials.get(trial_key, None)
+         if record is not None:
+            records[itrial] = record
+         elif trial_key in pending:
+            pending[trial_key][0].append(itrial)
+         else:
+            params = self._get_trial_parameters(trial_params)
+            params.pop('num_round', None)
+            xgb_model, previous_record = (continued_trial if continued_trial is not None else (None, None))
+            previous_result = None
+            if previous_record is not None:
+               previous_result = dict(score=previous_record['score'], best_iteration=previous_record['best_iteration'])
+            pending[trial_key] = ([ itrial ], logged_params, (params, num_round, self.early_stopping_rounds, self.metric, self.maximize, xgb_model, previous_result, save_models))
+
+      def record_trial(itrials, logged_params, result):
+         model = result.pop('model', None)
+         record = dict(trial=self.next_trial, method=method, params=logged_params, fingerprint=self.fingerprint)
+         self.next_trial += 1
+         if stage is not None:
+            record['stage'] = stage
+         record.update(result)
+         self.logged_trials[self._get_trial_key(logged_params)] = record
+         for itrial in itrials:
+            records[itrial] = record
+            models[itrial] = model
+         if self.log_file is not None:
+            with open(self.log_file, "a") as flog:
+               flog.write(json.dumps(record)+"\n")
+         print("IvyXGBoostSearch: Trial {} with {} has {} = {:.6g} at iteration {}.".format(record['trial'], logged_params, self.metric, record['score'], record['best_iteration']))
+
+      if len(pending)>0:
+         shm_blocks, shm_arrays = self._get_shared_arrays()
+         init_args = (shm_arrays, self.xgb_input.xgb_feature_names, self.xgb_input.missing_value_default)
+         try:
+            if nprocesses<=1:
+               _init_trial_process(*init_args)
+               try:
+                  for itrials, logged_params, trial_args in pending.values():
+                     record_trial(itrials, logged_params, _run_trial(*trial_args))
+               finally:
+                  for shm in _trial_state['shm']:
+                     shm.close()
+                  _trial_state.clear()
+            else:
+               with ProcessPoolExecutor(
+                  max_workers=nprocesses, mp_context=multiprocessing.get_context(start_method),
+                  initializer=_init_trial_process, initargs=init_args
+                  ) as executor:
+                  futures = dict()
+                  for itrials, logged_params, trial_args in pending.values():
+                     futures[executor.submit(_run_trial, *trial_args)] = (itrials, logged_params)
+                  for future in as_completed(futures):
+                     itrials, logged_params = futures[future]
+                     record_trial(itrials, logged_params, future.result())
+         finally:
+            for shm in shm_blocks:
+               shm.close()
+               shm.unlink()
+
+      self.trials.extend(records)
+      return records, models
+
+
+   def _get_num_round(self, trial_params):
+      """
+      Returns the number of rounds of a trial.
+      """
+      return int(trial_params.get('num_round', self.base_params.getParameters()['num_round']))
+
+
+   def grid(self, nprocesses=1, start_method="spawn"):
+      """
+      Runs a trial for each combination of the values in the search space, which should only contain lists.
+      - nprocesses: Number of processes running the trials. Default: 1, i.e., the trials are run in this process.
+      - start_method: Start method of the processes (see multiprocessing.get_context). Default: 'spawn'.
+        With 'spawn', the main script needs to be protected by an 'if __name__ == "__main__":' block.
+      Returns the list of trial records.
+      """
+      keys = sorted(self.search_space.keys())
+      for key in keys:
+         if not isinstance(self.search_space[key], list):
+            raise RuntimeError("IvyXGBoostSearch::grid: Parameter {} should be given a list of values for a grid search.".format(key))
+      trial_params_list = [ dict(zip(keys, vals)) for vals in itertools.product(*[ self.search_space[key] for key in keys ]) ]
+      return self._run_trials(trial_params_list, [ self._get_num_round(tp) for tp in trial_params_list ], nprocesses, start_method, "grid")[0]
+
+
+   def sample(self, ntrials, seed=12345):
+      """
+      Returns a list of ntrials random points of the search space. The same seed always gives the same points.
+      """
+      rng = np.random.default_rng(seed)
+      keys = sorted(self.search_space.keys())
+      res = []
+      for _ in range(ntrials):
+         trial_params = dict()
+         for key in keys:
+            values = self.search_space[key]
+            if isinstance(values, list):
+               val = values[rng.integers(len(values))]
+            else:
+               low, high = values[0], values[1]
+               if len(values)==3:
+                  val = math.exp(rng.uniform(math.log(low), math.log(high)))
+               else:
+                  val = rng.uniform(low, high)
+               if isinstance(low, int) and isinstance(high, int):
+                  val = int(min(high, max(low, round(val))))
+               else:
+                  val = float(val)
+            trial_params[key] = val.item() if isinstance(val, np.generic) else val
+         res.append(trial_params)
+      return res
+
+
+   def random(self, ntrials, seed=12345, nprocesses=1, start_method="spawn"):
+      """
+      Runs ntrials trials at random points of the search space.
+      - seed: Seed of the random number generator, which needs to be the same in order to resume a search from the trial log. Default: 12345.
+      - nprocesses, start_method: Same as in IvyXGBoostSearch::grid.
+      Returns the list of trial records.
+      """
+      trial_params_list = self.sample(ntrials, seed)
+      return self._run_trials(trial_params_list, [ self._get_num_round(tp) for tp in trial_params_list ], nprocesses, start_method, "random")[0]
+
+
+   def successive_halving(self, ntrials, min_rounds, reduction_factor=3, seed=12345, nprocesses=1, start_method="spawn"):
+      """
+      Runs a successive-halving search over ntrials random points of the search space:
+      All trials are first trained with min_rounds rounds, and only the best 1/reduction_factor of them are continued
+      up to reduction_factor times as many rounds, until one trial remains or the number of rounds reaches 'num_round'.
+      The boosters of the surviving trials are continued from the previous stage instead of being trained again from scratch,
+      except for trials of the previous stage that were resumed from the trial log, for which no booster is available.
+      Trials with bad parameters are therefore aborted early, and most of the time is spent on promising ones.
+      - ntrials: Number of random points in the first stage
+      - min_rounds: Number of rounds in the first stage
+      - reduction_factor: Factor by which the number of trials is reduced and the number of rounds is increased in each stage. Default: 3.
+      - seed, nprocesses, start_method: Same as in IvyXGBoostSearch::random.
+      'num_round' should not be part of the search space in this mode.
+      Returns the list of trial records of the last stage.
+      """
+      if 'num_round' in self.search_space.keys():
+         raise RuntimeError("IvyXGBoostSearch::successive_halving: 'num_round' cannot be part of the search space in successive halving.")
+      if reduction_factor<2:
+         raise RuntimeError("IvyXGBoostSearch::successive_halving: The reduction factor should be at least 2.")
+      if min_rounds<1:
+         raise RuntimeError("IvyXGBoostSearch::successive_halving: The minimum number of rounds should be at least 1.")
+      max_rounds = self._get_num_round(dict())
+      trial_params_list = self.sample(ntrials, seed)
+      num_round = min(min_rounds, max_rounds)
+      stage = 0
+      continued_trials = None
+      while True:
+         is_last_stage = (len(trial_params_list)<=1 or num_round>=max_rounds)
+         records, models = self._run_trials(
+            trial_params_list, [ num_round ]*len(trial_params_list), nprocesses, start_method, "successive_halving", stage,
+            continued_trials=continued_trials, save_models=not is_last_stage
+         )
+         if is_last_stage:
+            return records
+         nkeep = max(1, len(trial_params_list)//reduction_factor)
+         order = sorted(range(len(records)), key=lambda itrial: records[itrial]['score'], reverse=self.maximize)
+         trial_params_list = [ trial_params_list[itrial] for itrial in order[0:nkeep] ]
+         continued_trials = [ ((models[itrial], records[itrial]) if models[itrial] is not None else None) for itrial in order[0:nkeep] ]
+         num_round = min(num_round*reduction_factor, max_rounds)
+         stage += 1
+
+
+   def best_trial(self):
+      """
+      Returns the record of the best trial run or resumed so far.
+      """
+      if len(self.trials)==0:
+         raise RuntimeError("IvyXGBoostSearch::best_trial: No trial has been run yet.")
+      best_fcn = max if self.maximize else min
+      return best_fcn(self.trials, key=lambda record: record['score'])
+
+
+   def best_parameters(self):
+      """
+      Returns an IvyXGBoostParameters object with the base parameters updated by those of the best trial.
+      The number of rounds is set to the best iteration of the trial.
+      """
+      record = self.best_trial()
+      base_params = self.base_params.getParameters()
+      res = IvyXGBoostParameters()
+      res.defineParameters(**base_params)
+      trial_params = dict(record['params'])
+      trial_params['num_round'] = record['best_iteration']+1
+      for key, val in trial_params.items():
+         if key in base_params.keys():
+            trial_params[key] = type(base_params[key])(val)
+      res.defineParameters(**trial_params)
+      return res
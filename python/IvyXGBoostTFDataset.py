@@ -0,0 +1,232 @@
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from IvyXGBoostDataInput import IvyXGBoostDataInput
+
+
+class IvyXGBoostTFDataset:
+   """
+   Builds tf.data.Dataset objects that stream the entries of an IvyXGBoostDataInput object, or of ROOT files read in the same way as
+   IvyXGBoostDataInput::load_input, in batches of (features, class values, weights) for the training of Keras models.
+   The weights are the absolute values of the input weights, normalized per class as in IvyXGBoostTrainer::train if requested,
+   so the datasets can be passed directly to model.fit, e.g., model.fit(ivytf.partition_dataset('train'), validation_data=ivytf.partition_dataset('test')).
+
+   The entries are read in chunks, and the chunks are shuffled through a buffer of a fixed number of entries,
+   so the memory usage is bounded by the size of the shuffle buffer regardless of the size of the input.
+   The batches are built by a Python generator through tf.data.Dataset.from_generator, which runs the generator inline, one batch after the other.
+   The preparation of the batches is therefore not parallelized, but prefetching lets it proceed while the model is trained on the previous batches.
+   The reading of ROOT files can be spread over several threads (see IvyXGBoostTFDataset::root_dataset).
+
+   TensorFlow is only imported when a dataset is built, so this module can be imported without it.
+   """
+   def __init__(self, xgb_input, batch_size=1024, shuffle_buffer_size=100000, scale_weights=True, seed=12345, prefetch_batches=None):
+      """
+      IvyXGBoostTFDataset constructor:
+      - xgb_input: IvyXGBoostDataInput object. Its features, class branch, and missing value indicator are used to read ROOT files as well.
+      - batch_size: Number of entries per batch. Default: 1024.
+      - shuffle_buffer_size: Number of entries shuffled together. Default: 100000.
+      - scale_weights: If True, the weights of each class are scaled such that their sum is equal to the average number of entries per class,
+        as in IvyXGBoostTrainer::train. Default: True.
+      - seed: Random seed of the shuffling. Each pass over a dataset (i.e., each epoch) is shuffled differently. Default: 12345.
+      - prefetch_batches: Number of batches prepared in advance. Default: None, i.e., tuned automatically by tf.data.
+      """
+      if batch_size<=0:
+         raise RuntimeError("IvyXGBoostTFDataset: The batch size should be positive.")
+      if shuffle_buffer_size<batch_size:
+         raise RuntimeError("IvyXGBoostTFDataset: The shuffle buffer size should be at least the batch size.")
+      self.xgb_input = xgb_input
+      self.batch_size = batch_size
+      self.shuffle_buffer_size = shuffle_buffer_size
+      self.scale_weights = scale_weights
+      self.seed = seed
+      self.prefetch_batches = prefetch_batches
+
+
+   @staticmethod
+   def _import_tensorflow():
+      """
+      Returns the tensorflow module.
+      """
+      try:
+         import tensorflow
+      except ImportError:
+         raise RuntimeError("IvyXGBoostTFDataset: Building datasets needs the tensorflow module.")
+      return tensorflow
+
+
+   def partition_dataset(self, partition='train', shuffle=True, chunk_size=None):
+      """
+      Returns the dataset of a partition of the data input.
+      - partition: One of 'train', 'test', or 'control'
+      - shuffle: If True, the entries are shuffled in each epoch. Default: True.
+      - chunk_size: Number of consecutive entries read at once. The chunks are taken in a random order if shuffle is True,
+        and their entries are shuffled within the shuffle buffer. Default: None, i.e., 1/16 of the shuffle buffer size.
+
+      The partition is accessed at the beginning of each epoch, so the dataset follows later changes of the data input (e.g., a new split).
+      If the data input uses a storage directory, the chunks are read from its memory-mapped files.
+      """
+      ipart = IvyXGBoostDataInput.partition_names.index(partition)
+      if chunk_size is None:
+         chunk_size = max(self.batch_size, self.shuffle_buffer_size//16)
+
+      def get_chunks(rng):
+         data = self.xgb_input._partition(ipart)
+         if data is None:
+            return
+         wgts = self.xgb_input.get_weights(partition, self.scale_weights)
+         begins = np.arange(0, data[0].shape[0], chunk_size)
+         if shuffle:
+            begins = rng.permutation(begins)
+         for begin in begins:
+            end = begin + chunk_size
+            yield np.asarray(data[0][begin:end]), np.asarray(data[2][begin:end]), np.asarray(wgts[begin:end])
+
+      return self._make_dataset(get_chunks, shuffle)
+
+
+   def root_dataset(self, samples, tree_name, shuffle=True, step_size=100000, nthreads=1, cache=None, selection=None, derived_features=None):
+      """
+      Returns the dataset of the entries of ROOT files, which are read anew in each epoch instead of being stored in the data input.
+      - samples: List of dictionaries for each sample with the keys 'file_name' (a file name, a glob pattern, or a list of those),
+        and optionally 'class_type' and 'weight_name' with the same meaning as in IvyXGBoostDataInput::load_input.
+      - tree_name: Name of TTree in the input files
+      - shuffle: If True, the read units are taken in a random order in each epoch, and their entries are shuffled within the shuffle buffer. Default: True.
+      - step_size: Number of entries (int) or memory budget (str, e.g., "100 MB") of each read unit. Default: 100000.
+      - nthreads: Number of threads used to read and decompress the input. Default: 1.
+      - cache: An IvyXGBoostDataCache object, which avoids the decompression of the ROOT files in the epochs after the first one. Default: None.
+      - selection, derived_features: Selection and derived feature expressions as in IvyXGBoostDataInput::load_input. Optional.
+
+      The read units of the samples are interleaved in proportion to their numbers, so the samples alternate in the stream even if shuffle is False.
+      If scale_weights is True, the per-class sums of weights are computed in an additional pass over the input when the dataset is built.
+      """
+      units = []
+      unit_settings = []
+      for isample, sample in enumerate(samples):
+         file_names = IvyXGBoostDataInput._expand_file_names(sample['file_name'])
+         class_type = sample.get('class_type', None)
+         weight_name = sample.get('weight_name', None)
+         if class_type is None and self.xgb_input.class_branch is None:
+            raise RuntimeError("IvyXGBoostTFDataset::root_dataset: The class type of sample {} needs to be specified because the data input has no class branch.".format(isample))
+         settings = (weight_name, class_type, cache, None, selection, derived_features)
+         sample_units = list(self.xgb_input._get_read_units(file_names, tree_name, step_size, weight_name, class_type, None, selection, derived_features))
+         units.append(sample_units)
+         unit_settings.append(settings)
+      # Interleave the read units of the samples in proportion to their numbers of units.
+      unit_order = sorted(
+         [ (isample, iunit) for isample in range(len(units)) for iunit in range(len(units[isample])) ],
+         key=lambda su: (su[1]+0.5)/len(units[su[0]])
+      )
+      read_units = [ (units[isample][iunit], unit_settings[isample]) for isample, iunit in unit_order ]
+
+      def read_unit(read_unit_spec):
+         unit, settings = read_unit_spec
+         features_data, weights, class_values, _ = self.xgb_input._read_entries(*unit, *settings)
+         return features_data, class_values, weights
+
+      def read_all(unit_specs):
+         if nthreads<=1:
+            for unit_spec in unit_specs:
+               yield read_unit(unit_spec)
+         else:
+            with ThreadPoolExecutor(max_workers=nthreads) as executor:
+               pending = deque()
+               try:
+                  for unit_spec in unit_specs:
+                     pending.append(executor.submit(read_unit, unit_spec))
+                     if len(pending)>=nthreads:
+                        yield pending.popleft().result()
+                  while pending:
+                     yield pending.popleft().result()
+               finally:
+                  # Cancel the reads that have not started yet if the generator is closed early (e.g., after steps_per_epoch batches).
+                  for future in pending:
+                     future.cancel()
+
+      scale_factors = None
+      classes = None
+      if self.scale_weights:
+         sums = dict()
+         nEntries = 0
+         for _, class_values, weights in read_all(read_units):
+            for cl, wsum in zip(*self._get_class_sums(class_values, weights)):
+               sums[cl] = sums.get(cl, 0.) + wsum
+            nEntries += class_values.size
+         classes = np.array(sorted(sums.keys()), dtype=np.int32)
+         scale_factors = IvyXGBoostDataInput._get_scale_factors(np.array([ sums[cl] for cl in classes ] + [ 0. ]), nEntries, classes.size, np.float32)
+
+      def get_chunks(rng):
+         unit_specs = read_units
+         if shuffle:
+            unit_specs = [ read_units[iunit] for iunit in rng.permutation(len(read_units)) ]
+         for features_data, class_values, weights in read_all(unit_specs):
+            weights = np.abs(weights)
+            if scale_factors is not None:
+               weights *= scale_factors[IvyXGBoostDataInput._get_class_indices(class_values, classes)]
+            yield features_data, class_values, weights
+
+      return self._make_dataset(get_chunks, shuffle)
+
+
+   @staticmethod
+   def _get_class_sums(class_values, weights):
+      """
+      Returns the array of class values present in class_values and the sums of absolute weights of each.
+      """
+      classes, class_idxs = np.unique(class_values, return_inverse=True)
+      return classes.tolist(), np.bincount(class_idxs, weights=np.abs(weights), minlength=classes.size).tolist()
+
+
+   def generate_batches(self, chunks, rng, shuffle=True):
+      """
+      Generates the batches of (features, class values, weights) arrays from an iterable of chunks of such arrays.
+      If shuffle is True, the chunks are collected until the shuffle buffer is full, and the entries of the buffer are shuffled and returned in batches.
+      The entries that do not fill a complete batch are kept for the next buffer, so only the last batch can be smaller than the batch size.
+      """
+      buffer_size = (self.shuffle_buffer_size if shuffle else self.batch_size)
+      pool = []
+      nPool = 0
+
+      def drain(final):
+         nonlocal pool, nPool
+         arrs = [ np.concatenate([ chunk[iarr] for chunk in pool ]) for iarr in range(3) ]
+         if shuffle:
+            order = rng.permutation(nPool)
+            arrs = [ arr[order] for arr in arrs ]
+         nKeep = (0 if final else nPool % self.batch_size)
+         for begin in range(0, nPool-nKeep, self.batch_size):
+            end = min(begin + self.batch_size, nPool-nKeep)
+            yield tuple([ arr[begin:end] for arr in arrs ])
+         pool = ([ tuple([ arr[nPool-nKeep:] for arr in arrs ]) ] if nKeep>0 else [])
+         nPool = nKeep
+
+      for features_data, class_values, weights in chunks:
+         if class_values.size==0:
+            continue
+         pool.append((features_data.astype(np.float32, copy=False), class_values.astype(np.int32, copy=False), weights.astype(np.float32, copy=False)))
+         nPool += class_values.size
+         if nPool>=buffer_size:
+            yield from drain(False)
+      if nPool>0:
+         yield from drain(True)
+
+
+   def _make_dataset(self, get_chunks, shuffle):
+      """
+      Returns the tf.data.Dataset of the batches built from the chunks generated by get_chunks(rng) in each epoch.
+      """
+      tf = self._import_tensorflow()
+      nFeatures = len(self.xgb_input.features)
+      output_signature = (
+         tf.TensorSpec(shape=(None, nFeatures), dtype=tf.float32),
+         tf.TensorSpec(shape=(None,), dtype=tf.int32),
+         tf.TensorSpec(shape=(None,), dtype=tf.float32)
+      )
+      epoch = 0
+      def generator():
+         nonlocal epoch
+         rng = np.random.default_rng([ self.seed, epoch ])
+         epoch += 1
+         yield from self.generate_batches(get_chunks(rng), rng, shuffle)
+
+      res = tf.data.Dataset.from_generator(generator, output_signature=output_signature)
+      return res.prefetch(self.prefetch_batches if self.prefetch_batches is not None else tf.data.AUTOTUNE)
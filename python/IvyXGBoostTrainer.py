@@ -1,9 +1,50 @@
 import os
 import sys
+import weakref
 import numpy as np
 import xgboost as xgb
+import multiprocessing
+from multiprocessing import shared_memory
+from xgboost.tracker import RabitTracker
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from IvyXGBoostDataInput import IvyXGBoostDataInput
 from IvyXGBoostParameters import IvyXGBoostParameters
+from IvyXGBoostDataIterator import IvyXGBoostDataIterator
+from IvyXGBoostCheckpoint import IvyXGBoostCheckpoint
+from IvyXGBoostProfiler import IvyXGBoostProfiler
+
+
+def _train_distributed_worker(rank, tracker_args, shm_arrays, row_ranges, feature_names, missing_value_default, params, classes, early_stopping_rounds, scale_weights, chunk_size):
+   """
+   Trains the shard of a worker process of IvyXGBoostTrainer::train_distributed.
+   - rank: Rank of the worker
+   - tracker_args: Arguments of the tracker for the communicator
+   - shm_arrays: Dictionary of array name to (shared memory name, shape, dtype) for the features, weights, and class values of each partition
+   - row_ranges: List of the (begin, end) ranges of the shard in each partition, or None for missing partitions
+   Returns the raw booster in UBJSON format from the worker of rank 0, and None from the others.
+   """
+   shm_blocks = []
+   partitions = []
+   try:
+      for pname, row_range in zip(IvyXGBoostDataInput.partition_names, row_ranges):
+         if row_range is None:
+            partitions.append(None)
+            continue
+         data = []
+         for suffix in [ "features", "weights", "class_values" ]:
+            shm_name, shape, dtype = shm_arrays["{}_{}".format(pname, suffix)]
+            shm = shared_memory.SharedMemory(name=shm_name)
+            shm_blocks.append(shm)
+            data.append(np.ndarray(shape, dtype=dtype, buffer=shm.buf)[row_range[0]:row_range[1]])
+         partitions.append(data)
+      with xgb.collective.CommunicatorContext(dmlc_task_id=str(rank), **tracker_args):
+         booster = IvyXGBoostTrainer._train_shard(partitions, classes, feature_names, missing_value_default, params, early_stopping_rounds, scale_weights, chunk_size, verbose_eval=(rank==0))
+      return (bytes(booster.save_raw(raw_format="ubj")) if rank==0 else None)
+   finally:
+      # The views need to be released before the shared memory blocks are closed.
+      del partitions
+      for shm in shm_blocks:
+         shm.close()
 
 
 class IvyXGBoostTrainer:
@@ -12,9 +53,49 @@ class IvyXGBoostTrainer:
       self.prediction_train = None
       self.prediction_test = None
       self.prediction_control = None
+      self.kfold_boosters = None
+      self.prediction_kfold = None
+      # DMatrix objects of the last call to IvyXGBoostTrainer::train, together with the input and the settings they were built with
+      self.dmatrix_cache = None
+      # IvyXGBoostProfiler object that records the stages of the training, or None if no profiling is needed
+      self.profiler = None
+
+
+   def train(self, xgb_input, xgb_params, early_stopping_rounds=None, scale_weights=True, save_predictions=False, chunk_size=None, external_memory=False, cache_prefix=None, xgb_model=None, checkpoint_file=None, checkpoint_interval=10, reuse_dmatrix=False):
+      """
+      Trains the booster.
+      - xgb_input: IvyXGBoostDataInput object
+      - xgb_params: IvyXGBoostParameters object
+      - early_stopping_rounds: Number of rounds without improvement in the evaluation sample after which the training stops. Default: None.
+      - scale_weights: If True, the sum of weights of each class is normalized to the average number of entries per class. Default: True.
+      - save_predictions: If True, the predictions for the training, test, and control samples are stored after the training. Default: False.
+      - chunk_size: If set, the data are passed to XGBoost in chunks of this many rows through IvyXGBoostDataIterator. Default: None.
+      - external_memory: If True (and chunk_size is set), the training DMatrix pages are kept on disk instead of memory. Default: False.
+      - cache_prefix: Prefix of the files of the external-memory pages. Default: None, i.e., 'ivyxgb_cache' in the working directory.
+      - xgb_model: Model to continue boosting from, given as a model file name, an xgb.Booster object, or an IvyXGBoostTrainer object after training.
+        The 'num_round' parameter is then the number of rounds added to this model. Default: None.
+      - checkpoint_file: If set, the booster is saved into this file every checkpoint_interval rounds and at the end of the training. Default: None.
+      - checkpoint_interval: Number of rounds between two checkpoints. Default: 10.
+      - reuse_dmatrix: If True, the DMatrix objects are kept after the training and reused by the next call with the same input. Default: False.
+        The kept objects hold memory as long as this trainer exists, so only enable this option when training repeatedly on the same input.
+
+      If chunk_size is set and external_memory is False, quantized DMatrix objects (xgb.QuantileDMatrix) are built chunk by chunk.
+      They hold the histogram bin indices instead of a copy of the feature values, so the data do not need to be stored twice.
+      Together with IvyXGBoostDataInput(storage_dir=...), external_memory=True allows training on samples larger than the available memory.
+      In both cases, the 'hist' tree method is used if 'tree_method' is 'auto', and the saved predictions are computed chunk by chunk.
 
+      If checkpoint_file already exists when the training starts, the training resumes from the checkpoint instead of xgb_model,
+      and only the remaining rounds are boosted. The state of early stopping and the random state of subsampling are not part of the checkpoint,
+      so early stopping restarts from the resumed round, and the resumed trees may differ from those of an uninterrupted training if subsample<1.
+      A checkpoint written at the end of a training is marked as complete, so it needs to be removed in order to train again from scratch.
 
-   def train(self, xgb_input, xgb_params, early_stopping_rounds=None, scale_weights=True, save_predictions=False):
+      The cached DMatrix objects are reused if the input object is the same, its entries and partitions did not change since the last call
+      (see IvyXGBoostDataInput.data_version), and the DMatrix settings (chunk_size, external_memory, cache_prefix, and 'max_bin' for quantized objects)
+      are the same. Only the labels and weights are updated then, so the construction and the quantile sketching are skipped.
+      The histogram bins of the 'hist' method are sketched with the weights at the time of the construction and are kept,
+      so a training with different weights (e.g., scale_weights changed) can differ slightly from one with newly built objects.
+      Changes made directly to the arrays of the partitions are not detected. Call IvyXGBoostTrainer::clear_dmatrix_cache to release the cached objects.
+      """
       data_train = xgb_input.data_train
       data_test = xgb_input.data_test
       data_control = xgb_input.data_control
@@ -22,65 +103,444 @@ class IvyXGBoostTrainer:
 
       params = xgb_params.getParameters()
 
-      classes = np.unique(data_train[2])
-      nClasses = classes.size
-      if nClasses==1:
-         raise RuntimeError("IvyXGBoostTrainer::train: Cannot train with only one class.")
-      else:
-         print("IvyXGBoostTrainer::train: {} classes were identified.".format(nClasses))
-         if nClasses>2:
-            params['num_class'] = nClasses
-            if 'objective' not in params.keys():
-               params['objective'] = "multi:softprob"
-            if params['eval_metric'] == "logloss":
-               params['eval_metric'] = "mlogloss"
+      self.configure_objective(params, len(xgb_input.class_types()))
+
+      num_round = params['num_round']
+      if xgb_model is not None and not isinstance(xgb_model, xgb.Booster):
+         xgb_model = (xgb.Booster(model_file=xgb_model) if isinstance(xgb_model, str) else getattr(xgb_model, 'booster', None))
+         if xgb_model is None:
+            raise RuntimeError("IvyXGBoostTrainer::train: The model to continue boosting from is not available.")
+      callbacks = None
+      if checkpoint_file is not None:
+         if os.path.exists(checkpoint_file):
+            xgb_model, target_rounds = IvyXGBoostCheckpoint.load(checkpoint_file)
+            num_round = max(0, target_rounds - xgb_model.num_boosted_rounds())
+            print("IvyXGBoostTrainer::train: Resuming from the checkpoint {} with {} rounds, {} rounds remain.".format(checkpoint_file, xgb_model.num_boosted_rounds(), num_round))
          else:
-            if 'objective' not in params.keys():
-               params['objective'] = "binary:logistic"
-            if params['eval_metric'] == "mlogloss":
-               params['eval_metric'] = "logloss"
-         print("- objective = {}".format(params['objective']))
-         print("- eval_metric = {}".format(params['eval_metric']))
-
-      wgts_train = np.abs(data_train[1])
-      wgts_test = np.abs(data_test[1])
-      wgts_control = np.abs(data_control[1]) if hasControlData else None
-      if scale_weights:
-         navg_train = np.float32(wgts_train.size)/np.float32(nClasses)
-         navg_test = np.float32(wgts_test.size)/np.float32(nClasses)
-         navg_control = np.float32(wgts_control.size)/np.float32(nClasses) if hasControlData else None
-         for cls in classes:
-            sum_train = wgts_train[data_train[2]==cls].sum()
-            sum_test = wgts_test[data_test[2]==cls].sum()
-            sum_control = wgts_control[data_control[2]==cls].sum() if hasControlData else None
-            wgts_train[data_train[2]==cls] *= navg_train / sum_train
-            wgts_test[data_test[2]==cls] *= navg_test / sum_test
-            if hasControlData:
-               wgts_control[data_control[2]==cls] *= navg_control / sum_control
-
-      dtrain = xgb.DMatrix( data_train[0], label=data_train[2], weight=wgts_train, feature_names=xgb_input.features, missing=xgb_input.missing_value_default )
-      dtest = xgb.DMatrix( data_test[0], label=data_test[2], weight=wgts_test, feature_names=xgb_input.features, missing=xgb_input.missing_value_default )
-      dcontrol = xgb.DMatrix( data_control[0], label=data_control[2], weight=wgts_control, feature_names=xgb_input.features, missing=xgb_input.missing_value_default ) if hasControlData else None
+            target_rounds = num_round + (xgb_model.num_boosted_rounds() if xgb_model is not None else 0)
+         callbacks = [ IvyXGBoostCheckpoint(checkpoint_file, checkpoint_interval, target_rounds) ]
+
+      with IvyXGBoostProfiler.get_stage(self.profiler, "train/weights"):
+         wgts_train = xgb_input.get_weights('train', scale_weights)
+         wgts_test = xgb_input.get_weights('test', scale_weights)
+         wgts_control = xgb_input.get_weights('control', scale_weights) if hasControlData else None
+
+      if chunk_size is not None and params['tree_method'] == "auto":
+         params['tree_method'] = "hist"
+
+      with IvyXGBoostProfiler.get_stage(self.profiler, "train/dmatrix"):
+         dmatrix_key = self._get_dmatrix_key(xgb_input, params, chunk_size, external_memory, cache_prefix)
+         if reuse_dmatrix and self.dmatrix_cache is not None and self.dmatrix_cache['input']() is xgb_input and self.dmatrix_cache['key']==dmatrix_key:
+            print("IvyXGBoostTrainer::train: Reusing the cached DMatrix objects...")
+            dtrain, dtest, dcontrol = self.dmatrix_cache['dmatrices']
+            for dmat, data, wgts in zip([ dtrain, dtest, dcontrol ], [ data_train, data_test, data_control ], [ wgts_train, wgts_test, wgts_control ]):
+               if dmat is not None:
+                  dmat.set_label(np.asarray(data[2]))
+                  dmat.set_weight(np.asarray(wgts))
+         else:
+            # Release the previous objects before building new ones.
+            self.dmatrix_cache = None
+            dtrain, dtest, dcontrol = self._build_dmatrices(xgb_input, params, [ data_train, data_test, data_control ], [ wgts_train, wgts_test, wgts_control ], chunk_size, external_memory, cache_prefix)
+            if reuse_dmatrix:
+               self.dmatrix_cache = dict(input=weakref.ref(xgb_input), key=dmatrix_key, dmatrices=(dtrain, dtest, dcontrol))
+
       eval_list = None
       if hasControlData:
          eval_list = [(dtrain,'train'), (dcontrol,'control'), (dtest,'eval')]
       else:
          eval_list = [(dtrain,'train'), (dtest,'eval')]
-      self.booster = xgb.train(params, dtrain, params['num_round'], eval_list, early_stopping_rounds=early_stopping_rounds)
+      if self.profiler is not None:
+         callbacks = (callbacks if callbacks is not None else []) + [ self.profiler.get_round_callback("train") ]
+      with IvyXGBoostProfiler.get_stage(self.profiler, "train/boost"):
+         self.booster = xgb.train(params, dtrain, num_round, eval_list, early_stopping_rounds=early_stopping_rounds, xgb_model=xgb_model, callbacks=callbacks)
 
       if save_predictions:
-         print("IvyXGBoostTrainer::train: Saving the predictions...")
-         self.prediction_train = self.booster.predict(dtrain)
-         self.prediction_test = self.booster.predict(dtest)
-         if hasControlData:
-            self.prediction_control = self.booster.predict(dcontrol)
+         with IvyXGBoostProfiler.get_stage(self.profiler, "train/predictions"):
+            print("IvyXGBoostTrainer::train: Saving the predictions...")
+            if chunk_size is None:
+               self.prediction_train = self.booster.predict(dtrain)
+               self.prediction_test = self.booster.predict(dtest)
+               if hasControlData:
+                  self.prediction_control = self.booster.predict(dcontrol)
+               else:
+                  self.prediction_control = None
+            else:
+               self.prediction_train = self.predict_chunked(data_train[0], chunk_size, xgb_input.missing_value_default)
+               self.prediction_test = self.predict_chunked(data_test[0], chunk_size, xgb_input.missing_value_default)
+               if hasControlData:
+                  self.prediction_control = self.predict_chunked(data_control[0], chunk_size, xgb_input.missing_value_default)
+               else:
+                  self.prediction_control = None
+
+
+   @staticmethod
+   def _get_dmatrix_key(xgb_input, params, chunk_size, external_memory, cache_prefix):
+      """
+      Returns the key that identifies the DMatrix objects built for the current partitions of xgb_input with the given settings.
+      """
+      res = [ xgb_input.data_version, tuple(xgb_input.features), float(xgb_input.missing_value_default), chunk_size ]
+      if chunk_size is not None:
+         res.append(external_memory)
+         if external_memory:
+            res.append(cache_prefix)
+         else:
+            res.append(params.get('max_bin', None))
+      return tuple(res)
+
+
+   @staticmethod
+   def _build_dmatrices(xgb_input, params, partitions, weights, chunk_size, external_memory, cache_prefix):
+      """
+      Builds the DMatrix objects of the training, test, and control partitions with the given weights.
+      The entries for missing partitions are None.
+      """
+      data_train, data_test, data_control = partitions
+      wgts_train, wgts_test, wgts_control = weights
+      hasControlData = (data_control is not None)
+
+      dtrain = None
+      dtest = None
+      dcontrol = None
+      if chunk_size is None:
+         dtrain = xgb.DMatrix( data_train[0], label=data_train[2], weight=wgts_train, feature_names=xgb_input.xgb_feature_names, missing=xgb_input.missing_value_default )
+         dtest = xgb.DMatrix( data_test[0], label=data_test[2], weight=wgts_test, feature_names=xgb_input.xgb_feature_names, missing=xgb_input.missing_value_default )
+         dcontrol = xgb.DMatrix( data_control[0], label=data_control[2], weight=wgts_control, feature_names=xgb_input.xgb_feature_names, missing=xgb_input.missing_value_default ) if hasControlData else None
+      elif external_memory:
+         if cache_prefix is None:
+            cache_prefix = os.path.join(os.getcwd(), "ivyxgb_cache")
+         dtrain = xgb.DMatrix( IvyXGBoostDataIterator(data_train, wgts_train, chunk_size, xgb_input.xgb_feature_names, cache_prefix+"_train"), missing=float(xgb_input.missing_value_default) )
+         dtest = xgb.DMatrix( IvyXGBoostDataIterator(data_test, wgts_test, chunk_size, xgb_input.xgb_feature_names, cache_prefix+"_eval"), missing=float(xgb_input.missing_value_default) )
+         dcontrol = xgb.DMatrix( IvyXGBoostDataIterator(data_control, wgts_control, chunk_size, xgb_input.xgb_feature_names, cache_prefix+"_control"), missing=float(xgb_input.missing_value_default) ) if hasControlData else None
+      else:
+         qdm_args = dict(missing=float(xgb_input.missing_value_default))
+         if 'max_bin' in params.keys():
+            qdm_args['max_bin'] = params['max_bin']
+         dtrain = xgb.QuantileDMatrix( IvyXGBoostDataIterator(data_train, wgts_train, chunk_size, xgb_input.xgb_feature_names), **qdm_args )
+         dtest = xgb.QuantileDMatrix( IvyXGBoostDataIterator(data_test, wgts_test, chunk_size, xgb_input.xgb_feature_names), ref=dtrain, **qdm_args )
+         dcontrol = xgb.QuantileDMatrix( IvyXGBoostDataIterator(data_control, wgts_control, chunk_size, xgb_input.xgb_feature_names), ref=dtrain, **qdm_args ) if hasControlData else None
+      return dtrain, dtest, dcontrol
+
+
+   def clear_dmatrix_cache(self):
+      """
+      Releases the DMatrix objects kept for reuse by IvyXGBoostTrainer::train.
+      """
+      self.dmatrix_cache = None
+
+
+   def train_kfold(self, xgb_input, xgb_params, nfolds, early_stopping_rounds=None, scale_weights=True, nparallel=1, chunk_size=100000):
+      """
+      Trains one booster per fold in k-fold cross-validation mode.
+      - xgb_input: IvyXGBoostDataInput object
+      - xgb_params: IvyXGBoostParameters object
+      - nfolds: Number of folds. The fold of an entry is its event number modulo nfolds (see IvyXGBoostDataInput::split_folds).
+      - early_stopping_rounds: Number of rounds without improvement in the evaluation sample after which the training stops. Default: None.
+        If set, the booster of fold i is evaluated on fold (i+1)%nfolds, which is then excluded from its training sample,
+        so at least 3 folds are needed.
+      - scale_weights: If True, the sum of weights of each class in the training sample of each fold is normalized to the average number of entries per class. Default: True.
+      - nparallel: Number of folds trained concurrently. The 'nthread' parameter is divided among them. Default: 1.
+      - chunk_size: Number of rows passed to XGBoost in each chunk when the quantized DMatrix objects are built. Default: 100000.
+
+      The booster of fold i is trained on the entries of all other folds and is applied to the entries of fold i,
+      so each entry receives an out-of-fold prediction. The data are arranged into folds once, and the training samples of all folds
+      are passed to XGBoost as views of the same storage, so no copies of the full sample are made per fold.
+      The train, test, and control partitions of xgb_input are not used.
+
+      The boosters are stored in self.kfold_boosters, and the out-of-fold predictions in the order the entries were added are stored in self.prediction_kfold.
+      Returns the out-of-fold predictions.
+      """
+      if nparallel<1:
+         raise RuntimeError("IvyXGBoostTrainer::train_kfold: The number of folds trained in parallel should be positive.")
+      if early_stopping_rounds is not None and nfolds<3:
+         raise RuntimeError("IvyXGBoostTrainer::train_kfold: At least 3 folds are needed with early stopping since one fold other than the predicted one is used for the evaluation.")
+      fold_ranges = xgb_input.split_folds(nfolds)
+      if any([ begin==end for begin, end in fold_ranges ]):
+         raise RuntimeError("IvyXGBoostTrainer::train_kfold: Some folds have no entries. Please check the event numbers.")
+
+      params = xgb_params.getParameters()
+      # The classes are taken from the whole storage since accessing the partitions would rearrange the folds.
+      self.configure_objective(params, np.unique(xgb_input.buffer.views()[2]).size)
+      if params['tree_method'] == "auto":
+         params['tree_method'] = "hist"
+      nparallel = min(nparallel, nfolds)
+      params['nthread'] = max(1, params['nthread']//nparallel)
+
+      def train_fold(ifold):
+         folds_train = [ jfold for jfold in range(nfolds) if jfold!=ifold ]
+         fold_eval = None
+         if early_stopping_rounds is not None:
+            fold_eval = (ifold+1) % nfolds
+            folds_train.remove(fold_eval)
+         qdm_args = dict(missing=float(xgb_input.missing_value_default), nthread=params['nthread'])
+         if 'max_bin' in params.keys():
+            qdm_args['max_bin'] = params['max_bin']
+         dtrain = xgb.QuantileDMatrix( IvyXGBoostDataIterator(xgb_input.get_fold_data(folds_train), xgb_input.get_fold_weights(folds_train, scale_weights), chunk_size, xgb_input.xgb_feature_names), **qdm_args )
+         eval_list = [(dtrain,'train')]
+         if fold_eval is not None:
+            deval = xgb.QuantileDMatrix( IvyXGBoostDataIterator(xgb_input.get_fold_data([ fold_eval ]), xgb_input.get_fold_weights([ fold_eval ], scale_weights), chunk_size, xgb_input.xgb_feature_names), ref=dtrain, **qdm_args )
+            eval_list.append((deval,'eval'))
+         print("IvyXGBoostTrainer::train_kfold: Training fold {} with {} thread(s)...".format(ifold, params['nthread']))
+         callbacks = ([ self.profiler.get_round_callback("train_kfold") ] if self.profiler is not None else None)
+         # Folds may be trained concurrently, so only their time is recorded.
+         with IvyXGBoostProfiler.get_stage(self.profiler, "train_kfold/boost", measure_memory=False):
+            booster = xgb.train(params, dtrain, params['num_round'], eval_list, early_stopping_rounds=early_stopping_rounds, verbose_eval=(nparallel==1), callbacks=callbacks)
+         del dtrain
+         prediction = self.predict_chunked(xgb_input.get_fold_data([ ifold ])[0][0], chunk_size, xgb_input.missing_value_default, booster)
+         return booster, prediction
+
+      with IvyXGBoostProfiler.get_stage(self.profiler, "train_kfold"):
+         if nparallel==1:
+            results = [ train_fold(ifold) for ifold in range(nfolds) ]
+         else:
+            with ThreadPoolExecutor(max_workers=nparallel) as executor:
+               results = list(executor.map(train_fold, range(nfolds)))
+
+      self.kfold_boosters = [ booster for booster, _ in results ]
+      self.prediction_kfold = np.empty((xgb_input.buffer.size,)+results[0][1].shape[1:], dtype=results[0][1].dtype)
+      for ifold, (_, prediction) in enumerate(results):
+         self.prediction_kfold[xgb_input.get_fold_entry_ids(ifold)] = prediction
+      return self.prediction_kfold
+
+
+   def train_distributed(self, xgb_input, xgb_params, nworkers, early_stopping_rounds=None, scale_weights=True, save_predictions=False, chunk_size=100000, host_ip="127.0.0.1", port=0, timeout=600, start_method="spawn"):
+      """
+      Trains one booster with the data distributed over several worker processes on this machine, which communicate through XGBoost's collective interface.
+      - xgb_input: IvyXGBoostDataInput object
+      - xgb_params: IvyXGBoostParameters object
+      - nworkers: Number of worker processes. The 'nthread' parameter is divided among them.
+      - early_stopping_rounds: Number of rounds without improvement in the evaluation sample after which the training stops. Default: None.
+      - scale_weights: If True, the sum of weights of each class is normalized to the average number of entries per class. Default: True.
+      - save_predictions: If True, the predictions for the training, test, and control samples are stored after the training. Default: False.
+      - chunk_size: Number of rows passed to XGBoost in each chunk when the quantized DMatrix objects are built, and in the predictions. Default: 100000.
+      - host_ip: Address on which the tracker listens. Default: '127.0.0.1'.
+      - port: Port of the tracker. Default: 0, i.e., any free port.
+      - timeout: Time in seconds after which the tracker gives up if the workers do not connect or finish. Default: 600.
+      - start_method: Start method of the worker processes ('spawn', 'fork', or 'forkserver'). Default: 'spawn'.
+
+      The training, test, and control partitions are copied once into shared memory, and each worker trains on a contiguous shard of 1/nworkers of each partition.
+      The quantile sketches, the histograms, and the evaluation metrics are combined over all workers in each round,
+      and the weights are normalized with the per-class sums of all shards, so the booster is comparable to that of IvyXGBoostTrainer::train
+      with the 'hist' tree method. The bins of the distributed sketch can differ slightly from those of a single process.
+      The 'hist' tree method is used if 'tree_method' is 'auto'.
+
+      A tracker is started in this process to connect the workers. For workers on several machines,
+      start the tracker through IvyXGBoostTrainer::start_tracker and call IvyXGBoostTrainer::train_distributed_worker in each worker instead.
+      """
+      if nworkers<2:
+         raise RuntimeError("IvyXGBoostTrainer::train_distributed: The number of workers should be at least 2.")
+      partitions = [ xgb_input.data_train, xgb_input.data_test, xgb_input.data_control ]
+      for pname, data in zip(IvyXGBoostDataInput.partition_names[0:2], partitions[0:2]):
+         if data is None or data[0].shape[0]<nworkers:
+            raise RuntimeError("IvyXGBoostTrainer::train_distributed: The {} partition has fewer entries than the number of workers.".format(pname))
+
+      params = xgb_params.getParameters()
+      classes = np.array(xgb_input.class_types())
+      self.configure_objective(params, classes.size)
+      if params['tree_method'] == "auto":
+         params['tree_method'] = "hist"
+      nthread = params['nthread']
+      params['nthread'] = max(1, nthread//nworkers)
+
+      with IvyXGBoostProfiler.get_stage(self.profiler, "train_distributed"):
+         shm_blocks = []
+         shm_arrays = dict()
+         tracker = None
+         try:
+            worker_ranges = [ [] for _ in range(nworkers) ]
+            for pname, data in zip(IvyXGBoostDataInput.partition_names, partitions):
+               if data is None:
+                  for rank in range(nworkers):
+                     worker_ranges[rank].append(None)
+                  continue
+               for suffix, arr in zip([ "features", "weights", "class_values" ], data):
+                  arr = np.ascontiguousarray(arr)
+                  shm = shared_memory.SharedMemory(create=True, size=max(1, arr.nbytes))
+                  shm_blocks.append(shm)
+                  np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+                  shm_arrays["{}_{}".format(pname, suffix)] = (shm.name, arr.shape, arr.dtype.str)
+               boundaries = np.linspace(0, data[0].shape[0], nworkers+1).astype(np.int64)
+               for rank in range(nworkers):
+                  worker_ranges[rank].append((int(boundaries[rank]), int(boundaries[rank+1])))
+
+            tracker = self.start_tracker(nworkers, host_ip, port, timeout)
+            print("IvyXGBoostTrainer::train_distributed: Training with {} workers and {} thread(s) per worker...".format(nworkers, params['nthread']))
+            with ProcessPoolExecutor(max_workers=nworkers, mp_context=multiprocessing.get_context(start_method)) as executor:
+               futures = [
+                  executor.submit(
+                     _train_distributed_worker, rank, tracker.worker_args(), shm_arrays, worker_ranges[rank],
+                     xgb_input.xgb_feature_names, xgb_input.missing_value_default, params, classes, early_stopping_rounds, scale_weights, chunk_size
+                  ) for rank in range(nworkers)
+               ]
+               results = [ future.result() for future in futures ]
+            tracker.wait_for()
+         finally:
+            if tracker is not None:
+               tracker.free()
+            for shm in shm_blocks:
+               shm.close()
+               shm.unlink()
+
+      self.booster = xgb.Booster(model_file=bytearray(results[0]))
+      self.booster.set_param({ 'nthread': nthread })
+
+      if save_predictions:
+         print("IvyXGBoostTrainer::train_distributed: Saving the predictions...")
+         self.prediction_train = self.predict_chunked(partitions[0][0], chunk_size, xgb_input.missing_value_default)
+         self.prediction_test = self.predict_chunked(partitions[1][0], chunk_size, xgb_input.missing_value_default)
+         if partitions[2] is not None:
+            self.prediction_control = self.predict_chunked(partitions[2][0], chunk_size, xgb_input.missing_value_default)
          else:
             self.prediction_control = None
 
 
+   @staticmethod
+   def start_tracker(nworkers, host_ip, port=0, timeout=600):
+      """
+      Starts and returns the tracker that connects nworkers workers of a distributed training.
+      The arguments to pass to each worker (e.g., IvyXGBoostTrainer::train_distributed_worker) are returned by tracker.worker_args().
+      The workers are ordered by their rank, and tracker.wait_for() returns once they are all finished.
+      """
+      tracker = RabitTracker(n_workers=nworkers, host_ip=host_ip, port=port, sortby="task", timeout=timeout)
+      tracker.start()
+      return tracker
+
+
+   def train_distributed_worker(self, xgb_input, xgb_params, tracker_args, rank, early_stopping_rounds=None, scale_weights=True, chunk_size=100000):
+      """
+      Trains one worker of a distributed training on the partitions of xgb_input, which hold the shard of this worker (e.g., the data of the worker's own input files).
+      - tracker_args: Arguments of the tracker, as returned by tracker.worker_args() for the tracker started by IvyXGBoostTrainer::start_tracker
+      - rank: Rank of the worker, from 0 to the number of workers - 1
+      The other arguments are as in IvyXGBoostTrainer::train_distributed. All workers need to be called with the same parameters.
+
+      The classes are assumed to be 0, 1, ..., up to the largest class value in all shards, as XGBoost needs for the labels.
+      The booster, which is the same in all workers, is stored in self.booster.
+      """
+      params = xgb_params.getParameters()
+      if params['tree_method'] == "auto":
+         params['tree_method'] = "hist"
+      partitions = [ xgb_input.data_train, xgb_input.data_test, xgb_input.data_control ]
+      with xgb.collective.CommunicatorContext(dmlc_task_id=str(rank), **tracker_args):
+         max_class = (int(np.max(partitions[0][2])) if partitions[0] is not None and partitions[0][2].size>0 else -1)
+         max_class = int(xgb.collective.allreduce(np.array([ max_class ], dtype=np.int64), xgb.collective.Op.MAX)[0])
+         classes = np.arange(max_class+1, dtype=np.int32)
+         self.configure_objective(params, classes.size)
+         self.booster = self._train_shard(partitions, classes, xgb_input.xgb_feature_names, xgb_input.missing_value_default, params, early_stopping_rounds, scale_weights, chunk_size, verbose_eval=(rank==0))
+
+
+   @staticmethod
+   def _train_shard(partitions, classes, feature_names, missing_value_default, params, early_stopping_rounds, scale_weights, chunk_size, verbose_eval):
+      """
+      Trains the booster on the shard of a worker in a distributed training. This function needs to be called within a communicator context.
+      - partitions: List of [features, weights, class values] arrays of the training, test, and control shards. Missing shards are None.
+        The control partition is evaluated if any of the workers has one.
+      - classes: Sorted array of class values used in the normalization of the weights
+      """
+      nFeatures = len(feature_names)
+      has_control = int(xgb.collective.allreduce(np.array([ int(partitions[2] is not None) ], dtype=np.int32), xgb.collective.Op.MAX)[0])
+      for ipart in range(3):
+         if partitions[ipart] is None and (ipart<2 or has_control):
+            partitions[ipart] = [ np.empty((0, nFeatures), dtype=np.float32), np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int32) ]
+
+      qdm_args = dict(missing=float(missing_value_default), nthread=params['nthread'])
+      if 'max_bin' in params.keys():
+         qdm_args['max_bin'] = params['max_bin']
+      dmatrices = []
+      for data in partitions:
+         if data is None:
+            dmatrices.append(None)
+            continue
+         wgts = np.abs(data[1])
+         if scale_weights:
+            # The per-class sums and the number of entries are summed over all shards, as if the partition were in a single process.
+            class_idxs = IvyXGBoostDataInput._get_class_indices(data[2], classes)
+            sums = xgb.collective.allreduce(np.bincount(class_idxs, weights=wgts, minlength=classes.size+1), xgb.collective.Op.SUM)
+            nEntries = int(xgb.collective.allreduce(np.array([ wgts.size ], dtype=np.int64), xgb.collective.Op.SUM)[0])
+            wgts *= IvyXGBoostDataInput._get_scale_factors(sums, nEntries, classes.size, wgts.dtype)[class_idxs]
+         if params['tree_method'] == "hist":
+            dmatrices.append(xgb.QuantileDMatrix(IvyXGBoostDataIterator(data, wgts, chunk_size, feature_names), ref=(dmatrices[0] if len(dmatrices)>0 else None), **qdm_args))
+         else:
+            dmatrices.append(xgb.DMatrix(data[0], label=data[2], weight=wgts, feature_names=feature_names, missing=float(missing_value_default)))
+      dtrain, dtest, dcontrol = dmatrices
+
+      if dcontrol is not None:
+         eval_list = [(dtrain,'train'), (dcontrol,'control'), (dtest,'eval')]
+      else:
+         eval_list = [(dtrain,'train'), (dtest,'eval')]
+      return xgb.train(params, dtrain, params['num_round'], eval_list, early_stopping_rounds=early_stopping_rounds, verbose_eval=verbose_eval)
+
+
+   @staticmethod
+   def configure_objective(params, nClasses):
+      """
+      Sets the objective (unless it is already set), the number of classes, and the evaluation metric in the dictionary of parameters params
+      for training with nClasses classes.
+      """
+      if nClasses==1:
+         raise RuntimeError("IvyXGBoostTrainer::configure_objective: Cannot train with only one class.")
+      print("IvyXGBoostTrainer::configure_objective: {} classes were identified.".format(nClasses))
+      if nClasses>2:
+         params['num_class'] = nClasses
+         if 'objective' not in params.keys():
+            params['objective'] = "multi:softprob"
+         if params['eval_metric'] == "logloss":
+            params['eval_metric'] = "mlogloss"
+      else:
+         if 'objective' not in params.keys():
+            params['objective'] = "binary:logistic"
+         if params['eval_metric'] == "mlogloss":
+            params['eval_metric'] = "logloss"
+      print("- objective = {}".format(params['objective']))
+      print("- eval_metric = {}".format(params['eval_metric']))
+
+
+   def predict_chunked(self, features, chunk_size, missing_value, booster=None):
+      """
+      Returns the predictions of the booster for a 2D array of features, computed in chunks of chunk_size rows without building a DMatrix.
+      - booster: Booster to use instead of self.booster. Default: None.
+      """
+      if booster is None:
+         booster = self.booster
+      res = []
+      for begin in range(0, features.shape[0], chunk_size):
+         res.append(booster.inplace_predict(np.asarray(features[begin:begin+chunk_size]), missing=float(missing_value)))
+      return np.concatenate(res)
+
+
    def save_model(self, fname):
       if self.booster is not None:
          if fname.endswith(".dump"):
             self.booster.dump_model(fname)
          else:
             self.booster.save_model(fname)
+
+
+   def save_kfold_models(self, fname):
+      """
+      Saves the boosters of the folds after IvyXGBoostTrainer::train_kfold.
+      - fname: File name with the placeholder '{fold}', which is replaced by the fold index (e.g., 'model_fold{fold}.json').
+      The files of higher fold indices from an earlier training with more folds are removed.
+      Returns the list of file names.
+      """
+      if self.kfold_boosters is None:
+         raise RuntimeError("IvyXGBoostTrainer::save_kfold_models: The boosters of the folds are not trained.")
+      if "{fold}" not in fname:
+         raise RuntimeError("IvyXGBoostTrainer::save_kfold_models: The file name {} should contain the placeholder '{{fold}}'.".format(fname))
+      res = []
+      for ifold, booster in enumerate(self.kfold_boosters):
+         fname_fold = fname.replace("{fold}", str(ifold))
+         if fname_fold.endswith(".dump"):
+            booster.dump_model(fname_fold)
+         else:
+            booster.save_model(fname_fold)
+         res.append(fname_fold)
+      # IvyXGBoostKFoldInterface::build counts the folds from the consecutive files,
+      # so the files of higher fold indices left over from an earlier training with more folds should be removed.
+      ifold = len(self.kfold_boosters)
+      while True:
+         fname_fold = fname.replace("{fold}", str(ifold))
+         if not os.path.exists(fname_fold):
+            break
+         print("IvyXGBoostTrainer::save_kfold_models: Removing the model file {} left over from an earlier training with more folds.".format(fname_fold))
+         os.remove(fname_fold)
+         ifold += 1
+      return res
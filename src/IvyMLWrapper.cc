@@ -0,0 +1,34 @@
+#include <string>
+#include "IvyMLWrapper.h"
+#include "IvyFramework/IvyDataTools/interface/IvyStreamHelpers.hh"
+
+
+using namespace std;
+using namespace IvyStreamHelpers;
+
+
+std::vector<TString> IvyMLWrapper::expandVariableNames(std::vector<TString> const& varnames){
+  std::vector<TString> res;
+  res.reserve(varnames.size());
+  for (auto const& varname:varnames){
+    std::string const strname = varname.Data();
+    size_t const pos_open = strname.rfind('[');
+    size_t const pos_sep = strname.find("..", (pos_open==std::string::npos ? 0 : pos_open));
+    if (
+      pos_open==std::string::npos || pos_open==0 || pos_sep==std::string::npos || strname.back()!=']'
+      ||
+      strname.find_first_not_of("0123456789", pos_open+1)!=pos_sep || pos_sep==pos_open+1
+      ||
+      strname.find_first_not_of("0123456789", pos_sep+2)!=strname.size()-1 || pos_sep+2==strname.size()-1
+      ){
+      res.push_back(varname);
+      continue;
+    }
+    std::string const basename = strname.substr(0, pos_open);
+    unsigned long const first = std::stoul(strname.substr(pos_open+1, pos_sep-pos_open-1));
+    unsigned long const last = std::stoul(strname.substr(pos_sep+2, strname.size()-pos_sep-3));
+    if (last<first) IVYerr << "IvyMLWrapper::expandVariableNames: The range of elements in the variable name " << varname << " is empty." << endl;
+    for (unsigned long idx=first; idx<=last; idx++) res.push_back((basename + "[" + std::to_string(idx) + "]").data());
+  }
+  return res;
+}
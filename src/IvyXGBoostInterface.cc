@@ -1,4 +1,8 @@
 #include <limits>
+#include <cmath>
+#include <cstdint>
+#include <cstdio>
+#include <mutex>
 #include "IvyFramework/IvyDataTools/interface/HostHelpersCore.h"
 #include "IvyXGBoostInterface.hpp"
 
@@ -6,16 +10,14 @@
 IvyXGBoostInterface::IvyXGBoostInterface() :
   IvyMLWrapper(),
   booster(nullptr),
-  defval(0)
+  defval(0),
+  nOutputs(0),
+  lazy_loading(false),
+  load_success(false)
 {}
 
-IvyXGBoostInterface::~IvyXGBoostInterface(){
-  SAFE_XGBOOST(XGBoosterFree(*booster));
-  delete booster;
-}
-
 bool IvyXGBoostInterface::build(TString fname, std::vector<TString> const& varnames, IvyMLDataType_t missing_entry_val){
-  if (booster){
+  if (model_file!=""){
     IVYerr << "IvyXGBoostInterface::build: The booster is already built." << endl;
     return false;
   }
@@ -30,15 +32,174 @@ bool IvyXGBoostInterface::build(TString fname, std::vector<TString> const& varna
     assert(0);
   }
 
+  model_file = fname;
   defval = missing_entry_val;
-  variable_names = varnames;
+  variable_names = expandVariableNames(varnames);
+
+  char config[256];
+  if (std::isnan(defval)) snprintf(config, sizeof(config), "{\"type\": 0, \"training\": false, \"iteration_begin\": 0, \"iteration_end\": 0, \"strict_shape\": false, \"missing\": NaN}");
+  else snprintf(config, sizeof(config), "{\"type\": 0, \"training\": false, \"iteration_begin\": 0, \"iteration_end\": 0, \"strict_shape\": false, \"missing\": %.9g}", static_cast<double>(defval));
+  prediction_config = config;
+
+  input_buffer.assign(variable_names.size(), defval);
+  input_buffer_interface = getArrayInterface(input_buffer.data(), 1, input_buffer.size());
+
+  if (lazy_loading) return true;
+  return this->loadModel();
+}
+
+bool IvyXGBoostInterface::loadModel() const{
+  if (model_file==""){
+    IVYerr << "IvyXGBoostInterface::loadModel: The interface is not built." << endl;
+    return false;
+  }
+
+  std::call_once(
+    load_flag,
+    [this](){
+      model = IvyXGBoostModelRegistry::instance().getModel(model_file);
+      if (!model) return;
+
+      // Run a prediction with all inputs missing in order to find the number of scores per event.
+      // This prediction also completes the configuration of a newly loaded booster.
+      std::vector<IvyMLDataType_t> dummy_inputs(variable_names.size(), defval);
+      std::string dummy_interface = getArrayInterface(dummy_inputs.data(), 1, dummy_inputs.size());
+      std::vector<IvyMLDataType_t> dummy_scores;
+      if (!this->predict(&(model->booster), dummy_inputs.data(), 1, dummy_scores, dummy_interface.c_str())) return;
+      nOutputs = dummy_scores.size();
+
+      booster = &(model->booster);
+      load_success = true;
+    }
+  );
+  return load_success;
+}
+
+std::string IvyXGBoostInterface::getArrayInterface(IvyMLDataType_t const* data, unsigned long long nevents, unsigned long long nFeatures){
+  char arr_interface[256];
+  snprintf(
+    arr_interface, sizeof(arr_interface),
+    "{\"data\": [%llu, true], \"shape\": [%llu, %llu], \"typestr\": \"<f4\", \"version\": 3}",
+    static_cast<unsigned long long>(reinterpret_cast<std::uintptr_t>(data)), nevents, nFeatures
+  );
+  return std::string(arr_interface);
+}
+
+int IvyXGBoostInterface::getVariableIndex(TString const& varname) const{
+  for (size_t iv=0; iv<variable_names.size(); iv++){
+    if (variable_names.at(iv)==varname) return static_cast<int>(iv);
+  }
+  return -1;
+}
+
+IvyMLWrapper::IvyMLDataType_t* IvyXGBoostInterface::bindVariable(TString const& varname){
+  int iv = getVariableIndex(varname);
+  if (iv<0){
+    IVYerr << "IvyXGBoostInterface::bindVariable: Variable " << varname << " is not one of the input variables." << endl;
+    return nullptr;
+  }
+  return &(input_buffer[iv]);
+}
+
+void IvyXGBoostInterface::resetInputs(){
+  for (auto& val:input_buffer) val = defval;
+}
 
+bool IvyXGBoostInterface::predict(BoosterHandle* const& booster_handle, IvyMLDataType_t const* data, unsigned long long nevents, std::vector<IvyMLDataType_t>& res, char const* data_interface) const{
+  res.clear();
+  if (!booster_handle){
+    IVYerr << "IvyXGBoostInterface::predict: The booster is not built." << endl;
+    return false;
+  }
+  const unsigned long long nFeatures = variable_names.size();
+
+  int err_predict = 0;
+  bst_ulong nout = 0;
+  IvyMLDataType_t const* score = nullptr;
+#ifdef IVYXGBOOST_HAS_INPLACE_PREDICT
+  std::string arr_interface;
+  if (!data_interface){
+    arr_interface = getArrayInterface(data, nevents, nFeatures);
+    data_interface = arr_interface.data();
+  }
+
+  bst_ulong const* out_shape = nullptr;
+  bst_ulong out_dim = 0;
+  err_predict = XGBoosterPredictFromDense(*booster_handle, data_interface, prediction_config.data(), nullptr, &out_shape, &out_dim, &score);
+  if (err_predict==0){
+    nout = 1;
+    for (bst_ulong idim=0; idim<out_dim; idim++) nout *= out_shape[idim];
+  }
+#else
+  // Predictions through DMatrix objects are not thread-safe, so lock the shared booster.
+  std::unique_lock<std::mutex> lock_shared;
+  if (model && booster_handle==&(model->booster)) lock_shared = std::unique_lock<std::mutex>(model->mutex);
+  DMatrixHandle dvalues;
+  SAFE_XGBOOST(XGDMatrixCreateFromMat(data, nevents, nFeatures, defval, &dvalues));
+#ifdef IVYXGBOOST_PREDICT_HAS_TRAINING_ARG
+  err_predict = XGBoosterPredict(*booster_handle, dvalues, 0, 0, 0, &nout, &score);
+#else
+  err_predict = XGBoosterPredict(*booster_handle, dvalues, 0, 0, &nout, &score);
+#endif
+  SAFE_XGBOOST(XGDMatrixFree(dvalues));
+#endif
+
+  if (err_predict!=0){
+    IVYerr << "IvyXGBoostInterface::predict: Prediction for " << nevents << " events failed with error code " << err_predict << ". XGBoost last error: " << XGBGetLastError() << endl;
+    return false;
+  }
+  // The score buffer is owned by XGBoost, so copy it before it can be reused (and before the lock of the DMatrix fallback is released).
+  res.assign(score, score+nout);
+  return true;
+}
+
+std::unique_ptr<IvyXGBoostEvalContext> IvyXGBoostInterface::createEvalContext() const{
+  if (!this->loadModel()){
+    IVYerr << "IvyXGBoostInterface::createEvalContext: The booster is not available." << endl;
+    return std::unique_ptr<IvyXGBoostEvalContext>();
+  }
+  return std::unique_ptr<IvyXGBoostEvalContext>(new IvyXGBoostEvalContext(*this));
+}
+
+
+IvyXGBoostEvalContext::IvyXGBoostEvalContext(IvyXGBoostInterface const& parent_) :
+  parent(&parent_),
+  booster(nullptr)
+{
+  // Copy the loaded model into a booster owned by this context.
+  // The copy is made from the serialized model kept by the registry, so the shared booster, on which other threads may run
+  // inplace predictions without any lock, is not accessed.
   booster = new BoosterHandle;
   SAFE_XGBOOST(XGBoosterCreate(nullptr, 0, booster));
+  std::string const& model_buffer = parent->model->getModelBuffer();
+#ifdef IVYXGBOOST_HAS_SERIALIZE_TO_BUFFER
+  SAFE_XGBOOST(XGBoosterUnserializeFromBuffer(*booster, model_buffer.data(), model_buffer.size()));
+#else
+  SAFE_XGBOOST(XGBoosterLoadModelFromBuffer(*booster, model_buffer.data(), model_buffer.size()));
+#endif
+  // Each context is meant to be used by a single thread of a parallel event loop, so XGBoost itself should not spawn more threads.
+  SAFE_XGBOOST(XGBoosterSetParam(*booster, "nthread", "1"));
+
+  input_buffer.assign(parent->variable_names.size(), parent->defval);
+  input_buffer_interface = IvyXGBoostInterface::getArrayInterface(input_buffer.data(), 1, input_buffer.size());
+}
 
-  IVYout << "IvyXGBoostInterface::build: A new xgboost booster is created. Loading the model in " << fname << "..." << endl;
+IvyXGBoostEvalContext::~IvyXGBoostEvalContext(){
+  if (booster){
+    SAFE_XGBOOST(XGBoosterFree(*booster));
+    delete booster;
+  }
+}
 
-  SAFE_XGBOOST(XGBoosterLoadModel(*booster, fname.Data()));
+IvyMLWrapper::IvyMLDataType_t* IvyXGBoostEvalContext::bindVariable(TString const& varname){
+  int iv = parent->getVariableIndex(varname);
+  if (iv<0){
+    IVYerr << "IvyXGBoostEvalContext::bindVariable: Variable " << varname << " is not one of the input variables." << endl;
+    return nullptr;
+  }
+  return &(input_buffer[iv]);
+}
 
-  return true;
+void IvyXGBoostEvalContext::resetInputs(){
+  for (auto& val:input_buffer) val = parent->defval;
 }
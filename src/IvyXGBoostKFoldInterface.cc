@@ -0,0 +1,80 @@
+#include <string>
+#include "IvyFramework/IvyDataTools/interface/HostHelpersCore.h"
+#include "IvyXGBoostKFoldInterface.hpp"
+
+
+IvyXGBoostKFoldInterface::IvyXGBoostKFoldInterface() :
+  IvyMLWrapper(),
+  defval(0),
+  lazy_loading(false)
+{}
+
+bool IvyXGBoostKFoldInterface::build(TString fname, std::vector<TString> const& varnames, IvyMLDataType_t missing_entry_val){
+  if (!fname.Contains("{fold}")){
+    IVYerr << "IvyXGBoostKFoldInterface::build: The file name " << fname << " does not contain the placeholder '{fold}'." << endl;
+    return false;
+  }
+
+  HostHelpers::ExpandEnvironmentVariables(fname);
+  std::vector<TString> fnames;
+  while (true){
+    TString fname_fold = fname;
+    fname_fold.ReplaceAll("{fold}", std::to_string(fnames.size()).data());
+    if (!HostHelpers::FileExists(fname_fold)) break;
+    fnames.push_back(fname_fold);
+  }
+  return this->build(fnames, varnames, missing_entry_val);
+}
+
+bool IvyXGBoostKFoldInterface::build(std::vector<TString> const& fnames, std::vector<TString> const& varnames, IvyMLDataType_t missing_entry_val){
+  if (!fold_interfaces.empty()){
+    IVYerr << "IvyXGBoostKFoldInterface::build: The interfaces of the folds are already built." << endl;
+    return false;
+  }
+  if (fnames.size()<2){
+    IVYerr << "IvyXGBoostKFoldInterface::build: At least two model files are needed, but " << fnames.size() << " are found." << endl;
+    return false;
+  }
+
+  defval = missing_entry_val;
+  variable_names = expandVariableNames(varnames);
+  input_buffer.assign(variable_names.size(), defval);
+
+  bool success = true;
+  for (auto const& fname_fold:fnames){
+    fold_interfaces.emplace_back(new IvyXGBoostInterface());
+    fold_interfaces.back()->setLazyLoading(lazy_loading);
+    success &= fold_interfaces.back()->build(fname_fold, varnames, missing_entry_val);
+  }
+  if (success && !lazy_loading){
+    for (auto const& fold_interface:fold_interfaces){
+      if (fold_interface->getNOutputs()!=getNOutputs()){
+        IVYerr << "IvyXGBoostKFoldInterface::build: The models of the folds have different numbers of outputs." << endl;
+        success = false;
+        break;
+      }
+    }
+  }
+  if (!success) fold_interfaces.clear();
+  return success;
+}
+
+int IvyXGBoostKFoldInterface::getVariableIndex(TString const& varname) const{
+  for (size_t iv=0; iv<variable_names.size(); iv++){
+    if (variable_names.at(iv)==varname) return static_cast<int>(iv);
+  }
+  return -1;
+}
+
+IvyMLWrapper::IvyMLDataType_t* IvyXGBoostKFoldInterface::bindVariable(TString const& varname){
+  int iv = getVariableIndex(varname);
+  if (iv<0){
+    IVYerr << "IvyXGBoostKFoldInterface::bindVariable: Variable " << varname << " is not one of the input variables." << endl;
+    return nullptr;
+  }
+  return &(input_buffer[iv]);
+}
+
+void IvyXGBoostKFoldInterface::resetInputs(){
+  for (auto& val:input_buffer) val = defval;
+}
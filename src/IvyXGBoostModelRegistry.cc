@@ -0,0 +1,104 @@
+#include <climits>
+#include <cstdlib>
+#include <sys/stat.h>
+#include "IvyXGBoostModelRegistry.h"
+
+
+using namespace std;
+using namespace IvyStreamHelpers;
+
+
+IvyXGBoostModelRegistry::SharedModel::SharedModel(std::string const& key_) :
+  key(key_),
+  load_success(false),
+  booster(nullptr)
+{}
+
+IvyXGBoostModelRegistry::SharedModel::~SharedModel(){
+  if (booster) SAFE_XGBOOST(XGBoosterFree(booster));
+}
+
+
+IvyXGBoostModelRegistry& IvyXGBoostModelRegistry::instance(){
+  static IvyXGBoostModelRegistry registry;
+  return registry;
+}
+
+std::string IvyXGBoostModelRegistry::getModelKey(TString const& fname){
+  struct stat file_stat;
+  if (stat(fname.Data(), &file_stat)!=0) return "";
+
+  char canonical_path[PATH_MAX];
+  std::string res = (realpath(fname.Data(), canonical_path) ? canonical_path : fname.Data());
+  res += ":" + std::to_string(static_cast<long long>(file_stat.st_mtime));
+  res += ":" + std::to_string(static_cast<long long>(file_stat.st_size));
+  return res;
+}
+
+std::shared_ptr<IvyXGBoostModelRegistry::SharedModel> IvyXGBoostModelRegistry::getModel(TString const& fname){
+  std::string key = getModelKey(fname);
+  if (key==""){
+    IVYerr << "IvyXGBoostModelRegistry::getModel: File " << fname << " cannot be accessed." << endl;
+    return std::shared_ptr<SharedModel>();
+  }
+
+  std::shared_ptr<SharedModel> res;
+  {
+    std::lock_guard<std::mutex> lock(registry_mutex);
+    // Drop the entries of models that are no longer used.
+    for (auto it=models.begin(); it!=models.end();){
+      if (it->second.expired()) it = models.erase(it);
+      else it++;
+    }
+    auto it_model = models.find(key);
+    if (it_model!=models.end()) res = it_model->second.lock();
+    if (!res){
+      res = std::make_shared<SharedModel>(key);
+      models[key] = res;
+    }
+  }
+
+  // The model is loaded outside of the registry lock so that different models can be loaded concurrently.
+  // Other users of the same model wait here until the loading is complete.
+  std::call_once(
+    res->load_flag,
+    [&](){
+      IVYout << "IvyXGBoostModelRegistry::getModel: A new xgboost booster is created. Loading the model in " << fname << "..." << endl;
+      if (XGBoosterCreate(nullptr, 0, &(res->booster))!=0){
+        IVYerr << "IvyXGBoostModelRegistry::getModel: The booster could not be created. XGBoost last error: " << XGBGetLastError() << endl;
+        res->booster = nullptr;
+        return;
+      }
+      if (XGBoosterLoadModel(res->booster, fname.Data())!=0){
+        IVYerr << "IvyXGBoostModelRegistry::getModel: The model in " << fname << " could not be loaded. XGBoost last error: " << XGBGetLastError() << endl;
+        return;
+      }
+      // Keep a serialized copy of the booster before any user can run predictions on it.
+      bst_ulong len_model = 0;
+      const char* model_buffer = nullptr;
+#ifdef IVYXGBOOST_HAS_SERIALIZE_TO_BUFFER
+      int err_serialize = XGBoosterSerializeToBuffer(res->booster, &len_model, &model_buffer);
+#else
+      int err_serialize = XGBoosterGetModelRaw(res->booster, &len_model, &model_buffer);
+#endif
+      if (err_serialize!=0){
+        IVYerr << "IvyXGBoostModelRegistry::getModel: The model in " << fname << " could not be serialized. XGBoost last error: " << XGBGetLastError() << endl;
+        return;
+      }
+      res->model_buffer.assign(model_buffer, len_model);
+      res->load_success = true;
+    }
+  );
+  if (!res->load_success) return std::shared_ptr<SharedModel>();
+
+  return res;
+}
+
+size_t IvyXGBoostModelRegistry::getNModels(){
+  std::lock_guard<std::mutex> lock(registry_mutex);
+  size_t res = 0;
+  for (auto const& it_model:models){
+    if (!it_model.second.expired()) res++;
+  }
+  return res;
+}
@@ -0,0 +1,595 @@
+#include <algorithm>
+#include <cctype>
+#include <cmath>
+#include <cstdint>
+#include <cstdlib>
+#include <cstring>
+#include <fstream>
+#include <iterator>
+#include <limits>
+#include <stdexcept>
+#include <utility>
+#include "IvyFramework/IvyDataTools/interface/HostHelpersCore.h"
+#include "IvyXGBoostTreeEvaluator.hpp"
+
+
+namespace{
+  // Minimal document model for the JSON and UBJSON model files of XGBoost.
+  // Arrays of numbers are stored directly in 'numbers' in order to keep the memory footprint of large models small.
+  struct ModelNode{
+    enum NodeType{
+      kNull,
+      kBool,
+      kNumber,
+      kString,
+      kArray,
+      kObject
+    };
+
+    NodeType type;
+    double number;
+    std::string str;
+    std::vector<double> numbers;
+    std::vector<ModelNode> items;
+    std::vector<std::pair<std::string, ModelNode>> members;
+
+    ModelNode() : type(kNull), number(0){}
+
+    ModelNode const* find(std::string const& key) const{
+      for (auto const& mm:members){
+        if (mm.first==key) return &(mm.second);
+      }
+      return nullptr;
+    }
+    ModelNode const& at(std::string const& key) const{
+      ModelNode const* res = find(key);
+      if (!res) throw std::runtime_error("Key '" + key + "' is not found.");
+      return *res;
+    }
+    // Numerical parameters of XGBoost models are stored as strings.
+    double asNumber() const{
+      if (type==kNumber || type==kBool) return number;
+      if (type==kString) return std::stod(str);
+      throw std::runtime_error("Value is not a number.");
+    }
+  };
+
+  class JSONParser{
+  protected:
+    std::string const& buf;
+    size_t pos;
+
+    void skipSpaces(){ while (pos<buf.size() && std::isspace(static_cast<unsigned char>(buf[pos]))) pos++; }
+    char peek(){
+      skipSpaces();
+      if (pos>=buf.size()) throw std::runtime_error("Unexpected end of JSON input.");
+      return buf[pos];
+    }
+    void expect(char c){
+      if (peek()!=c) throw std::runtime_error(std::string("Expected '") + c + "' in JSON input at position " + std::to_string(pos) + ".");
+      pos++;
+    }
+
+    std::string parseString(){
+      expect('"');
+      std::string res;
+      while (true){
+        if (pos>=buf.size()) throw std::runtime_error("Unterminated string in JSON input.");
+        char c = buf[pos++];
+        if (c=='"') break;
+        if (c!='\\'){ res.push_back(c); continue; }
+        if (pos>=buf.size()) throw std::runtime_error("Unterminated string in JSON input.");
+        c = buf[pos++];
+        switch (c){
+        case 'b': res.push_back('\b'); break;
+        case 'f': res.push_back('\f'); break;
+        case 'n': res.push_back('\n'); break;
+        case 'r': res.push_back('\r'); break;
+        case 't': res.push_back('\t'); break;
+        case 'u':
+        {
+          if (pos+4>buf.size()) throw std::runtime_error("Invalid unicode escape in JSON input.");
+          unsigned int code = std::stoul(buf.substr(pos, 4), nullptr, 16);
+          pos += 4;
+          // Encode the code point in UTF-8. Surrogate pairs are not combined since they do not appear in the relevant parts of the model.
+          if (code<0x80) res.push_back(static_cast<char>(code));
+          else if (code<0x800){
+            res.push_back(static_cast<char>(0xC0 | (code >> 6)));
+            res.push_back(static_cast<char>(0x80 | (code & 0x3F)));
+          }
+          else{
+            res.push_back(static_cast<char>(0xE0 | (code >> 12)));
+            res.push_back(static_cast<char>(0x80 | ((code >> 6) & 0x3F)));
+            res.push_back(static_cast<char>(0x80 | (code & 0x3F)));
+          }
+          break;
+        }
+        default: res.push_back(c); break;
+        }
+      }
+      return res;
+    }
+
+    double parseNumber(){
+      skipSpaces();
+      char const* begin = buf.data() + pos;
+      char* end = nullptr;
+      double res = std::strtod(begin, &end);
+      if (end==begin) throw std::runtime_error("Invalid number in JSON input at position " + std::to_string(pos) + ".");
+      pos += (end - begin);
+      return res;
+    }
+
+    bool parseLiteral(char const* lit){
+      size_t len = std::strlen(lit);
+      if (buf.compare(pos, len, lit)!=0) return false;
+      pos += len;
+      return true;
+    }
+
+  public:
+    JSONParser(std::string const& buf_) : buf(buf_), pos(0){}
+
+    void parse(ModelNode& node){
+      char c = peek();
+      if (c=='{'){
+        node.type = ModelNode::kObject;
+        pos++;
+        if (peek()=='}'){ pos++; return; }
+        while (true){
+          std::string key = parseString();
+          expect(':');
+          node.members.emplace_back(key, ModelNode());
+          parse(node.members.back().second);
+          if (peek()==','){ pos++; continue; }
+          expect('}');
+          break;
+        }
+      }
+      else if (c=='['){
+        node.type = ModelNode::kArray;
+        pos++;
+        if (peek()==']'){ pos++; return; }
+        while (true){
+          c = peek();
+          if (c=='-' || (c>='0' && c<='9')) node.numbers.push_back(parseNumber());
+          else{
+            node.items.emplace_back();
+            parse(node.items.back());
+          }
+          if (peek()==','){ pos++; continue; }
+          expect(']');
+          break;
+        }
+      }
+      else if (c=='"'){
+        node.type = ModelNode::kString;
+        node.str = parseString();
+      }
+      else if (parseLiteral("true")){ node.type = ModelNode::kBool; node.number = 1; }
+      else if (parseLiteral("false")){ node.type = ModelNode::kBool; node.number = 0; }
+      else if (parseLiteral("null")) node.type = ModelNode::kNull;
+      else if (parseLiteral("NaN")){ node.type = ModelNode::kNumber; node.number = std::numeric_limits<double>::quiet_NaN(); }
+      else{
+        node.type = ModelNode::kNumber;
+        node.number = parseNumber();
+      }
+    }
+  };
+
+  // Parser of the universal binary JSON format, which is the default format of XGBoost models since XGBoost 2.
+  // All numbers are big-endian.
+  class UBJSONParser{
+  protected:
+    std::string const& buf;
+    size_t pos;
+
+    unsigned char getByte(){
+      if (pos>=buf.size()) throw std::runtime_error("Unexpected end of UBJSON input.");
+      return static_cast<unsigned char>(buf[pos++]);
+    }
+    uint64_t getBigEndian(unsigned int nbytes){
+      if (pos+nbytes>buf.size()) throw std::runtime_error("Unexpected end of UBJSON input.");
+      uint64_t res = 0;
+      for (unsigned int ib=0; ib<nbytes; ib++) res = (res << 8) | static_cast<unsigned char>(buf[pos++]);
+      return res;
+    }
+    char getMarker(){
+      char c = static_cast<char>(getByte());
+      while (c=='N') c = static_cast<char>(getByte());
+      return c;
+    }
+
+    bool isNumberType(char type) const{ return (type=='i' || type=='U' || type=='I' || type=='l' || type=='L' || type=='d' || type=='D'); }
+
+    double getNumber(char type){
+      switch (type){
+      case 'i': return static_cast<double>(static_cast<int8_t>(getBigEndian(1)));
+      case 'U': return static_cast<double>(static_cast<uint8_t>(getBigEndian(1)));
+      case 'I': return static_cast<double>(static_cast<int16_t>(getBigEndian(2)));
+      case 'l': return static_cast<double>(static_cast<int32_t>(getBigEndian(4)));
+      case 'L': return static_cast<double>(static_cast<int64_t>(getBigEndian(8)));
+      case 'd':
+      {
+        uint32_t bits = static_cast<uint32_t>(getBigEndian(4));
+        float res;
+        std::memcpy(&res, &bits, sizeof(res));
+        return res;
+      }
+      case 'D':
+      {
+        uint64_t bits = getBigEndian(8);
+        double res;
+        std::memcpy(&res, &bits, sizeof(res));
+        return res;
+      }
+      default:
+        throw std::runtime_error(std::string("Type '") + type + "' is not a numerical UBJSON type.");
+      }
+    }
+
+    uint64_t getLength(){
+      char type = getMarker();
+      double len = getNumber(type);
+      if (len<0) throw std::runtime_error("Negative length in UBJSON input.");
+      return static_cast<uint64_t>(len);
+    }
+
+    std::string getString(){
+      uint64_t len = getLength();
+      if (pos+len>buf.size()) throw std::runtime_error("Unexpected end of UBJSON input.");
+      std::string res = buf.substr(pos, len);
+      pos += len;
+      return res;
+    }
+
+    void parseValue(char type, ModelNode& node){
+      if (isNumberType(type)){
+        node.type = ModelNode::kNumber;
+        node.number = getNumber(type);
+        return;
+      }
+      switch (type){
+      case 'Z': node.type = ModelNode::kNull; break;
+      case 'T': node.type = ModelNode::kBool; node.number = 1; break;
+      case 'F': node.type = ModelNode::kBool; node.number = 0; break;
+      case 'C': node.type = ModelNode::kString; node.str = std::string(1, static_cast<char>(getByte())); break;
+      case 'S': case 'H': node.type = ModelNode::kString; node.str = getString(); break;
+      case '[': parseArray(node); break;
+      case '{': parseObject(node); break;
+      default:
+        throw std::runtime_error(std::string("Unknown UBJSON type '") + type + "' at position " + std::to_string(pos) + ".");
+      }
+    }
+
+    // Reads the optional type and count markers of an optimized container.
+    void getContainerMarkers(char& type, int64_t& count){
+      type = 0;
+      count = -1;
+      if (pos<buf.size() && buf[pos]=='$'){
+        pos++;
+        type = static_cast<char>(getByte());
+      }
+      if (pos<buf.size() && buf[pos]=='#'){
+        pos++;
+        count = static_cast<int64_t>(getLength());
+      }
+      else if (type!=0) throw std::runtime_error("UBJSON containers with a type marker should also have a count marker.");
+    }
+
+    void parseArray(ModelNode& node){
+      node.type = ModelNode::kArray;
+      char type = 0;
+      int64_t count = -1;
+      getContainerMarkers(type, count);
+      if (count>=0){
+        if (type!=0 && isNumberType(type)) node.numbers.reserve(count);
+        for (int64_t ii=0; ii<count; ii++){
+          char itype = (type!=0 ? type : getMarker());
+          if (isNumberType(itype)) node.numbers.push_back(getNumber(itype));
+          else{
+            node.items.emplace_back();
+            parseValue(itype, node.items.back());
+          }
+        }
+      }
+      else{
+        while (true){
+          char itype = getMarker();
+          if (itype==']') break;
+          if (isNumberType(itype)) node.numbers.push_back(getNumber(itype));
+          else{
+            node.items.emplace_back();
+            parseValue(itype, node.items.back());
+          }
+        }
+      }
+    }
+
+    void parseObject(ModelNode& node){
+      node.type = ModelNode::kObject;
+      char type = 0;
+      int64_t count = -1;
+      getContainerMarkers(type, count);
+      for (int64_t ii=0; count<0 || ii<count; ii++){
+        if (count<0){
+          while (pos<buf.size() && buf[pos]=='N') pos++;
+          if (pos<buf.size() && buf[pos]=='}'){ pos++; break; }
+        }
+        // Keys are strings without the 'S' marker.
+        std::string key = getString();
+        node.members.emplace_back(key, ModelNode());
+        parseValue((type!=0 ? type : getMarker()), node.members.back().second);
+      }
+    }
+
+  public:
+    UBJSONParser(std::string const& buf_) : buf(buf_), pos(0){}
+
+    void parse(ModelNode& node){ parseValue(getMarker(), node); }
+  };
+
+  // Returns the numbers in the base_score string of the learner, which is either a single number or, since XGBoost 3, a vector of the form '[v1,v2,...]'.
+  std::vector<double> parseBaseScore(std::string str){
+    std::vector<double> res;
+    for (auto& c:str){
+      if (c=='[' || c==']' || c==',') c = ' ';
+    }
+    char const* ptr = str.data();
+    while (true){
+      char* end = nullptr;
+      double val = std::strtod(ptr, &end);
+      if (end==ptr) break;
+      res.push_back(val);
+      ptr = end;
+    }
+    return res;
+  }
+}
+
+
+IvyXGBoostTreeEvaluator::IvyXGBoostTreeEvaluator() :
+  IvyMLWrapper(),
+  defval(0),
+  nGroups(0),
+  transform(kUnknownTransform)
+{}
+
+IvyXGBoostTreeEvaluator::ObjectiveTransform IvyXGBoostTreeEvaluator::getObjectiveTransform(std::string const& objective_name){
+  if (objective_name=="binary:logistic" || objective_name=="reg:logistic") return kSigmoid;
+  if (objective_name=="multi:softprob") return kSoftmax;
+  if (objective_name=="multi:softmax") return kArgmax;
+  if (objective_name=="count:poisson" || objective_name=="reg:gamma" || objective_name=="reg:tweedie" || objective_name=="survival:cox") return kExp;
+  if (objective_name=="binary:hinge") return kHinge;
+  if (
+    objective_name=="binary:logitraw"
+    || objective_name=="reg:squarederror" || objective_name=="reg:squaredlogerror" || objective_name=="reg:pseudohubererror"
+    || objective_name=="reg:absoluteerror" || objective_name=="reg:quantileerror" || objective_name=="reg:linear"
+    || objective_name.find("rank:")==0
+    ) return kIdentity;
+  return kUnknownTransform;
+}
+
+bool IvyXGBoostTreeEvaluator::build(TString fname, std::vector<TString> const& varnames, IvyMLDataType_t missing_entry_val){
+  if (!tree_roots.empty()){
+    IVYerr << "IvyXGBoostTreeEvaluator::build: The trees are already built." << endl;
+    return false;
+  }
+  if (fname == ""){
+    IVYerr << "IvyXGBoostTreeEvaluator::build: The file name is an empty string. This function should be called to load models from a file." << endl;
+    assert(0);
+  }
+
+  HostHelpers::ExpandEnvironmentVariables(fname);
+  if (!HostHelpers::FileExists(fname)){
+    IVYerr << "IvyXGBoostTreeEvaluator::build: File " << fname << " does not exist." << endl;
+    assert(0);
+  }
+
+  defval = missing_entry_val;
+  variable_names = expandVariableNames(varnames);
+
+  IVYout << "IvyXGBoostTreeEvaluator::build: Loading the model in " << fname << "..." << endl;
+
+  std::string buf;
+  {
+    std::ifstream fin(fname.Data(), std::ios::binary);
+    buf.assign(std::istreambuf_iterator<char>(fin), std::istreambuf_iterator<char>());
+  }
+
+  // JSON models begin with '{' followed by whitespace or a quoted key, while UBJSON models begin with '{' followed by the length marker of the first key.
+  size_t first_char = buf.find_first_not_of(" \t\r\n");
+  if (first_char==std::string::npos || buf[first_char]!='{'){
+    IVYerr << "IvyXGBoostTreeEvaluator::build: File " << fname << " is not a JSON or UBJSON model. Models in the legacy binary format of XGBoost are not supported. Please save the model with a '.json' or '.ubj' extension." << endl;
+    return false;
+  }
+  bool is_json = (first_char+1<buf.size() && (buf[first_char+1]=='"' || buf[first_char+1]=='}' || std::isspace(static_cast<unsigned char>(buf[first_char+1]))));
+
+  try{
+    ModelNode model;
+    if (is_json) JSONParser(buf).parse(model);
+    else UBJSONParser(buf).parse(model);
+    buf.clear();
+    buf.shrink_to_fit();
+
+    ModelNode const& learner = model.at("learner");
+    ModelNode const& learner_model_param = learner.at("learner_model_param");
+    objective = learner.at("objective").at("name").str;
+    transform = getObjectiveTransform(objective);
+    if (transform==kUnknownTransform){
+      IVYerr << "IvyXGBoostTreeEvaluator::build: Objective " << objective << " is not supported." << endl;
+      return false;
+    }
+
+    ModelNode const& gradient_booster = learner.at("gradient_booster");
+    std::string const& booster_name = gradient_booster.at("name").str;
+    if (booster_name!="gbtree"){
+      IVYerr << "IvyXGBoostTreeEvaluator::build: Booster type " << booster_name << " is not supported. Only 'gbtree' models can be evaluated." << endl;
+      return false;
+    }
+
+    unsigned int num_class = 0;
+    unsigned int num_target = 1;
+    if (learner_model_param.find("num_class")) num_class = learner_model_param.at("num_class").asNumber();
+    if (learner_model_param.find("num_target")) num_target = learner_model_param.at("num_target").asNumber();
+    nGroups = std::max(1u, std::max(num_class, num_target));
+
+    // The base score is stored in the output space of the objective, so convert it to a margin.
+    std::vector<double> base_scores = parseBaseScore(learner_model_param.at("base_score").str);
+    if (base_scores.size()==1 && nGroups>1) base_scores.assign(nGroups, base_scores.front());
+    if (base_scores.size()!=nGroups){
+      IVYerr << "IvyXGBoostTreeEvaluator::build: The number of base scores " << base_scores.size() << " is different from the number of output groups " << nGroups << "." << endl;
+      return false;
+    }
+    base_margins.clear();
+    for (auto const& bs:base_scores){
+      double bm = bs;
+      if (objective=="binary:logistic" || objective=="reg:logistic" || objective=="binary:logitraw") bm = -std::log(1./bs - 1.);
+      else if (transform==kExp) bm = std::log(bs);
+      base_margins.push_back(static_cast<IvyMLDataType_t>(bm));
+    }
+
+    ModelNode const& gbtree_model = gradient_booster.at("model");
+    ModelNode const& trees = gbtree_model.at("trees");
+    std::vector<double> const& tree_info = gbtree_model.at("tree_info").numbers;
+    if (tree_info.size()!=trees.items.size()){
+      IVYerr << "IvyXGBoostTreeEvaluator::build: The size of the tree information " << tree_info.size() << " is different from the number of trees " << trees.items.size() << "." << endl;
+      return false;
+    }
+
+    unsigned int const nFeatures = variable_names.size();
+    for (size_t itree=0; itree<trees.items.size(); itree++){
+      ModelNode const& tree = trees.items.at(itree);
+      ModelNode const* tree_param = tree.find("tree_param");
+      if (tree_param && tree_param->find("size_leaf_vector") && tree_param->at("size_leaf_vector").asNumber()>1){
+        IVYerr << "IvyXGBoostTreeEvaluator::build: Trees with vector leaves are not supported." << endl;
+        return false;
+      }
+
+      std::vector<double> const& left_children = tree.at("left_children").numbers;
+      std::vector<double> const& right_children = tree.at("right_children").numbers;
+      std::vector<double> const& split_indices = tree.at("split_indices").numbers;
+      std::vector<double> const& split_conditions = tree.at("split_conditions").numbers;
+      std::vector<double> const& default_left = tree.at("default_left").numbers;
+      ModelNode const* split_type = tree.find("split_type");
+      size_t const nNodes = left_children.size();
+      if (right_children.size()!=nNodes || split_indices.size()!=nNodes || split_conditions.size()!=nNodes || default_left.size()!=nNodes || nNodes==0){
+        IVYerr << "IvyXGBoostTreeEvaluator::build: The node arrays of tree " << itree << " are inconsistent." << endl;
+        return false;
+      }
+
+      int const offset = node_left.size();
+      unsigned int const group = tree_info.at(itree);
+      if (group>=nGroups){
+        IVYerr << "IvyXGBoostTreeEvaluator::build: Tree " << itree << " belongs to output group " << group << ", but there are only " << nGroups << " groups." << endl;
+        return false;
+      }
+      tree_roots.push_back(offset);
+      tree_groups.push_back(group);
+
+      for (size_t inode=0; inode<nNodes; inode++){
+        int const ileft = left_children.at(inode);
+        bool const is_leaf = (ileft<0);
+        if (!is_leaf && split_type && !split_type->numbers.empty() && split_type->numbers.at(inode)!=0.){
+          IVYerr << "IvyXGBoostTreeEvaluator::build: Categorical splits are not supported." << endl;
+          return false;
+        }
+        unsigned int const ifeature = (is_leaf ? 0 : static_cast<unsigned int>(split_indices.at(inode)));
+        if (ifeature>=nFeatures){
+          IVYerr << "IvyXGBoostTreeEvaluator::build: Tree " << itree << " uses feature index " << ifeature << ", but only " << nFeatures << " variables are provided." << endl;
+          return false;
+        }
+        node_left.push_back(is_leaf ? -1 : offset + ileft);
+        node_right.push_back(is_leaf ? -1 : offset + static_cast<int>(right_children.at(inode)));
+        node_feature.push_back(ifeature);
+        node_values.push_back(static_cast<IvyMLDataType_t>(split_conditions.at(inode)));
+        node_default_left.push_back(default_left.at(inode)!=0.);
+      }
+    }
+  }
+  catch (std::exception const& e){
+    IVYerr << "IvyXGBoostTreeEvaluator::build: Failed to read the model in " << fname << ": " << e.what() << endl;
+    node_left.clear(); node_right.clear(); node_feature.clear(); node_values.clear(); node_default_left.clear();
+    tree_roots.clear(); tree_groups.clear();
+    return false;
+  }
+
+  input_buffer.assign(variable_names.size(), defval);
+  margin_buffer.assign(nGroups, 0);
+
+  IVYout << "IvyXGBoostTreeEvaluator::build: " << tree_roots.size() << " trees with " << node_left.size() << " nodes in total are loaded." << endl;
+
+  return true;
+}
+
+void IvyXGBoostTreeEvaluator::accumulateMargins(IvyMLDataType_t const* data, IvyMLDataType_t* margins) const{
+  const bool defval_is_nan = std::isnan(defval);
+  for (unsigned int ig=0; ig<nGroups; ig++) margins[ig] = base_margins[ig];
+  for (size_t itree=0; itree<tree_roots.size(); itree++){
+    int inode = tree_roots[itree];
+    while (node_left[inode]>=0){
+      IvyMLDataType_t const& val = data[node_feature[inode]];
+      if (std::isnan(val) || (!defval_is_nan && val==defval)) inode = (node_default_left[inode] ? node_left[inode] : node_right[inode]);
+      else inode = (val<node_values[inode] ? node_left[inode] : node_right[inode]);
+    }
+    margins[tree_groups[itree]] += node_values[inode];
+  }
+}
+
+void IvyXGBoostTreeEvaluator::transformMargins(IvyMLDataType_t const* margins, IvyMLDataType_t* scores) const{
+  switch (transform){
+  case kSigmoid:
+    for (unsigned int ig=0; ig<nGroups; ig++) scores[ig] = 1.f / (1.f + std::exp(-margins[ig]));
+    break;
+  case kSoftmax:
+  {
+    IvyMLDataType_t wmax = margins[0];
+    for (unsigned int ig=1; ig<nGroups; ig++) wmax = std::max(wmax, margins[ig]);
+    IvyMLDataType_t wsum = 0;
+    for (unsigned int ig=0; ig<nGroups; ig++){
+      scores[ig] = std::exp(margins[ig] - wmax);
+      wsum += scores[ig];
+    }
+    for (unsigned int ig=0; ig<nGroups; ig++) scores[ig] /= wsum;
+    break;
+  }
+  case kArgmax:
+  {
+    unsigned int imax = 0;
+    for (unsigned int ig=1; ig<nGroups; ig++){
+      if (margins[ig]>margins[imax]) imax = ig;
+    }
+    scores[0] = imax;
+    break;
+  }
+  case kExp:
+    for (unsigned int ig=0; ig<nGroups; ig++) scores[ig] = std::exp(margins[ig]);
+    break;
+  case kHinge:
+    for (unsigned int ig=0; ig<nGroups; ig++) scores[ig] = (margins[ig]>0.f ? 1.f : 0.f);
+    break;
+  default:
+    for (unsigned int ig=0; ig<nGroups; ig++) scores[ig] = margins[ig];
+    break;
+  }
+}
+
+int IvyXGBoostTreeEvaluator::getVariableIndex(TString const& varname) const{
+  for (size_t iv=0; iv<variable_names.size(); iv++){
+    if (variable_names.at(iv)==varname) return static_cast<int>(iv);
+  }
+  return -1;
+}
+
+IvyMLWrapper::IvyMLDataType_t* IvyXGBoostTreeEvaluator::bindVariable(TString const& varname){
+  int iv = getVariableIndex(varname);
+  if (iv<0){
+    IVYerr << "IvyXGBoostTreeEvaluator::bindVariable: Variable " << varname << " is not one of the input variables." << endl;
+    return nullptr;
+  }
+  return &(input_buffer[iv]);
+}
+
+void IvyXGBoostTreeEvaluator::resetInputs(){
+  for (auto& val:input_buffer) val = defval;
+}
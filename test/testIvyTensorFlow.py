@@ -121,3 +121,32 @@ results = model.evaluate(train_images, train_labels, verbose=0)
 print('train loss, train acc:', results)
 results = model.evaluate(test_images, test_labels, verbose=0)
 print('test loss, test acc:', results)
+
+# Let's train an MLP on an IvyXGBoostDataInput through the streaming tf.data adapter
+from IvyXGBoostDataInput import IvyXGBoostDataInput
+from IvyXGBoostTFDataset import IvyXGBoostTFDataset
+
+rng = np.random.default_rng(345612)
+xgbdata = IvyXGBoostDataInput(["x1", "x2"])
+xgbdata.add_data(rng.normal(0., 1., (20000, 2)).astype(np.float32), 1., 0, 0.5, shuffle=True)
+xgbdata.add_data(rng.normal(1., 1., (5000, 2)).astype(np.float32), 1., 1, 0.5, shuffle=True)
+
+ivytf = IvyXGBoostTFDataset(xgbdata, batch_size=512, shuffle_buffer_size=8192)
+ds_train = ivytf.partition_dataset('train')
+ds_test = ivytf.partition_dataset('test', shuffle=False)
+
+model = Sequential([
+   Dense(32, activation='relu', input_shape=(len(xgbdata.features),)),
+   Dense(32, activation='relu'),
+   Dense(2)
+])
+model.summary()
+
+model.compile(
+   optimizer='adam',
+   loss=tf.keras.losses.SparseCategoricalCrossentropy(from_logits=True),
+   weighted_metrics=['accuracy']
+)
+history = model.fit(ds_train, epochs=5, validation_data=ds_test)
+results = model.evaluate(ds_test, verbose=0)
+print('test loss, test acc (class-weighted):', results)
@@ -0,0 +1,44 @@
+import os
+import shutil
+import numpy as np
+import awkward as ak
+import uproot
+from IvyXGBoostDataInput import IvyXGBoostDataInput
+from IvyXGBoostDataCache import IvyXGBoostDataCache
+
+
+rng = np.random.default_rng(345612)
+
+# Jagged input with 0 to 3 objects per entry, so the features 'jet_pt[0..4]' always have padded elements.
+nEntries = 2000
+nJets = rng.integers(0, 4, nEntries)
+jet_pt = ak.unflatten(rng.uniform(20., 200., nJets.sum()).astype(np.float32), nJets)
+input_file = "test_data_ivyxgbcache.root"
+with uproot.recreate(input_file) as fout:
+   fout["T"] = { "jet_pt": jet_pt, "cls": rng.integers(0, 2, nEntries).astype(np.int32) }
+
+cache_dir = "test_cache_ivyxgbcache"
+if os.path.exists(cache_dir):
+   shutil.rmtree(cache_dir)
+cache = IvyXGBoostDataCache(cache_dir)
+
+features = [ "jet_pt[0..4]" ]
+for missing_value in [ -1., -555., -1. ]:
+   xgbdata = IvyXGBoostDataInput(features, class_branch_name="cls", missing_value_default=missing_value)
+   xgbdata.load_input(input_file, "T", 1., shuffle=False, cache=cache)
+   feat_data = xgbdata.data_train[0]
+   nCached = len(cache.entries())
+   print("Missing value {}: {} cache entries, {} padded elements".format(missing_value, nCached, np.count_nonzero(feat_data==missing_value)))
+
+   # Each entry has fewer than 5 objects, so there is at least one padded element per entry, and no other value should appear there.
+   nPadded_expected = 5*nEntries - nJets.sum()
+   if np.count_nonzero(feat_data==missing_value)!=nPadded_expected:
+      raise RuntimeError("The padded elements do not have the missing value {}.".format(missing_value))
+   if np.count_nonzero(feat_data<0.)!=nPadded_expected:
+      raise RuntimeError("The padded elements from a cache entry with another missing value are reused.")
+
+# The settings with missing values -1 and -555 should have distinct cache entries, and the second load with -1 should reuse the first one.
+if nCached!=2:
+   raise RuntimeError("Expected 2 cache entries, but found {}.".format(nCached))
+
+shutil.rmtree(cache_dir)
@@ -0,0 +1,56 @@
+import os
+import numpy as np
+from IvyXGBoostParameters import IvyXGBoostParameters
+from IvyXGBoostDataInput import IvyXGBoostDataInput
+from IvyXGBoostSearch import IvyXGBoostSearch
+
+
+# The trials run in spawned processes, which import this script again, so the search is protected by the __main__ block.
+if __name__ == "__main__":
+   rng = np.random.default_rng(345612)
+   xgbdata = IvyXGBoostDataInput(["xx"])
+   xgbdata.add_data(rng.beta(0.5, 0.5, (1500, 1)).astype(np.float32), 1., 1, 0.5, shuffle=True)
+   xgbdata.add_data(rng.beta(2.0, 5.0, (3000, 1)).astype(np.float32), 1., 2, 0.5, shuffle=True)
+   xgbdata.add_data(rng.beta(2.0, 2.0, (6000, 1)).astype(np.float32), 1., 0, 0.5, shuffle=True)
+
+   xgbparams = IvyXGBoostParameters()
+   xgbparams.setParameters(num_round=20, eta=0.1)
+
+   log_file = "test_trials_ivyxgbsearch.jsonl"
+   if os.path.exists(log_file):
+      os.remove(log_file)
+   search_space = { 'max_depth': [ 2, 4 ], 'eta': [ 0.1, 0.3 ] }
+
+   # Grid and random searches, recorded in the trial log
+   xgbsearch = IvyXGBoostSearch(xgbdata, xgbparams, search_space, log_file=log_file)
+   records_grid = xgbsearch.grid()
+   records_random = xgbsearch.random(3, seed=1)
+   print("Best trial: {}".format(xgbsearch.best_trial()))
+   print("Best parameters: {}".format(xgbsearch.best_parameters().getParameters()))
+   if len(records_grid)!=4 or len(records_random)!=3:
+      raise RuntimeError("The numbers of trial records are not as expected.")
+   with open(log_file) as flog:
+      nLogged = len(flog.readlines())
+
+   # Resuming from the trial log should not run any new trial.
+   xgbsearch_resumed = IvyXGBoostSearch(xgbdata, xgbparams, search_space, log_file=log_file)
+   records_resumed = xgbsearch_resumed.grid() + xgbsearch_resumed.random(3, seed=1)
+   with open(log_file) as flog:
+      if len(flog.readlines())!=nLogged:
+         raise RuntimeError("Trials were run again despite being in the trial log.")
+   if records_resumed!=records_grid+records_random:
+      raise RuntimeError("The resumed trial records are different from the original ones.")
+
+   # Running the trials in two processes should give the same results as in a single process.
+   xgbsearch_parallel = IvyXGBoostSearch(xgbdata, xgbparams, search_space)
+   records_parallel = xgbsearch_parallel.grid(nprocesses=2, start_method="spawn")
+   for record_serial, record_parallel in zip(records_grid, records_parallel):
+      if record_serial['params']!=record_parallel['params'] or record_serial['best_iteration']!=record_parallel['best_iteration'] or abs(record_serial['score']-record_parallel['score'])>1e-6:
+         raise RuntimeError("The trial with {} is different when run in two processes.".format(record_serial['params']))
+
+   # Successive halving continues the boosters of the best trials.
+   xgbsearch_sh = IvyXGBoostSearch(xgbdata, xgbparams, { 'max_depth': (2, 6), 'eta': (0.05, 0.5, 'log') })
+   records_sh = xgbsearch_sh.successive_halving(6, 5, reduction_factor=2)
+   print("Successive halving result: {}".format(records_sh))
+   if len(records_sh)!=1 or records_sh[0]['rounds']!=20:
+      raise RuntimeError("Successive halving did not end with a single trial of 20 rounds.")
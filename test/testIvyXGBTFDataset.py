@@ -0,0 +1,58 @@
+import numpy as np
+from IvyXGBoostDataInput import IvyXGBoostDataInput
+from IvyXGBoostTFDataset import IvyXGBoostTFDataset
+
+
+# The batches are built with numpy only, so this test does not need TensorFlow.
+rng = np.random.default_rng(345612)
+
+# The single feature of each entry is its index, so the entries can be traced through the batches.
+nEntries_class = [ 7000, 2500, 1234 ]
+xgbdata = IvyXGBoostDataInput(["idx"])
+nEntries = 0
+for cl, nEntries_cl in enumerate(nEntries_class):
+   xgbdata.add_data(np.arange(nEntries, nEntries+nEntries_cl, dtype=np.float32).reshape(-1, 1), rng.uniform(0.5, 2., nEntries_cl).astype(np.float32), cl, 0.5, shuffle=True)
+   nEntries += nEntries_cl
+
+data_train = xgbdata.data_train
+wgts_train = xgbdata.get_weights('train', True)
+nEntries_train = data_train[0].shape[0]
+class_sums = np.bincount(data_train[2], weights=wgts_train, minlength=len(nEntries_class))
+print("Training sample size: {}".format(nEntries_train))
+print("Sums of scaled weights per class: {}".format(class_sums))
+
+def get_chunks(chunk_sizes):
+   begin = 0
+   for chunk_size in chunk_sizes:
+      end = min(begin + chunk_size, nEntries_train)
+      yield data_train[0][begin:end], data_train[2][begin:end], wgts_train[begin:end]
+      begin = end
+
+batch_size = 256
+# Chunks of irregular sizes, including an empty one, so the entries left over from each shuffle buffer are carried over to the next one.
+chunk_sizes = [ 1000, 37, 0, 2999, 511, 1024 ]
+chunk_sizes.append(nEntries_train - sum(chunk_sizes))
+for shuffle in [ True, False ]:
+   ivytf = IvyXGBoostTFDataset(xgbdata, batch_size=batch_size, shuffle_buffer_size=3000, seed=12345)
+   batches = list(ivytf.generate_batches(get_chunks(chunk_sizes), np.random.default_rng(1), shuffle=shuffle))
+   batch_sizes = [ batch[1].size for batch in batches ]
+   print("shuffle = {}: {} batches of sizes {}...{}".format(shuffle, len(batches), batch_sizes[0:3], batch_sizes[-3:]))
+
+   if any([ bsize!=batch_size for bsize in batch_sizes[0:-1] ]) or not (0<batch_sizes[-1]<=batch_size):
+      raise RuntimeError("Only the last batch can be smaller than the batch size.")
+   for features_data, class_values, weights in batches:
+      if features_data.dtype!=np.float32 or class_values.dtype!=np.int32 or weights.dtype!=np.float32:
+         raise RuntimeError("The batch arrays do not have the expected types.")
+
+   idxs = np.concatenate([ batch[0][:, 0] for batch in batches ])
+   if idxs.size!=nEntries_train or not np.array_equal(np.sort(idxs), np.sort(data_train[0][:, 0])):
+      raise RuntimeError("Some entries are lost or duplicated in the batches.")
+   if not shuffle and not np.array_equal(idxs, data_train[0][:, 0]):
+      raise RuntimeError("The entries are not in their original order without shuffling.")
+   if shuffle and np.array_equal(idxs, data_train[0][:, 0]):
+      raise RuntimeError("The entries are not shuffled.")
+
+   batch_class_sums = sum([ np.bincount(batch[1], weights=batch[2], minlength=len(nEntries_class)) for batch in batches ])
+   print("Sums of weights per class in the batches: {}".format(batch_class_sums))
+   if not np.allclose(batch_class_sums, class_sums, rtol=1e-5):
+      raise RuntimeError("The sums of weights per class in the batches are different from those of the training sample.")
@@ -0,0 +1,81 @@
+#include <thread>
+#include <chrono>
+#include "IvyFramework/IvyMLTools/interface/IvyXGBoostInterface.h"
+#include "IvyFramework/IvyDataTools/interface/IvyCSVReader.h"
+#include "IvyFramework/IvyDataTools/interface/HelperFunctionsCore.h"
+#include "IvyFramework/IvyDataTools/interface/IvyStreamHelpers.hh"
+
+
+using namespace std;
+using namespace IvyStreamHelpers;
+
+
+// Stress test of concurrent evaluation through IvyXGBoostEvalContext objects.
+// Run test/testIvyXGBTrainer.py first in order to produce the model and the CSV file.
+void testIvyXGBThreads(unsigned int nthreads_max=8, unsigned int nrepeat=10){
+  IvyCSVReader csv("test_data_ivyxgb.csv");
+  auto fields = csv.getLabels();
+  std::vector<TString> coordnames;
+  for (auto ff:fields){
+    if (ff.find("coord:")==0) coordnames.push_back(ff);
+  }
+  const unsigned int nvars = coordnames.size();
+
+  unsigned long long int nrows = csv.getNRows();
+  std::vector<IvyMLWrapper::IvyMLDataType_t> coords(nrows*nvars, 0);
+  for (unsigned int ic=0; ic<nvars; ic++){
+    auto const& vals = csv.getColumn(coordnames.at(ic).Data());
+    unsigned long long int irow = 0;
+    for (auto const& val:vals){
+      HelperFunctions::castStringToValue(val, coords.at(irow*nvars + ic));
+      irow++;
+    }
+  }
+
+  IvyXGBoostInterface xgb;
+  xgb.build("test_model_ivyxgb.bin", coordnames, -999.);
+  const unsigned int nout = xgb.getNOutputs();
+
+  // Single-threaded reference
+  std::vector<IvyMLWrapper::IvyMLDataType_t> preds_ref(nrows*nout, 0);
+  auto time_start = std::chrono::steady_clock::now();
+  for (unsigned int irep=0; irep<nrepeat; irep++){
+    for (unsigned long long int irow=0; irow<nrows; irow++){
+      for (unsigned int ic=0; ic<nvars; ic++) xgb.getInputBuffer()[ic] = coords.at(irow*nvars + ic);
+      xgb.evalBound(preds_ref.data() + irow*nout);
+    }
+  }
+  double time_ref = std::chrono::duration<double>(std::chrono::steady_clock::now() - time_start).count();
+  IVYout << "Single-threaded evaluation of " << nrows*nrepeat << " events took " << time_ref << " s." << endl;
+
+  for (unsigned int nthreads=1; nthreads<=nthreads_max; nthreads*=2){
+    std::vector<std::unique_ptr<IvyXGBoostEvalContext>> contexts;
+    for (unsigned int ith=0; ith<nthreads; ith++) contexts.push_back(xgb.createEvalContext());
+
+    std::vector<IvyMLWrapper::IvyMLDataType_t> preds(nrows*nout, -1);
+    std::vector<std::thread> threads;
+    time_start = std::chrono::steady_clock::now();
+    for (unsigned int ith=0; ith<nthreads; ith++){
+      threads.emplace_back(
+        [&, ith](){
+          IvyXGBoostEvalContext& context = *(contexts.at(ith));
+          for (unsigned int irep=0; irep<nrepeat; irep++){
+            for (unsigned long long int irow=ith; irow<nrows; irow+=nthreads){
+              for (unsigned int ic=0; ic<nvars; ic++) context.getInputBuffer()[ic] = coords.at(irow*nvars + ic);
+              context.evalBound(preds.data() + irow*nout);
+            }
+          }
+        }
+      );
+    }
+    for (auto& thr:threads) thr.join();
+    double time_mt = std::chrono::duration<double>(std::chrono::steady_clock::now() - time_start).count();
+
+    unsigned long long int nmismatch = 0;
+    for (unsigned long long int ip=0; ip<nrows*nout; ip++){
+      if (preds.at(ip)!=preds_ref.at(ip)) nmismatch++;
+    }
+    IVYout << nthreads << " threads: " << time_mt << " s (speed-up = " << time_ref/time_mt << "), " << nmismatch << " mismatched predictions." << endl;
+    if (nmismatch>0) IVYerr << "Multi-threaded predictions with " << nthreads << " threads differ from the single-threaded ones." << endl;
+  }
+}
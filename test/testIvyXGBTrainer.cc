@@ -1,4 +1,6 @@
 #include "IvyFramework/IvyMLTools/interface/IvyXGBoostInterface.h"
+#include "IvyFramework/IvyMLTools/interface/IvyXGBoostTreeEvaluator.h"
+#include "IvyFramework/IvyMLTools/interface/IvyXGBoostKFoldInterface.h"
 #include "IvyFramework/IvyDataTools/interface/IvyCSVReader.h"
 #include "IvyFramework/IvyDataTools/interface/HelperFunctionsCore.h"
 #include "IvyFramework/IvyDataTools/interface/IvyStreamHelpers.hh"
@@ -81,4 +83,148 @@ void testIvyXGBTrainer(){
       it_preds++;
     }
   }
+
+  IVYout << "Testing the batch predicions..." << endl;
+  {
+    std::vector<IvyMLWrapper::IvyMLDataType_t> batch_coords; batch_coords.reserve(nrows*coordnames.size());
+    for (auto const& row_coords:coords) batch_coords.insert(batch_coords.end(), row_coords.begin(), row_coords.end());
+    std::vector<IvyMLWrapper::IvyMLDataType_t> batch_preds;
+    xgb.eval(batch_coords.data(), nrows, batch_preds);
+    if (batch_preds.size()!=nrows*prednames.size()){
+      IVYerr << "Size of batch predictions " << batch_preds.size() << " is not " << nrows*prednames.size() << "." << endl;
+    }
+    else{
+      auto it_batch_pred = batch_preds.cbegin();
+      for (unsigned long long int irow=0; irow<nrows; irow++){
+        for (auto const& pred:preds.at(irow)){
+          if (pred != *it_batch_pred){
+            IVYerr << "Batch prediction for row " << irow << " is different from the single-event prediction." << endl;
+          }
+          it_batch_pred++;
+        }
+      }
+    }
+  }
+
+  IVYout << "Testing the bound predicions..." << endl;
+  {
+    std::vector<IvyMLWrapper::IvyMLDataType_t*> input_slots; input_slots.reserve(coordnames.size());
+    for (auto const& var:coordnames) input_slots.push_back(xgb.bindVariable(var));
+    std::vector<IvyMLWrapper::IvyMLDataType_t> bound_preds(xgb.getNOutputs(), 0);
+    for (unsigned long long int irow=0; irow<nrows; irow++){
+      for (unsigned short ic=0; ic<coordnames.size(); ic++) *(input_slots.at(ic)) = coords.at(irow).at(ic);
+      xgb.evalBound(bound_preds.data());
+      if (bound_preds != preds.at(irow)){
+        IVYerr << "Bound prediction for row " << irow << " is different from the single-event prediction." << endl;
+      }
+    }
+  }
+
+  IVYout << "Testing the shared model registry..." << endl;
+  {
+    IvyXGBoostInterface xgb_shared;
+    xgb_shared.setLazyLoading(true);
+    xgb_shared.build("test_model_ivyxgb.bin", coordnames, -999.);
+    if (xgb_shared.isModelLoaded()) IVYerr << "The model is loaded before the first evaluation despite lazy loading." << endl;
+    std::vector<IvyMLWrapper::IvyMLDataType_t> shared_preds;
+    std::unordered_map<TString, IvyMLWrapper::IvyMLDataType_t> tmp_map;
+    for (unsigned short ic=0; ic<coordnames.size(); ic++) tmp_map[coordnames.at(ic)] = coords.front().at(ic);
+    xgb_shared.eval(tmp_map, shared_preds);
+    if (*(xgb_shared.getBooster()) != *(xgb.getBooster())) IVYerr << "The booster of the same model file is not shared." << endl;
+    if (shared_preds != preds.front()) IVYerr << "Prediction from the shared booster is different." << endl;
+  }
+
+  IVYout << "Testing the native tree evaluator..." << endl;
+  for (TString const& fname:std::vector<TString>{ "test_model_ivyxgb.bin", "test_model_ivyxgb.json" }){
+    IvyXGBoostTreeEvaluator xgb_native;
+    if (!xgb_native.build(fname, coordnames, -999.)){
+      IVYerr << "The native tree evaluator could not be built from " << fname << "." << endl;
+      continue;
+    }
+    std::vector<IvyMLWrapper::IvyMLDataType_t> batch_coords; batch_coords.reserve(nrows*coordnames.size());
+    for (auto const& row_coords:coords) batch_coords.insert(batch_coords.end(), row_coords.begin(), row_coords.end());
+    std::vector<IvyMLWrapper::IvyMLDataType_t> native_preds;
+    xgb_native.eval(batch_coords.data(), nrows, native_preds);
+    if (native_preds.size()!=nrows*prednames.size()){
+      IVYerr << "Size of native predictions " << native_preds.size() << " is not " << nrows*prednames.size() << "." << endl;
+      continue;
+    }
+    auto it_native_pred = native_preds.cbegin();
+    for (unsigned long long int irow=0; irow<nrows; irow++){
+      for (auto const& pred:preds.at(irow)){
+        if (std::abs(pred - *it_native_pred)>1e-6){
+          IVYerr << "Native prediction for row " << irow << " from " << fname << " is different from the XGBoost prediction." << endl;
+        }
+        it_native_pred++;
+      }
+    }
+  }
+
+  IVYout << "Testing the k-fold evaluator..." << endl;
+  {
+    // The entries are listed in the order they were added in Python, and their event numbers determine the folds.
+    IvyCSVReader csv_kfold("test_data_ivyxgb_kfold.csv");
+    unsigned long long int nrows_kfold = csv_kfold.getNRows();
+    std::vector<unsigned long long> event_numbers; event_numbers.reserve(nrows_kfold);
+    for (auto const& val:csv_kfold.getColumn("event")){
+      unsigned long long ev=0;
+      HelperFunctions::castStringToValue(val, ev);
+      event_numbers.push_back(ev);
+    }
+    std::vector<std::vector<IvyMLWrapper::IvyMLDataType_t>> coords_kfold; coords_kfold.assign(nrows_kfold, std::vector<IvyMLWrapper::IvyMLDataType_t>());
+    std::vector<std::vector<IvyMLWrapper::IvyMLDataType_t>> preds_kfold_csv; preds_kfold_csv.assign(nrows_kfold, std::vector<IvyMLWrapper::IvyMLDataType_t>());
+    for (auto const& var:coordnames){
+      auto const& vals = csv_kfold.getColumn(var.Data());
+      auto it_fillvals = coords_kfold.begin();
+      for (auto const& val:vals){
+        IvyMLWrapper::IvyMLDataType_t vval=0;
+        HelperFunctions::castStringToValue(val, vval);
+        it_fillvals->push_back(vval);
+        it_fillvals++;
+      }
+    }
+    for (auto const& var:prednames){
+      auto const& vals = csv_kfold.getColumn(var.Data());
+      auto it_fillvals = preds_kfold_csv.begin();
+      for (auto const& val:vals){
+        IvyMLWrapper::IvyMLDataType_t vval=0;
+        HelperFunctions::castStringToValue(val, vval);
+        it_fillvals->push_back(vval);
+        it_fillvals++;
+      }
+    }
+
+    IvyXGBoostKFoldInterface xgb_kfold;
+    if (!xgb_kfold.build("test_model_ivyxgb_kfold{fold}.bin", coordnames, -999.)) IVYerr << "The k-fold evaluator could not be built." << endl;
+    else{
+      std::vector<IvyMLWrapper::IvyMLDataType_t> batch_coords; batch_coords.reserve(nrows_kfold*coordnames.size());
+      for (auto const& row_coords:coords_kfold) batch_coords.insert(batch_coords.end(), row_coords.begin(), row_coords.end());
+      std::vector<IvyMLWrapper::IvyMLDataType_t> kfold_preds;
+      xgb_kfold.eval(batch_coords.data(), event_numbers.data(), nrows_kfold, kfold_preds);
+      if (kfold_preds.size()!=nrows_kfold*prednames.size()){
+        IVYerr << "Size of k-fold predictions " << kfold_preds.size() << " is not " << nrows_kfold*prednames.size() << "." << endl;
+      }
+      else{
+        // The batch predictions should be the out-of-fold predictions from the Python training.
+        auto it_kfold_pred = kfold_preds.cbegin();
+        for (unsigned long long int irow=0; irow<nrows_kfold; irow++){
+          for (auto const& pred_csv:preds_kfold_csv.at(irow)){
+            if (std::abs((*it_kfold_pred) - pred_csv)>std::max((*it_kfold_pred), pred_csv)*1e-3){
+              IVYerr << "K-fold prediction for event " << event_numbers.at(irow) << " is significantly different from the out-of-fold prediction." << endl;
+            }
+            it_kfold_pred++;
+          }
+        }
+
+        std::vector<IvyMLWrapper::IvyMLDataType_t> bound_preds(xgb_kfold.getNOutputs(), 0);
+        for (unsigned long long int irow=0; irow<nrows_kfold; irow++){
+          for (unsigned short ic=0; ic<coordnames.size(); ic++) xgb_kfold.getInputBuffer()[ic] = coords_kfold.at(irow).at(ic);
+          xgb_kfold.evalBound(event_numbers.at(irow), bound_preds.data());
+          if (!std::equal(bound_preds.begin(), bound_preds.end(), kfold_preds.begin() + irow*bound_preds.size())){
+            IVYerr << "Bound k-fold prediction for event " << event_numbers.at(irow) << " is different from the batch prediction." << endl;
+          }
+        }
+      }
+    }
+  }
 }
@@ -57,6 +57,7 @@ xgbparams.setParameters(
 xgbtrainer = IvyXGBoostTrainer()
 xgbtrainer.train(xgbdata,xgbparams,early_stopping_rounds=10,scale_weights=True, save_predictions=True)
 xgbtrainer.save_model("test_model_ivyxgb.bin")
+xgbtrainer.save_model("test_model_ivyxgb.json")
 xgbtrainer.save_model("test_model_ivyxgb.dump")
 
 dsets_compare = []
@@ -127,3 +128,27 @@ with open("test_data_ivyxgb.csv", "w") as fout:
          rows.append([dset[0],dset[1][ev],dset[3][ev][0],dset[4][ev],','.join([str(dset[5][ev][icl+2]) for icl in range(len(class_types))])])
    for row in rows:
       fout.write(','.join(map(str,row))+'\n')
+
+# K-fold training: Each entry is predicted by the model of the fold that did not use it in the training.
+xgbtrainer_kfold = IvyXGBoostTrainer()
+pred_kfold = xgbtrainer_kfold.train_kfold(xgbdata, xgbparams, 3, early_stopping_rounds=10, scale_weights=True)
+xgbtrainer_kfold.save_kfold_models("test_model_ivyxgb_kfold{fold}.bin")
+print("Out-of-fold prediction sample size: {}".format(pred_kfold.shape[0]))
+
+# The event numbers are the indices of the entries in the order they were added since none were passed to add_data.
+coords_kfold = np.empty((pred_kfold.shape[0], len(features)), dtype=np.float32)
+for ifold in range(3):
+   coords_kfold[xgbdata.get_fold_entry_ids(ifold)] = xgbdata.get_fold_data([ ifold ])[0][0]
+with open("test_data_ivyxgb_kfold.csv", "w") as fout:
+   rows = [["event",",".join(["coord:"+ff for ff in features]),",".join(["pred:{}".format(cl) for cl in range(4)])]]
+   for ev in range(pred_kfold.shape[0]):
+      rows.append([ev,','.join([str(val) for val in coords_kfold[ev]]),','.join([str(val) for val in pred_kfold[ev]])])
+   for row in rows:
+      fout.write(','.join(map(str,row))+'\n')
+
+# Distributed training: Two worker processes train one model, each on half of the partitions.
+xgbtrainer_dist = IvyXGBoostTrainer()
+xgbtrainer_dist.train_distributed(xgbdata, xgbparams, 2, early_stopping_rounds=10, scale_weights=True, save_predictions=True, start_method="fork")
+xgbtrainer_dist.save_model("test_model_ivyxgb_distributed.json")
+pred_test_dist = np.array(xgbtrainer_dist.prediction_test, dtype=np.float32)
+print("Maximum difference between the test predictions of the single-process and distributed trainings: {}".format(np.max(np.abs(pred_test_dist - pred_test[:, 2:]))))